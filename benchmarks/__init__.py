@@ -0,0 +1 @@
+# benchmarks - замеры производительности поиска (запускаются вручную: python -m benchmarks.<имя>)
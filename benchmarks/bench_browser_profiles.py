@@ -0,0 +1,132 @@
+# bench_browser_profiles.py - сравнение профилей запуска Chrome: готовность страницы и память
+#
+# Запуск (из корня репозитория, рядом должен лежать chromedriver):
+#   python -m benchmarks.bench_browser_profiles --profiles headless lean --runs 3
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+
+from flight_searcher import create_browser
+from readiness import timed_wait
+from selenium_executor import run_blocking
+
+DEFAULT_URL = (
+    "https://www.aeroflot.ru/sb/app/ru-ru#/search?adults=1&children=0&childrenaward=0"
+    "&award=Y&cabin=economy&infants=0&routes=MOW.{date}.LED"
+)
+
+# Страница готова, когда можно нажать "Найти"
+READY_LOCATOR = (By.XPATH, "//a[contains(@class,'button') and contains(.,'Найти')]")
+
+
+def process_tree_rss(root_pid):
+    """
+    Суммарная резидентная память процесса и всех его потомков в мегабайтах (Linux, /proc)
+
+    Args:
+        root_pid (int): pid chromedriver
+
+    Returns:
+        float: RSS в МБ или None, если /proc недоступен
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+
+    if psutil is not None:
+        root = psutil.Process(root_pid)
+        processes = [root] + root.children(recursive=True)
+        return sum(p.memory_info().rss for p in processes if p.is_running()) / 2 ** 20
+
+    if not os.path.isdir("/proc"):
+        return None
+
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # поле ppid идет после имени процесса в скобках
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total_kb = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        stack.extend(children.get(pid, []))
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+        except OSError:
+            continue
+    return total_kb / 1024
+
+
+def _load_page(driver, url):
+    started = time.monotonic()
+    driver.get(url)
+    timed_wait(driver, EC.element_to_be_clickable(READY_LOCATOR), 30, "bench_page_ready", raise_on_timeout=False)
+    return time.monotonic() - started
+
+
+async def bench_profile(profile, url, runs):
+    """
+    Замеряет один профиль: запуск браузера, время готовности страницы и память
+
+    Returns:
+        dict: медианы замеров
+    """
+    launch_times, ready_times, rss_values = [], [], []
+    for _ in range(runs):
+        started = time.monotonic()
+        driver, _ = await create_browser(profile=profile)
+        launch_times.append(time.monotonic() - started)
+        try:
+            # первый заход прогревает дисковый кэш, второй показывает повторный поиск
+            ready_times.append(await run_blocking(_load_page, driver, url))
+            ready_times.append(await run_blocking(_load_page, driver, url))
+            rss = process_tree_rss(driver.service.process.pid)
+            if rss is not None:
+                rss_values.append(rss)
+        finally:
+            await run_blocking(driver.quit)
+
+    return {
+        "profile": profile,
+        "launch_s": statistics.median(launch_times),
+        "ready_s": statistics.median(ready_times),
+        "rss_mb": statistics.median(rss_values) if rss_values else None,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Сравнение профилей запуска Chrome")
+    parser.add_argument("--profiles", nargs="+", default=["full", "headless", "lean"])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--date", default=time.strftime("%Y%m%d", time.localtime(time.time() + 14 * 86400)))
+    parser.add_argument("--url", default=None, help="страница для замера (по умолчанию поиск MOW-LED)")
+    args = parser.parse_args()
+
+    url = args.url or DEFAULT_URL.format(date=args.date)
+    print(f"{'профиль':<10} {'запуск, с':>10} {'готовность, с':>14} {'RSS, МБ':>9}")
+    for profile in args.profiles:
+        result = await bench_profile(profile, url, args.runs)
+        rss = f"{result['rss_mb']:.0f}" if result["rss_mb"] is not None else "—"
+        print(f"{profile:<10} {result['launch_s']:>10.2f} {result['ready_s']:>14.2f} {rss:>9}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+# bench_city_index.py - поиск городов: перебор словаря против индексов city_index и нечеткий поиск
+#
+# Запуск (из корня репозитория):
+#   python -m benchmarks.bench_city_index --number 2000
+import argparse
+import timeit
+
+from city_codes import CITY_INDEX, CITY_MATCHER, CITY_TO_IATA, find_city
+
+# Типичный ввод пользователей: коды, полные названия, части названий, опечатки и мусор
+QUERIES = [
+    "MOW", "led", "XYZ", "москва", "Санкт-Петербург", "уфа", "новосиб", "ск", "бург",
+    "екатеринбург кольцово", "Сочи", "калинин", "ааааа", "владивосток", "ос",
+]
+
+# Ввод с опечатками и латиницей для нечеткого поиска
+FUZZY_QUERIES = [
+    "Мосвка", "moskva", "Moscow", "sankt peterburg", "Санкт-Петрбург", "yekaterinburg",
+    "Новосибриск", "Калининрад", "tbilisi", "Стамбл", "kazan", "abcdefgh",
+]
+
+
+def legacy_find_city(query, max_results=5):
+    """find_city до появления индексов: перебор всего словаря"""
+    query = query.lower()
+    matches = []
+    if len(query) == 3 and query.isalpha():
+        query_upper = query.upper()
+        for city, code in CITY_TO_IATA.items():
+            if code == query_upper:
+                return [(city.capitalize(), code)]
+            elif code.startswith(query[0].upper()):
+                matches.append((city.capitalize(), code))
+                if len(matches) >= max_results:
+                    break
+    else:
+        for city, code in CITY_TO_IATA.items():
+            if query in city:
+                matches.append((city.capitalize(), code))
+                if len(matches) >= max_results:
+                    break
+    if not matches and len(query) >= 2:
+        for city, code in CITY_TO_IATA.items():
+            if city.startswith(query):
+                matches.append((city.capitalize(), code))
+                if len(matches) >= max_results:
+                    break
+    return matches
+
+
+def legacy_is_valid_city(city):
+    if len(city) == 3 and city.upper().isalpha():
+        return city.upper() in CITY_TO_IATA.values()
+    return city.lower() in CITY_TO_IATA
+
+
+def legacy_closest(city, max_matches=3):
+    matches = []
+    city_lower = city.lower()
+    for c in CITY_TO_IATA:
+        if city_lower in c or c in city_lower:
+            matches.append(c)
+            if len(matches) >= max_matches:
+                break
+    return matches
+
+
+def indexed_is_valid_city(city):
+    return CITY_INDEX.code_of(city) is not None
+
+
+def indexed_closest(city, max_matches=3):
+    return CITY_INDEX.cities_overlapping(city, max_matches)
+
+
+CASES = [
+    ("find_city", legacy_find_city, find_city),
+    ("is_valid_city", legacy_is_valid_city, indexed_is_valid_city),
+    ("closest_matches", legacy_closest, indexed_closest),
+]
+
+
+def check_equivalence():
+    """
+    Проверяет, что индексы дают те же ответы, что и перебор. Известные отличия - исправления:
+    перебор не находил трехбуквенные названия ("Уфа") и точный код, если раньше него в словаре
+    набиралось max_results городов с кодом на ту же букву ("MOW")
+    """
+    for name, legacy, indexed in CASES:
+        for query in QUERIES:
+            if len(query) == 3 and (query.lower() in CITY_TO_IATA or CITY_INDEX.city_for_code(query)):
+                continue
+            expected, actual = legacy(query), indexed(query)
+            if expected != actual:
+                print(f"расхождение {name}({query!r}): {expected} != {actual}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Поиск городов: перебор против индексов")
+    parser.add_argument("--number", type=int, default=2000, help="сколько раз прогнать все запросы")
+    args = parser.parse_args()
+
+    check_equivalence()
+    build = timeit.timeit("CityIndex(CITY_TO_IATA)", number=10,
+                          setup="from city_index import CityIndex; from city_codes import CITY_TO_IATA") / 10
+    print(f"построение индекса: {build * 1000:.2f} мс")
+    print(f"{'функция':<16} {'перебор, мкс':>13} {'индекс, мкс':>12} {'ускорение':>10}")
+    for name, legacy, indexed in CASES:
+        calls = args.number * len(QUERIES)
+        legacy_time = timeit.timeit(lambda: [legacy(q) for q in QUERIES], number=args.number) / calls
+        indexed_time = timeit.timeit(lambda: [indexed(q) for q in QUERIES], number=args.number) / calls
+        print(f"{name:<16} {legacy_time * 1e6:>13.2f} {indexed_time * 1e6:>12.2f} {legacy_time / indexed_time:>9.1f}x")
+
+    # нечеткий поиск замеряем без кэша результатов (suggest кэширует одинаковый ввод)
+    print()
+    print(f"{'ввод':<18} {'мкс':>7}  варианты")
+    for query in FUZZY_QUERIES:
+        elapsed = timeit.timeit(lambda: CITY_MATCHER._suggest(query), number=max(1, args.number // 10)) / max(1, args.number // 10)
+        suggestions = ", ".join(f"{city} ({distance})" for city, _, distance in CITY_MATCHER._suggest(query))
+        print(f"{query:<18} {elapsed * 1e6:>7.1f}  {suggestions or '—'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+# bench_scraper.py - сквозной замер скрапера на сохраненных страницах без обращений к сайту
+#
+# Поднимает локальный сервер страниц из html_fixtures и прогоняет на них обычный search_flights
+# (и отдельно разбор карточек: extract_flight_data по одному полю против снимка одним скриптом).
+# Для каждого варианта печатает время, количество команд WebDriver и время этапов поиска.
+#
+# Запуск (из корня репозитория, нужен chromedriver):
+#   python -m benchmarks.bench_scraper --runs 3
+#   python -m benchmarks.bench_scraper --fixtures cards_4 no_flights --json bench.json
+#   python -m benchmarks.bench_scraper --baseline bench.json   # сравнение с прошлым прогоном
+import argparse
+import asyncio
+import json
+import re
+import statistics
+import sys
+import time
+from collections import Counter
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from flight_searcher import create_browser, search_flights, configure_site_url, extract_flight_data, _click_find_button, _find_direction_cards
+from dom_extractor import snapshot_cards
+from metrics import METRICS
+from readiness import get_wait_stats, reset_wait_stats, timed_wait
+from selenium_executor import run_blocking
+from benchmarks.html_fixtures import HtmlFixtureServer
+
+# Ожидаемый результат каждого варианта: количество рейсов или код ошибки
+EXPECTED = {
+    "cards_1": 1,
+    "cards_4": 4,
+    "cards_12": 12,
+    "cards_24": 24,
+    "captured_tariffs_12": 12,
+    "no_direct_filter": 4,
+    "no_flights": "no_flights_available",
+}
+
+_DIGITS = re.compile(r"\d+")
+
+
+def webdriver_commands():
+    """
+    Сколько команд WebDriver выполнено с начала прогона: браузеры из create_browser уже
+    считают их в METRICS (webdriver_commands_total, см. metrics.instrument_driver)
+    """
+    return sum(
+        counter["value"] for counter in METRICS.snapshot()["counters"]
+        if counter["name"] == "webdriver_commands_total"
+    )
+
+
+class PhaseTimeline:
+    """
+    Время этапов поиска по статусным сообщениям: этап длится от своего сообщения до следующего.
+    Номера в сообщениях ("билет 3/12") заменяются на N, чтобы одинаковые этапы складывались.
+    """
+
+    def __init__(self):
+        self.phases = Counter()
+        self._current = None
+        self._started = None
+
+    async def __call__(self, text):
+        self._close()
+        self._current = _DIGITS.sub("N", text.splitlines()[0])
+        self._started = time.monotonic()
+
+    def _close(self):
+        if self._current is not None:
+            self.phases[self._current] += time.monotonic() - self._started
+            self._current = None
+
+    def finish(self):
+        self._close()
+        return dict(self.phases)
+
+
+async def bench_search(driver, wait):
+    """Один search_flights на текущем варианте; возвращает замер"""
+    timeline = PhaseTimeline()
+    reset_wait_stats()
+    commands_before = webdriver_commands()
+    started = time.monotonic()
+    result, _ = await search_flights(
+        "MOW", "DYR", time.strftime("%d.%m.%Y", time.localtime(time.time() + 14 * 86400)),
+        status_callback=timeline, driver=driver, wait=wait, use_cache=False,
+    )
+    wall = time.monotonic() - started
+    return {
+        "wall_s": wall,
+        "commands": webdriver_commands() - commands_before,
+        "outcome": result.get("error") or len(result.get("there", [])),
+        "phases": timeline.finish(),
+        "waits": {label: stats["total"] for label, stats in get_wait_stats().items()},
+    }
+
+
+def _load_results(driver, url):
+    """Открывает вариант и показывает результаты (блокирующий вызов)"""
+    driver.get(url)
+    _click_find_button(WebDriverWait(driver, 5))
+    timed_wait(driver, EC.presence_of_element_located((By.XPATH, "//div[contains(@class,'flight-search__inner')]")), 5, "bench_results")
+    frame = driver.find_elements(By.XPATH, "//div[contains(@class,'frame__heading') and contains(@class,'h-pull--left')]")[0]
+    return _find_direction_cards(frame)[1]
+
+
+def _extract_each(driver, wait, cards):
+    return [extract_flight_data(card, idx, driver, wait, {}) for idx, card in enumerate(cards, 1)]
+
+
+async def bench_extract(driver, wait, url):
+    """Разбор карточек на уже загруженной странице: по одному полю и одним скриптом"""
+    cards = await run_blocking(_load_results, driver, url)
+    measured = {"cards": len(cards)}
+    for name, func, args in (
+        ("extract_flight_data", _extract_each, (driver, wait, cards)),
+        ("snapshot_cards", snapshot_cards, (driver, cards)),
+    ):
+        commands_before = webdriver_commands()
+        started = time.monotonic()
+        await run_blocking(func, *args)
+        measured[name] = {"wall_s": time.monotonic() - started, "commands": webdriver_commands() - commands_before}
+    return measured
+
+
+def _median_of(runs, key):
+    return statistics.median(run[key] for run in runs)
+
+
+def summarize(name, runs):
+    """Медианы прогонов варианта и среднее время этапов и ожиданий readiness"""
+    phases, waits = Counter(), Counter()
+    for run in runs:
+        phases.update(run["phases"])
+        waits.update(run["waits"])
+    return {
+        "fixture": name,
+        "wall_s": _median_of(runs, "wall_s"),
+        "commands": _median_of(runs, "commands"),
+        "outcome": runs[-1]["outcome"],
+        "phases": {phase: total / len(runs) for phase, total in phases.most_common()},
+        "waits": {label: total / len(runs) for label, total in waits.most_common()},
+    }
+
+
+def compare_with_baseline(summaries, baseline_path, tolerance):
+    """
+    Сравнивает с прошлым прогоном (--json): медленнее на tolerance или больше команд - регрессия
+
+    Returns:
+        list: описания регрессий
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {item["fixture"]: item for item in map(json.loads, f) if "fixture" in item}
+    regressions = []
+    for summary in summaries:
+        before = baseline.get(summary["fixture"])
+        if before is None:
+            continue
+        if summary["wall_s"] > before["wall_s"] * (1 + tolerance):
+            regressions.append(f"{summary['fixture']}: время {before['wall_s']:.2f} -> {summary['wall_s']:.2f} с")
+        if summary["commands"] > before["commands"]:
+            regressions.append(f"{summary['fixture']}: команд WebDriver {before['commands']} -> {summary['commands']}")
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Замер скрапера на сохраненных страницах")
+    parser.add_argument("--fixtures", nargs="+", default=list(EXPECTED), help="варианты страниц (см. html_fixtures)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--profile", default="lean", help="профиль запуска браузера")
+    parser.add_argument("--phases", type=int, default=6, help="сколько самых долгих этапов показывать")
+    parser.add_argument("--no-extract", action="store_true", help="не замерять разбор карточек отдельно")
+    parser.add_argument("--json", help="записать итоги в файл (JSON lines) для сравнения")
+    parser.add_argument("--baseline", help="итоги прошлого прогона (--json) для поиска регрессий")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="допустимое замедление относительно baseline")
+    args = parser.parse_args()
+
+    server = HtmlFixtureServer()
+    await server.start()
+    driver, wait = await create_browser(profile=args.profile)
+    summaries = []
+    failed = []
+    try:
+        print(f"{'вариант':<22} {'время, с':>9} {'команд':>7}  результат")
+        for name in args.fixtures:
+            configure_site_url(server.site_url(name))
+            runs = [await bench_search(driver, wait) for _ in range(args.runs)]
+            summary = summarize(name, runs)
+            if not args.no_extract and isinstance(EXPECTED.get(name), int):
+                summary["extract"] = await bench_extract(driver, wait, f"{server.site_url(name)}/sb/app/ru-ru")
+            summaries.append(summary)
+
+            ok = EXPECTED.get(name) in (None, summary["outcome"])
+            if not ok:
+                failed.append(f"{name}: ожидалось {EXPECTED[name]}, получено {summary['outcome']}")
+            print(f"{name:<22} {summary['wall_s']:>9.2f} {summary['commands']:>7.0f}  {summary['outcome']}{'' if ok else ' (!)'}")
+            for phase, seconds in list(summary["phases"].items())[:args.phases]:
+                print(f"    {seconds:>7.3f} с  {phase}")
+            if summary["waits"]:
+                print("    ожидания: " + ", ".join(f"{label} {seconds:.2f} с" for label, seconds in summary["waits"].items()))
+            if "extract" in summary:
+                extract = summary["extract"]
+                for method in ("extract_flight_data", "snapshot_cards"):
+                    print(f"    разбор {extract['cards']} карточек, {method}: {extract[method]['wall_s']:.3f} с, "
+                          f"{extract[method]['commands']} команд")
+    finally:
+        await run_blocking(driver.quit)
+        await server.close()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            for summary in summaries:
+                f.write(json.dumps(summary, ensure_ascii=False) + "\n")
+
+    regressions = compare_with_baseline(summaries, args.baseline, args.tolerance) if args.baseline else []
+    for problem in failed + regressions:
+        print(f"✗ {problem}")
+    if failed or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
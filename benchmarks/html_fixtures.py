@@ -0,0 +1,204 @@
+# html_fixtures.py - сохраненные страницы результатов поиска для прогона скрапера без сайта
+#
+# Основа - разметка результатов из testsearch.py (Москва — Анадырь, 4 карточки с пересадками).
+# Из нее собираются варианты страниц: разное количество карточек, "рейсы не найдены",
+# без фильтра "Только прямые рейсы", тарифы в JSON-ответе страницы. Сервер отдает каждую
+# страницу по адресу /fx/<вариант>/sb/app/ru-ru, так что flight_searcher.configure_site_url
+# (SITE_URL/fx/<вариант>) направляет на нее обычный search_flights.
+import json
+import os
+import re
+
+from aiohttp import web
+
+SAVED_RESULTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "testsearch.py")
+
+_CARD_START = re.compile(r'<div class="flight-search" tabindex="0">')
+_DIV_TAG = re.compile(r"<div\b|</div>")
+_FLIGHT_NUMBER = re.compile(r'class="flight-search__plane-number">(.*?)</div>')
+_COMMENT = re.compile(r"<!--.*?-->")
+_DIRECT_FILTER = re.compile(r'<div class="input h-pull--left input--nowide h-mb--8">.*?Только прямые рейсы.*?</label></div>')
+
+NO_FLIGHTS_HTML = '<div class="text" role="alert">На выбранные даты рейсы не найдены</div>'
+
+# Страница поиска: кнопка "Найти" показывает результаты (и, если нужно, сначала запрашивает
+# тарифы JSON-запросом), кнопка "Выбрать рейс" открывает окно тарифов, как на сайте
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="ru"><head><meta charset="utf-8"><title>Поиск</title></head>
+<body>
+<a class="button button--primary" href="javascript:void(0)" id="find">Найти</a>
+<div id="results"></div>
+<div id="modal"></div>
+<template id="fixture">__RESULTS__</template>
+<script>
+var TARIFFS_URL = __TARIFFS_URL__;
+function render() {
+    document.getElementById('results').innerHTML = document.getElementById('fixture').innerHTML;
+}
+document.getElementById('find').addEventListener('click', function () {
+    if (TARIFFS_URL) {
+        fetch(TARIFFS_URL).then(function (r) { return r.json(); }).then(render, render);
+    } else {
+        render();
+    }
+});
+document.addEventListener('click', function (event) {
+    var choose = event.target.closest('button.button--outline');
+    if (choose) {
+        var cards = Array.prototype.slice.call(document.querySelectorAll('div.flight-search[tabindex="0"]'));
+        var miles = 25000 + 1000 * cards.indexOf(choose.closest('div.flight-search[tabindex="0"]'));
+        var cells = '';
+        for (var i = 0; i < 3; i++) {
+            cells += '<div class="tariff__table-cell tariff__table-price"><div>от ' + (miles + i * 10000) +
+                '</div><p class="text text--compact">и 1 140 ₽</p></div>';
+        }
+        document.getElementById('modal').innerHTML =
+            '<div class="modal">' + cells + '<button class="modal__close">×</button></div>';
+        return;
+    }
+    if (event.target.closest('button.modal__close')) {
+        document.getElementById('modal').innerHTML = '';
+    }
+});
+</script>
+</body></html>
+"""
+
+
+def _element_end(html, start):
+    """Позиция сразу после закрывающего тега div, открытого в start"""
+    depth = 0
+    for match in _DIV_TAG.finditer(html, start):
+        depth += 1 if match.group(0) == "<div" else -1
+        if depth == 0:
+            return match.end()
+    raise ValueError("Unbalanced div in saved results")
+
+
+def split_saved_results(html):
+    """
+    Делит сохраненные результаты на разметку до карточек, карточки и разметку после них
+
+    Returns:
+        tuple: (начало, [карточка, ...], конец)
+    """
+    starts = [match.start() for match in _CARD_START.finditer(html)]
+    if not starts:
+        raise ValueError("No flight cards in saved results")
+    cards = [html[start:_element_end(html, start)] for start in starts]
+    end = starts[-1] + len(cards[-1])
+    return html[:starts[0]], cards, html[end:]
+
+
+def card_flight_numbers(card):
+    """Номера рейсов сегментов карточки ("SU 6865", ...)"""
+    return [_COMMENT.sub("", number).strip() for number in _FLIGHT_NUMBER.findall(card)]
+
+
+def tariffs_payload(cards):
+    """JSON-ответ с тарифами карточек в том виде, который разбирает tariff_capture"""
+    itineraries = []
+    seen = set()
+    for idx, card in enumerate(cards):
+        # повторенная карточка - тот же рейс, второй вариант с другой ценой был бы противоречием
+        numbers = tuple(card_flight_numbers(card))
+        if numbers in seen:
+            continue
+        seen.add(numbers)
+        miles = 25000 + 1000 * idx
+        itineraries.append({
+            "segments": [{"flight_number": number, "airline_code": "SU"} for number in numbers],
+            "fares": [
+                {"name": name, "miles": miles + step * 10000, "taxes": 1140}
+                for step, name in enumerate(("Базовый", "Стандарт", "Плюс"))
+            ],
+        })
+    return {"itineraries": itineraries}
+
+
+def build_fixtures(saved_html=None):
+    """
+    Собирает варианты страниц из сохраненных результатов
+
+    Returns:
+        dict: название варианта -> {"results": разметка результатов, "tariffs": JSON или None}
+    """
+    if saved_html is None:
+        with open(SAVED_RESULTS_PATH, encoding="utf-8") as f:
+            saved_html = f.read()
+    head, cards, tail = split_saved_results(saved_html)
+
+    def with_cards(count):
+        repeated = [cards[idx % len(cards)] for idx in range(count)]
+        return head + "".join(repeated) + tail, repeated
+
+    fixtures = {}
+    for count in (1, len(cards), 12, 24):
+        results, _ = with_cards(count)
+        fixtures[f"cards_{count}"] = {"results": results, "tariffs": None}
+    results, repeated = with_cards(12)
+    fixtures["captured_tariffs_12"] = {"results": results, "tariffs": tariffs_payload(repeated)}
+    fixtures["no_direct_filter"] = {"results": _DIRECT_FILTER.sub("", saved_html, count=1), "tariffs": None}
+    fixtures["no_flights"] = {"results": NO_FLIGHTS_HTML, "tariffs": None}
+    return fixtures
+
+
+def render_page(fixture, tariffs_url):
+    # разметка вставляется внутрь <template>, поэтому скрипты и закрывающие теги в ней не мешают
+    return (
+        PAGE_TEMPLATE
+        .replace("__TARIFFS_URL__", json.dumps(tariffs_url if fixture["tariffs"] is not None else None))
+        .replace("__RESULTS__", fixture["results"])
+    )
+
+
+class HtmlFixtureServer:
+    """Локальный сервер страниц из build_fixtures: /fx/<вариант>/sb/app/ru-ru и /fx/<вариант>/sb/api/tariffs"""
+
+    def __init__(self, fixtures=None, host="127.0.0.1", port=0):
+        self.fixtures = fixtures if fixtures is not None else build_fixtures()
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self._runner = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def site_url(self, name):
+        """Адрес для flight_searcher.configure_site_url"""
+        return f"{self.url}/fx/{name}"
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/fx/{name}/sb/app/ru-ru", self._page)
+        app.router.add_get("/fx/{name}/sb/api/tariffs", self._tariffs)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _fixture(self, request):
+        self.requests += 1
+        fixture = self.fixtures.get(request.match_info["name"])
+        if fixture is None:
+            raise web.HTTPNotFound()
+        return fixture
+
+    async def _page(self, request):
+        fixture = self._fixture(request)
+        tariffs_url = f"/fx/{request.match_info['name']}/sb/api/tariffs"
+        return web.Response(text=render_page(fixture, tariffs_url), content_type="text/html")
+
+    async def _tariffs(self, request):
+        fixture = self._fixture(request)
+        if fixture["tariffs"] is None:
+            raise web.HTTPNotFound()
+        return web.json_response(fixture["tariffs"])
@@ -1,9 +1,22 @@
 # bot.py - основной файл бота
-import logging
+import dataclasses
 import os
 import asyncio
-from city_codes import CITY_TO_IATA, find_city  # Добавляем импорт функции find_city
-from flight_searcher import search_flights, search_roundtrip, create_browser  # Добавляем импорт новых функций
+import secrets
+from datetime import datetime
+from city_codes import CITY_TO_IATA, CITY_INDEX, CITY_MATCHER, find_city  # Добавляем импорт функции find_city
+from flight_searcher import stream_search, start_browser_pool, stop_browser_pool, configure_search_cache, is_search_cached, start_result_store, stop_result_store, start_search_backend, stop_search_backend
+from selenium_executor import configure_executor, shutdown_executor
+from search_scheduler import SearchScheduler
+from status_pipeline import StatusPipeline
+from result_pages import ResultPages, pack_blocks, parse_page_callback, PAGE_CALLBACK_PREFIX
+from result_cache import ResultCache
+from search_backends import HttpSearchBackend, API_BASE_URL
+from metrics import METRICS, MetricsServer, JsonLinesSink
+from fanout_search import parse_date_range, search_date_range, search_destinations, cheapest_day
+from watcher import Watcher
+from log_setup import setup_logging, stop_logging, request_context
+from fsm_storage import SqliteStorage
 from aiogram import Bot, Dispatcher, types
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
@@ -17,14 +30,95 @@ from dotenv import load_dotenv
 # Загрузка переменных окружения
 load_dotenv()
 API_TOKEN = os.getenv('TELEGRAM_API_TOKEN')
+# Размер пула браузеров и количество поисков до перезапуска браузера
+BROWSER_POOL_SIZE = int(os.getenv('BROWSER_POOL_SIZE', '2'))
+BROWSER_MAX_USES = int(os.getenv('BROWSER_MAX_USES', '20'))
+# Профиль запуска браузеров пула: lean, headless или full (см. browser_profiles.py)
+BROWSER_PROFILE = os.getenv('BROWSER_PROFILE', 'lean')
+# Количество потоков, в которых выполняются блокирующие вызовы Selenium
+SELENIUM_WORKERS = int(os.getenv('SELENIUM_WORKERS', '8'))
+# Сколько поисков может выполняться одновременно (остальные ждут в очереди)
+SEARCH_WORKERS = int(os.getenv('SEARCH_WORKERS', str(BROWSER_POOL_SIZE)))
+# Время жизни (в секундах) и размер кэша результатов поиска
+SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', '600'))
+SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', '256'))
+# История результатов поиска (SQLite; пустая строка - не вести) и возраст записей,
+# которые отдаются вместо нового поиска на сайте
+RESULT_STORE_PATH = os.getenv('RESULT_STORE_PATH', 'results.db')
+RESULT_STORE_MAX_AGE = int(os.getenv('RESULT_STORE_MAX_AGE', str(SEARCH_CACHE_TTL)))
+# Подписки /watch: файл хранения и как часто повторять поиск (секунды)
+WATCH_PATH = os.getenv('WATCH_PATH', 'watches.json')
+WATCH_INTERVAL = int(os.getenv('WATCH_INTERVAL', '1800'))
+# Как искать рейсы: selenium (браузер) или http (прямые запросы к API без браузера);
+# для http - адрес API (например, локальный fixture_server) и размер пула соединений
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'selenium')
+SEARCH_API_URL = os.getenv('SEARCH_API_URL', API_BASE_URL)
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '8'))
+# Метрики поиска: порт HTTP-эндпоинта /metrics (0 - не запускать) и файл событий JSON lines (пусто - не писать)
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_JSONL = os.getenv('METRICS_JSONL', '')
+# Не чаще одного обновления статуса в чате за указанное число секунд
+STATUS_MIN_INTERVAL = float(os.getenv('STATUS_MIN_INTERVAL', '1.0'))
+# Сколько браузеров может занять один поиск по диапазону дат или по многим направлениям
+FLEX_SEARCH_SESSIONS = int(os.getenv('FLEX_SEARCH_SESSIONS', '2'))
+# Сколько направлений проверяет одна команда /anywhere (без списка - самые популярные города)
+ANYWHERE_MAX_DESTINATIONS = int(os.getenv('ANYWHERE_MAX_DESTINATIONS', '10'))
+# Состояния диалогов (SQLite, общий файл для всех процессов бота; пусто - хранить в памяти)
+# и через сколько секунд без ответа пользователя незаконченный диалог удаляется
+FSM_STORAGE_PATH = os.getenv('FSM_STORAGE_PATH', 'fsm.db')
+FSM_STATE_TTL = int(os.getenv('FSM_STATE_TTL', '86400'))
+# Журнал: уровень, подробности по каждой карточке рейса (1 - писать), формат (text или json)
+# и файл (пусто - stderr)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_CARD_DETAILS = os.getenv('LOG_CARD_DETAILS', '0') == '1'
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+LOG_PATH = os.getenv('LOG_PATH', '')
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO)
+# Настройка логирования: записи выводятся из отдельного потока, см. log_setup.py
+setup_logging(level=LOG_LEVEL, card_details=LOG_CARD_DETAILS, json_format=LOG_FORMAT == 'json', path=LOG_PATH or None)
 
 # Инициализация бота и диспетчера
 bot = Bot(token=API_TOKEN)
-storage = MemoryStorage()
+storage = SqliteStorage(FSM_STORAGE_PATH, ttl=FSM_STATE_TTL) if FSM_STORAGE_PATH else MemoryStorage()
 dp = Dispatcher(storage=storage)
+# Очередь поисков: ограничивает количество одновременно работающих браузеров
+search_scheduler = SearchScheduler(max_workers=SEARCH_WORKERS)
+# Статусы поиска отправляются в фоне, прореженные до одного обновления в интервал
+status_pipeline = StatusPipeline(min_interval=STATUS_MIN_INTERVAL)
+# Страницы результатов: отправляется первая, остальные листаются кнопками из памяти
+result_pages = ResultPages()
+# Кнопка нового поиска под страницами результатов
+NEW_SEARCH_ROWS = [[types.InlineKeyboardButton(text="🔄 Новый поиск", callback_data="new_search")]]
+# Подписи направлений для карточек рейсов
+DIRECTION_LABELS = {"there": "туда", "back": "обратно"}
+# Параметры поисков по диапазону дат: по кнопке дня показываются подробные результаты.
+# Живут столько же, сколько результаты поиска в кэше, иначе сводка пережила бы подробности по дням.
+# Ключ - случайный идентификатор, значение - (чат, параметры): кнопка работает только в своем чате
+flex_searches = ResultCache(max_entries=500, ttl=SEARCH_CACHE_TTL)
+# Параметры поисков /anywhere: (чат, параметры, коды направлений) - так же, как flex_searches
+destination_searches = ResultCache(max_entries=500, ttl=SEARCH_CACHE_TTL)
+# Подписки на появление мест: повторные поиски по расписанию и уведомления об изменениях
+watcher = Watcher(
+    notify=lambda chat_id, text: bot.send_message(chat_id, text, parse_mode="HTML"),
+    path=WATCH_PATH,
+    interval=WATCH_INTERVAL,
+    scheduler=search_scheduler
+)
+
+def last_search_context(state):
+    """
+    Данные FSM с параметрами последнего поиска (для /watch). Хранятся отдельно от данных
+    диалога /search (destiny "last_search"), поэтому не стираются при state.clear()
+    и переживают перезапуск бота вместе с остальным состоянием.
+    """
+    return FSMContext(storage=state.storage, key=dataclasses.replace(state.key, destiny="last_search"))
+
+# Все записи журнала при обработке обновления помечаются его номером
+@dp.update.outer_middleware()
+async def with_request_id(handler, event, data):
+    with request_context(f"u{event.update_id}"):
+        return await handler(event, data)
 
 # Определение состояний FSM
 class FlightSearch(StatesGroup):
@@ -50,13 +144,106 @@ async def cmd_help(message: types.Message):
         "Я помогу найти авиабилеты Аэрофлота. Вот мои команды:\n"
         "/start - начать работу с ботом\n"
         "/search - начать поиск билетов\n"
+        "/anywhere ГОРОД ДД.ММ.ГГГГ [КОДЫ...] - рейсы из города во многие направления на одну дату\n"
+        "/watch - следить за последним поиском и сообщать о новых местах\n"
+        "/watches - показать подписки\n"
+        "/unwatch - отменить подписку (/unwatch N - только подписку номер N)\n"
         "/help - показать эту справку"
     )
     await message.answer(help_text)
 
+# Обработчик команды /watch: подписка на параметры последнего поиска
+@dp.message(Command("watch"))
+async def cmd_watch(message: types.Message, state: FSMContext):
+    user_data = await last_search_context(state).get_data()
+    if not user_data:
+        await message.answer("Сначала выполните поиск с помощью /search, затем отправьте /watch, чтобы следить за ним.")
+        return
+    
+    try:
+        subscriptions = await watcher.subscribe(message.chat.id, user_data)
+    except ValueError:
+        await message.answer(f"⚠️ Не удалось оформить подписку: проверьте дату или отмените старые подписки (не больше {watcher.max_per_chat}).")
+        return
+    
+    # Поиск туда и обратно - отдельная подписка на каждое направление
+    lines = [f"🔔 Подписка #{subscription.id}: {subscription.title()}." for subscription in subscriptions]
+    await message.answer(
+        "\n".join(lines) + "\n"
+        f"Я буду проверять рейсы примерно раз в {WATCH_INTERVAL // 60} мин. и сообщу о новых местах и изменении цены."
+    )
+
+# Обработчик команды /watches: список подписок чата
+@dp.message(Command("watches"))
+async def cmd_watches(message: types.Message):
+    subscriptions = watcher.subscriptions_of(message.chat.id)
+    if not subscriptions:
+        await message.answer("У вас нет подписок. Выполните поиск и отправьте /watch.")
+        return
+    
+    lines = ["🔔 Ваши подписки:"] + [f"#{subscription.id}: {subscription.title()}" for subscription in subscriptions]
+    await message.answer("\n".join(lines))
+
+# Обработчик команды /unwatch: отмена одной или всех подписок чата
+@dp.message(Command("unwatch"))
+async def cmd_unwatch(message: types.Message):
+    args = message.text.split()[1:]
+    subscription_id = None
+    if args:
+        try:
+            subscription_id = int(args[0].lstrip("#"))
+        except ValueError:
+            await message.answer("Укажите номер подписки, например /unwatch 3")
+            return
+    
+    removed = await watcher.unsubscribe(message.chat.id, subscription_id)
+    await message.answer(f"Отменено подписок: {removed}" if removed else "Подписка не найдена.")
+
+# Обработчик команды /anywhere: поиск из одного города во много направлений на одну дату
+@dp.message(Command("anywhere"))
+async def cmd_anywhere(message: types.Message, state: FSMContext):
+    args = message.text.replace(",", " ").split()[1:]
+    usage = (
+        "Укажите город отправления, дату и (необязательно) коды направлений, например:\n"
+        "/anywhere MOW 01.12.2026 LED AER KZN"
+    )
+    if len(args) < 2:
+        await message.answer(usage)
+        return
+    
+    from_city = resolve_city_input(args[0])
+    if not from_city:
+        await message.answer(f"⚠️ Город \"{args[0]}\" не найден в нашей базе данных.\n{usage}")
+        return
+    try:
+        datetime.strptime(args[1], "%d.%m.%Y")
+    except ValueError:
+        await message.answer(f"⚠️ Некорректная дата \"{args[1]}\".\n{usage}")
+        return
+    
+    # Без списка направлений проверяем самые популярные города
+    destinations = args[2:] or [
+        code for _, code in CITY_MATCHER.popular(ANYWHERE_MAX_DESTINATIONS + 1)
+        if not is_same_city(code, from_city)
+    ]
+    if len(destinations) > ANYWHERE_MAX_DESTINATIONS:
+        await message.answer(f"⚠️ Не больше {ANYWHERE_MAX_DESTINATIONS} направлений за один поиск.")
+        return
+    
+    # Новый поиск отменяет предыдущий поиск этого чата
+    search_scheduler.cancel(message.chat.id)
+    await state.clear()
+    user_data = {
+        "from_city": from_city, "depart_date": args[1], "return_date": None, "depart_dates": None,
+        "adults_count": 1, "children_count": 0, "class_type": "эконом", "flight_filter": "all",
+    }
+    await process_destinations_search(message, user_data, destinations)
+
 # Обработчик команды /search
 @dp.message(Command("search"))
 async def cmd_search(message: types.Message, state: FSMContext):
+    # Новый поиск отменяет предыдущий поиск этого чата
+    search_scheduler.cancel(message.chat.id)
     await state.set_state(FlightSearch.waiting_for_from)
     await message.answer("Укажите город отправления (например, Москва или MOW):")
 
@@ -65,11 +252,12 @@ async def cmd_search(message: types.Message, state: FSMContext):
 async def process_from(message: types.Message, state: FSMContext):
     city_input = message.text
     
-    # Проверяем город на наличие в словаре
-    if is_valid_city(city_input):
-        await state.update_data(from_city=city_input)
+    # Проверяем город на наличие в словаре (с исправлением опечаток)
+    city = resolve_city_input(city_input)
+    if city:
+        await state.update_data(from_city=city)
         await state.set_state(FlightSearch.waiting_for_to)
-        await message.answer(f"Город отправления: {city_input}\nТеперь укажите город прибытия:")
+        await message.answer(f"Город отправления: {city}\nТеперь укажите город прибытия:")
     else:
         closest_matches = find_closest_matches(city_input)
         suggestion_text = ""
@@ -84,20 +272,24 @@ async def process_from(message: types.Message, state: FSMContext):
 async def process_to(message: types.Message, state: FSMContext):
     city_input = message.text
     
-    # Проверяем город на наличие в словаре
-    if is_valid_city(city_input):
+    # Проверяем город на наличие в словаре (с исправлением опечаток)
+    city = resolve_city_input(city_input)
+    if city:
         # Получаем ранее введенный город отправления
         user_data = await state.get_data()
         from_city = user_data.get('from_city', '')
         
         # Убедимся, что города разные
-        if is_same_city(from_city, city_input):
+        if is_same_city(from_city, city):
             await message.answer("⚠️ Город прибытия должен отличаться от города отправления. Пожалуйста, введите другой город.")
             return
             
-        await state.update_data(to_city=city_input)
+        await state.update_data(to_city=city)
         await state.set_state(FlightSearch.waiting_for_depart_date)
-        await message.answer(f"Город прибытия: {city_input}\nУкажите дату вылета туда в формате ДД.ММ.ГГГГ:")
+        await message.answer(
+            f"Город прибытия: {city}\nУкажите дату вылета туда в формате ДД.ММ.ГГГГ "
+            f"(или диапазон ДД.ММ.ГГГГ-ДД.ММ.ГГГГ, чтобы найти лучший день):"
+        )
     else:
         closest_matches = find_closest_matches(city_input)
         suggestion_text = ""
@@ -110,7 +302,31 @@ async def process_to(message: types.Message, state: FSMContext):
 # Обработчик ввода даты вылета
 @dp.message(FlightSearch.waiting_for_depart_date)
 async def process_depart_date(message: types.Message, state: FSMContext):
-    await state.update_data(depart_date=message.text)
+    # Диапазон дат - поиск по гибким датам (только в одну сторону)
+    try:
+        depart_dates = parse_date_range(message.text)
+    except ValueError:
+        await message.answer("⚠️ Некорректный диапазон дат. Укажите до 14 дней, например 01.12.2026-07.12.2026.")
+        return
+    
+    if depart_dates:
+        await state.update_data(depart_date=depart_dates[0], depart_dates=depart_dates, return_date=None)
+        
+        markup = types.ReplyKeyboardMarkup(keyboard=[
+            [types.KeyboardButton(text="1"), types.KeyboardButton(text="2")],
+            [types.KeyboardButton(text="3"), types.KeyboardButton(text="4")],
+            [types.KeyboardButton(text="5"), types.KeyboardButton(text="6")]
+        ], resize_keyboard=True)
+        
+        await state.set_state(FlightSearch.waiting_for_adults)
+        await message.answer(
+            f"Гибкие даты: {depart_dates[0]} — {depart_dates[-1]} ({len(depart_dates)} дн.), ищу рейсы только туда.\n"
+            f"Укажите количество взрослых пассажиров (от 1 до 6):",
+            reply_markup=markup
+        )
+        return
+    
+    await state.update_data(depart_date=message.text, depart_dates=None)
     
     # Создаем клавиатуру для выбора, нужен ли обратный рейс
     markup = types.ReplyKeyboardMarkup(keyboard=[
@@ -131,13 +347,26 @@ def is_valid_city(city):
     Returns:
         bool: True если город найден, иначе False
     """
-    # Если это IATA-код (3 буквы)
-    if len(city) == 3 and city.upper().isalpha():
-        # Проверяем, есть ли этот код среди значений словаря
-        return city.upper() in CITY_TO_IATA.values()
+    # IATA-код или название города (без учета регистра); трехбуквенные названия
+    # вроде "Уфа" тоже проверяются по словарю, а не только как код
+    return CITY_INDEX.code_of(city) is not None
+
+def resolve_city_input(city_input):
+    """
+    Определяет город по вводу пользователя
     
-    # Иначе проверяем наличие города в словаре (без учета регистра)
-    return city.lower() in CITY_TO_IATA
+    Args:
+        city_input (str): Название города или IATA-код, возможно с опечаткой или латиницей
+        
+    Returns:
+        str: Ввод как есть, если город найден; исправленное название, если исправление
+            однозначно ("Мосвка" -> "Москва"); иначе None
+    """
+    if is_valid_city(city_input):
+        return city_input
+    
+    corrected = CITY_MATCHER.resolve(city_input)
+    return corrected.capitalize() if corrected else None
 
 def is_same_city(city1, city2):
     """
@@ -150,19 +379,9 @@ def is_same_city(city1, city2):
     Returns:
         bool: True если города одинаковые, иначе False
     """
-    # Получаем IATA-коды для обоих городов
-    if len(city1) == 3 and city1.upper().isalpha():
-        code1 = city1.upper()
-    else:
-        code1 = CITY_TO_IATA.get(city1.lower(), "")
-    
-    if len(city2) == 3 and city2.upper().isalpha():
-        code2 = city2.upper() 
-    else:
-        code2 = CITY_TO_IATA.get(city2.lower(), "")
-    
-    # Сравниваем коды
-    return code1 == code2 and code1 != ""
+    # Получаем IATA-коды для обоих городов и сравниваем их
+    code1 = CITY_INDEX.code_of(city1)
+    return code1 is not None and code1 == CITY_INDEX.code_of(city2)
 
 def find_closest_matches(city, max_matches=3):
     """
@@ -175,33 +394,24 @@ def find_closest_matches(city, max_matches=3):
     Returns:
         list: Список строк с предложениями
     """
-    matches = []
-    city_lower = city.lower()
-    
     # Если похоже на IATA-код, но такого кода нет
-    if len(city) == 3 and city.upper().isalpha() and city.upper() not in CITY_TO_IATA.values():
-        # Предлагаем города, начинающиеся с тех же букв
-        for c, code in CITY_TO_IATA.items():
-            if code.startswith(city[0].upper()):
-                matches.append(f"• {c.capitalize()} ({code})")
-                if len(matches) >= max_matches:
-                    break
-        return matches
-    
-    # Иначе ищем частичные совпадения по названию
-    for c in CITY_TO_IATA:
-        if city_lower in c or c in city_lower:
-            matches.append(f"• {c.capitalize()} ({CITY_TO_IATA[c]})")
-            if len(matches) >= max_matches:
-                break
+    if len(city) == 3 and city.upper().isalpha() and CITY_INDEX.code_of(city) is None:
+        # Предлагаем города, коды которых начинаются с той же буквы
+        return [f"• {c.capitalize()} ({code})" for c, code in CITY_INDEX.codes_starting_with(city, max_matches)]
+    
+    # Иначе ищем частичные совпадения по названию (города, в которых есть введенный текст,
+    # и города, названия которых входят во введенный текст), затем похожие названия с
+    # учетом опечаток и латиницы - от самых близких и популярных
+    found = CITY_INDEX.cities_overlapping(city, max_matches)
+    for c, _, _ in CITY_MATCHER.suggest(city, max_matches):
+        if c not in found:
+            found.append(c)
     
     # Если ничего не нашлось, предлагаем самые популярные города
-    if not matches:
-        popular_cities = ["москва", "санкт-петербург", "сочи", "стамбул", "дубай"]
-        for c in popular_cities[:max_matches]:
-            matches.append(f"• {c.capitalize()} ({CITY_TO_IATA[c]})")
+    if not found:
+        found = [c for c, _ in CITY_MATCHER.popular(max_matches)]
     
-    return matches
+    return [f"• {c.capitalize()} ({CITY_TO_IATA[c]})" for c in found[:max_matches]]
 
 # Обновляем обработчик ввода даты отправления или выбора обратного рейса
 @dp.message(FlightSearch.asking_return_flight)
@@ -325,6 +535,14 @@ async def process_flight_type(message: types.Message, state: FSMContext):
 
 # Функция для запуска поиска с заданными параметрами (модифицированная)
 async def process_search_with_data(message, state, user_data):
+    # Поиск по диапазону дат показывает сводку по дням
+    if user_data.get('depart_dates'):
+        await process_flex_search(message, state, user_data)
+        return
+    
+    # Запоминаем параметры: на этот поиск можно подписаться командой /watch
+    await last_search_context(state).set_data({key: value for key, value in user_data.items() if key != 'depart_dates'})
+    
     # Удаляем клавиатуру
     markup = types.ReplyKeyboardRemove()
     
@@ -373,38 +591,229 @@ async def process_search_with_data(message, state, user_data):
             # Если не удаётся обновить, отправляем новое
             status_info[0] = await message.answer(text)
     
-    # Запускаем поиск билетов с учетом наличия обратного рейса
-    if user_data.get('return_date'):
-        # Если нужен обратный рейс, используем функцию search_roundtrip
-        search_result = await search_roundtrip(
+    # Поиск не ждет Telegram: статусы уходят в фоне, промежуточные пропускаются
+    status = status_pipeline.channel(message.chat.id, update_status)
+    
+    # Рейсы показываем по мере разбора карточек: одно сообщение-превью обновляется
+    # через тот же прореживающий канал, что и статусы
+    preview_info = [None]
+    streamed_blocks = []
+    
+    async def update_preview(text):
+        if preview_info[0] is None:
+            preview_info[0] = await message.answer(text, parse_mode="HTML")
+        else:
+            await preview_info[0].edit_text(text, parse_mode="HTML")
+    
+    preview = status_pipeline.channel(message.chat.id, update_preview)
+    
+    # Запускаем поиск билетов с учетом наличия обратного рейса (туда-обратно, если указана дата возвращения)
+    async def run_search():
+        async for direction, payload in stream_search(
             from_city=user_data['from_city'],
             to_city=user_data['to_city'],
             depart_date=user_data['depart_date'],
-            return_date=user_data['return_date'],
+            return_date=user_data.get('return_date'),
             adults_count=user_data.get('adults_count', 1),
             children_count=user_data.get('children_count', 0),
             class_type=user_data.get('class_type', 'эконом'),
             flight_filter=user_data.get('flight_filter', 'all'),
-            status_callback=update_status
-        )
-    else:
-        # Если обратный рейс не нужен, используем обычную функцию search_flights
-        search_result, _ = await search_flights(
+            status_callback=status
+        ):
+            if direction == "result":
+                return payload
+            # Результат из кэша придет сразу целиком, превью для него не нужно
+            if not cached:
+                streamed_blocks.append(format_flight_info(payload, DIRECTION_LABELS[direction]))
+                header = f"⏳ Поиск продолжается, уже найдено рейсов: {len(streamed_blocks)}"
+                await preview(pack_blocks([header] + streamed_blocks)[0])
+    
+    # Если все направления уже есть в кэше (например, пользователь переключил фильтр),
+    # браузер не нужен и ждать в очереди незачем. Подключение к такому же идущему поиску
+    # идет через очередь: если тот поиск отменят, этот запустит поиск на сайте сам
+    passengers = (user_data.get('adults_count', 1), user_data.get('children_count', 0), user_data.get('class_type', 'эконом'))
+    cached = is_search_cached(user_data['from_city'], user_data['to_city'], user_data['depart_date'], *passengers)
+    if cached and user_data.get('return_date'):
+        cached = is_search_cached(user_data['to_city'], user_data['from_city'], user_data['return_date'], *passengers)
+    
+    try:
+        if cached:
+            search_result = await run_search()
+        else:
+            # Поиск ждет свободного браузера в общей очереди
+            search_result = await search_scheduler.submit(message.chat.id, run_search, status)
+        # Последний статус ("поиск отменен", "найдено N рейсов") отправляем до результатов,
+        # а превью дожидаемся, чтобы заменить его итоговой страницей
+        await status.flush()
+        await preview.flush()
+    finally:
+        status.close()
+        preview.close()
+    
+    if search_result is None:
+        # Поиск отменен: пользователь начал новый поиск
+        return
+    
+    # Используем существующую логику для обработки результатов
+    await process_search_results(message, state, search_result, preview_info[0])
+
+# Поиск по диапазону дат: сводка по дням, подробности дня - по кнопке (из кэша)
+async def process_flex_search(message, state, user_data):
+    depart_dates = user_data['depart_dates']
+    await message.answer(
+        f"🔍 Ищу лучший день: {user_data['from_city']} → {user_data['to_city']}, "
+        f"{depart_dates[0]} — {depart_dates[-1]}",
+        reply_markup=types.ReplyKeyboardRemove()
+    )
+    status_message = await message.answer("🕒 Начинаю поиск по датам...")
+    status_info = [status_message]
+    
+    async def update_status(text):
+        try:
+            await status_info[0].edit_text(text)
+        except Exception:
+            status_info[0] = await message.answer(text)
+    
+    status = status_pipeline.channel(message.chat.id, update_status)
+    
+    async def run_search():
+        return await search_date_range(
             from_city=user_data['from_city'],
             to_city=user_data['to_city'],
-            depart_date=user_data['depart_date'],
+            depart_dates=depart_dates,
             adults_count=user_data.get('adults_count', 1),
             children_count=user_data.get('children_count', 0),
             class_type=user_data.get('class_type', 'эконом'),
             flight_filter=user_data.get('flight_filter', 'all'),
-            status_callback=update_status
+            status_callback=status,
+            max_sessions=FLEX_SEARCH_SESSIONS
         )
     
-    # Используем существующую логику для обработки результатов
-    await process_search_results(message, state, search_result)
+    try:
+        search_result = await search_scheduler.submit(message.chat.id, run_search, status)
+        await status.flush()
+    finally:
+        status.close()
+    
+    if search_result is None:
+        # Поиск отменен: пользователь начал новый поиск
+        return
+    
+    # Параметры поиска запоминаем, чтобы по кнопке дня показать его рейсы
+    search_id = secrets.token_urlsafe(8)
+    flex_searches.set(search_id, (message.chat.id, user_data))
+    
+    days = search_result["days"]
+    best = cheapest_day(days)
+    lines = ["<b>📅 Рейсы по дням:</b>"]
+    buttons = []
+    for idx, day in enumerate(days):
+        date_label = day["date"][:5]
+        if day["min_miles"] is None:
+            lines.append(f"{date_label}: {'нет рейсов за мили' if day['flights'] == 0 else 'стоимость недоступна'}")
+        else:
+            rubles = f" + {day['min_rubles']} руб." if day["min_rubles"] is not None else ""
+            star = "⭐ " if day is best else ""
+            lines.append(f"{star}{date_label}: от {day['min_miles']} миль{rubles}, рейсов: {day['flights']}, мест: {day['seats']}")
+        if day["flights"]:
+            buttons.append(types.InlineKeyboardButton(
+                text=f"{date_label} · {day['min_miles'] if day['min_miles'] is not None else '—'}",
+                callback_data=f"flexday:{search_id}:{idx}"
+            ))
+    
+    if best is None and not buttons:
+        lines.append("\n❗️ Рейсов за мили в эти даты не найдено. Попробуйте другие даты.")
+    else:
+        lines.append("\nНажмите на день, чтобы посмотреть рейсы подробно.")
+    
+    rows = [buttons[i:i + 2] for i in range(0, len(buttons), 2)]
+    markup = types.InlineKeyboardMarkup(inline_keyboard=rows + NEW_SEARCH_ROWS)
+    await message.answer("\n".join(lines), parse_mode="HTML", reply_markup=markup)
+
+# Поиск по многим направлениям: сводка по направлениям, подробности - по кнопке (из кэша)
+async def process_destinations_search(message, user_data, destinations):
+    await message.answer(
+        f"🔍 Ищу рейсы из {user_data['from_city']} на {user_data['depart_date']}: "
+        f"{len(destinations)} направлений"
+    )
+    status_message = await message.answer("🕒 Начинаю поиск по направлениям...")
+    status_info = [status_message]
+    
+    async def update_status(text):
+        try:
+            await status_info[0].edit_text(text)
+        except Exception:
+            status_info[0] = await message.answer(text)
+    
+    status = status_pipeline.channel(message.chat.id, update_status)
+    
+    async def run_search():
+        found = []
+        async for code, _, summary in search_destinations(
+            from_city=user_data['from_city'],
+            destinations=destinations,
+            depart_date=user_data['depart_date'],
+            adults_count=user_data['adults_count'],
+            children_count=user_data['children_count'],
+            class_type=user_data['class_type'],
+            flight_filter=user_data['flight_filter'],
+            max_sessions=FLEX_SEARCH_SESSIONS
+        ):
+            found.append((code, summary))
+            await status(f"✈️ проверено направлений: {len(found)}/{len(destinations)} (последнее - {code})")
+        return found
+    
+    try:
+        found = await search_scheduler.submit(message.chat.id, run_search, status)
+        await status.flush()
+    finally:
+        status.close()
+    
+    if found is None:
+        # Поиск отменен: пользователь начал новый поиск
+        return
+    
+    # Сначала самые дешевые по милям направления, затем без цены, затем ошибки
+    found.sort(key=lambda entry: (entry[1]["min_miles"] is None, entry[1]["error"] is not None, entry[1]["min_miles"] or 0))
+    codes = [code for code, summary in found if summary["flights"]]
+    search_id = secrets.token_urlsafe(8)
+    destination_searches.set(search_id, (message.chat.id, user_data, codes))
+    
+    lines = [f"<b>🌍 Рейсы из {user_data['from_city']} на {user_data['depart_date']}:</b>"]
+    buttons = []
+    for code, summary in found:
+        if summary["error"] is not None:
+            lines.append(f"{code}: {summary['error']}")
+        elif summary["min_miles"] is None:
+            lines.append(f"{code}: {'нет рейсов за мили' if summary['flights'] == 0 else 'стоимость недоступна'}")
+        else:
+            rubles = f" + {summary['min_rubles']} руб." if summary["min_rubles"] is not None else ""
+            lines.append(f"{code}: от {summary['min_miles']} миль{rubles}, рейсов: {summary['flights']}, мест: {summary['seats']}")
+        if summary["flights"]:
+            buttons.append(types.InlineKeyboardButton(
+                text=f"{code} · {summary['min_miles'] if summary['min_miles'] is not None else '—'}",
+                callback_data=f"dest:{search_id}:{codes.index(code)}"
+            ))
+    
+    if not buttons:
+        lines.append("\n❗️ Рейсов за мили в эти направления не найдено. Попробуйте другую дату.")
+    else:
+        lines.append("\nНажмите на направление, чтобы посмотреть рейсы подробно.")
+    
+    rows = [buttons[i:i + 2] for i in range(0, len(buttons), 2)]
+    markup = types.InlineKeyboardMarkup(inline_keyboard=rows + NEW_SEARCH_ROWS)
+    await message.answer("\n".join(lines), parse_mode="HTML", reply_markup=markup)
 
 # Выносим обработку результатов поиска в отдельную функцию для переиспользования
-async def process_search_results(message, state, search_result):
+async def process_search_results(message, state, search_result, preview_message=None):
+    # Превью с частичными результатами заменяется итоговой страницей, а при ошибке удаляется
+    if preview_message is not None and ("error" in search_result or not any(search_result.values())):
+        try:
+            await preview_message.delete()
+        except Exception:
+            pass
+        preview_message = None
+    
     # Проверяем, есть ли ошибка в результате
     if "error" in search_result:
         # Обработка разных типов ошиasync def process_search_resultsбок
@@ -455,25 +864,29 @@ async def process_search_results(message, state, search_result):
         await message.answer("Хотите начать новый поиск?", reply_markup=markup)
         return
             
-    # Отправляем краткую информацию о найденных рейсах
+    # Собираем все рейсы в блоки и упаковываем их в страницы по 4096 символов
+    blocks = []
     if there_flights:
-        await message.answer(f"✅ Найдено {len(there_flights)} рейсов туда")
-        
-        # Отправляем информацию о каждом рейсе туда
-        for flight in there_flights:
-            flight_info = format_flight_info(flight, "туда")
-            await message.answer(flight_info, parse_mode="HTML")
+        blocks.append(f"✅ Найдено {len(there_flights)} рейсов туда")
+        blocks.extend(format_flight_info(flight, "туда") for flight in there_flights)
     
     if back_flights:
-        await message.answer(f"✅ Найдено {len(back_flights)} рейсов обратно")
-        
-        # Отправляем информацию о каждом рейсе обратно
-        for flight in back_flights:
-            flight_info = format_flight_info(flight, "обратно")
-            await message.answer(flight_info, parse_mode="HTML")
+        blocks.append(f"✅ Найдено {len(back_flights)} рейсов обратно")
+        blocks.extend(format_flight_info(flight, "обратно") for flight in back_flights)
+    
+    blocks.append("✅ Поиск завершен! Используйте /search для нового поиска.")
+    pages = pack_blocks(blocks)
     
-    # Отправляем сообщение, что поиск завершен
-    await message.answer("✅ Поиск завершен! Используйте /search для нового поиска.")
+    # Отправляем первую страницу, остальные открываются кнопками пагинации
+    set_id = result_pages.add(message.chat.id, pages)
+    markup = result_pages.keyboard(set_id, 0, len(pages), NEW_SEARCH_ROWS)
+    if preview_message is not None:
+        try:
+            await preview_message.edit_text(pages[0], parse_mode="HTML", reply_markup=markup)
+            return
+        except Exception:
+            pass
+    await message.answer(pages[0], parse_mode="HTML", reply_markup=markup)
 
 def format_flight_info(flight, direction):
     """
@@ -554,43 +967,122 @@ async def process_new_search(callback_query: types.CallbackQuery, state: FSMCont
     # Сначала отправляем ответ на callback
     await callback_query.answer()
     
+    # Новый поиск отменяет предыдущий поиск этого чата
+    search_scheduler.cancel(callback_query.message.chat.id)
+    
     # Начинаем новый поиск
     await state.set_state(FlightSearch.waiting_for_from)
     await callback_query.message.answer("Начинаем новый поиск! Укажите город отправления (например, Москва или MOW):")
 
-# Обработчик кнопки "Показать рейсы с пересадками"
-@dp.callback_query(lambda c: c.data == "show_connections")
-async def process_show_connections(callback_query: types.CallbackQuery, state: FSMContext):
-    await callback_query.answer()
-    
-    # Сохраняем предыдущие данные пользователя
-    user_data = await state.get_data()
+# Повтор последнего поиска с другим фильтром типа рейса (рейсы берутся из кэша).
+# Данные диалога к этому моменту уже очищены, поэтому параметры берутся из последнего поиска
+async def switch_flight_filter(callback_query, state, flight_filter):
+    user_data = await last_search_context(state).get_data()
+    if not user_data:
+        await callback_query.answer("Результаты устарели, повторите поиск", show_alert=True)
+        return
     
-    # Обновляем данные с новым типом рейса
-    user_data["flight_filter"] = "connections"
-    await state.set_data(user_data)
+    await callback_query.answer()
+    user_data["flight_filter"] = flight_filter
     
     # Запускаем поиск с новым фильтром
     await process_search_with_data(callback_query.message, state, user_data)
 
+# Обработчик кнопки "Показать рейсы с пересадками"
+@dp.callback_query(lambda c: c.data == "show_connections")
+async def process_show_connections(callback_query: types.CallbackQuery, state: FSMContext):
+    await switch_flight_filter(callback_query, state, "connections")
+
 # Обработчик кнопки "Показать прямые рейсы"
 @dp.callback_query(lambda c: c.data == "show_direct")
 async def process_show_direct(callback_query: types.CallbackQuery, state: FSMContext):
-    await callback_query.answer()
+    await switch_flight_filter(callback_query, state, "direct")
+
+# Обработчик кнопки дня в сводке по диапазону дат: подробные результаты берутся из кэша поиска
+@dp.callback_query(lambda c: c.data and c.data.startswith("flexday:"))
+async def process_flex_day(callback_query: types.CallbackQuery, state: FSMContext):
+    _, search_id, idx = callback_query.data.split(":")
+    owner, user_data = flex_searches.get(search_id) or (None, None)
+    if owner != callback_query.message.chat.id:
+        await callback_query.answer("Результаты устарели, повторите поиск", show_alert=True)
+        return
     
-    # Сохраняем предыдущие данные пользователя
-    user_data = await state.get_data()
+    await callback_query.answer()
+    day_data = dict(user_data, depart_date=user_data['depart_dates'][int(idx)], depart_dates=None)
+    # Выбранный день становится текущим поиском: от него считаются кнопки фильтра и /watch
+    await state.set_data(day_data)
+    await process_search_with_data(callback_query.message, state, day_data)
+
+# Обработчик кнопки направления в сводке /anywhere: подробные результаты берутся из кэша поиска
+@dp.callback_query(lambda c: c.data and c.data.startswith("dest:"))
+async def process_destination(callback_query: types.CallbackQuery, state: FSMContext):
+    _, search_id, idx = callback_query.data.split(":")
+    owner, user_data, codes = destination_searches.get(search_id) or (None, None, None)
+    if owner != callback_query.message.chat.id:
+        await callback_query.answer("Результаты устарели, повторите поиск", show_alert=True)
+        return
     
-    # Обновляем данные с новым типом рейса
-    user_data["flight_filter"] = "direct"
-    await state.set_data(user_data)
+    await callback_query.answer()
+    destination_data = dict(user_data, to_city=codes[int(idx)])
+    # Выбранное направление становится текущим поиском: от него считаются кнопки фильтра и /watch
+    await state.set_data(destination_data)
+    await process_search_with_data(callback_query.message, state, destination_data)
+
+# Обработчик кнопок пагинации результатов: страница берется из памяти и заменяет текст сообщения
+@dp.callback_query(lambda c: c.data and c.data.startswith(PAGE_CALLBACK_PREFIX))
+async def process_result_page(callback_query: types.CallbackQuery):
+    set_id, page = parse_page_callback(callback_query.data) or (None, 0)
+    found = result_pages.get(callback_query.message.chat.id, set_id, page) if set_id else None
+    if found is None:
+        await callback_query.answer("Результаты устарели, повторите поиск", show_alert=True)
+        return
     
-    # Запускаем поиск с новым фильтром
-    await process_search_with_data(callback_query.message, state, user_data)
+    text, total = found
+    await callback_query.answer()
+    try:
+        await callback_query.message.edit_text(text, parse_mode="HTML", reply_markup=result_pages.keyboard(set_id, page, total, NEW_SEARCH_ROWS))
+    except Exception:
+        # Нажата кнопка текущей страницы - текст не изменился
+        pass
     
 # Запуск бота
 async def main():
-    await dp.start_polling(bot)
+    # Selenium работает в отдельных потоках, чтобы не блокировать обработку сообщений
+    configure_executor(max_workers=SELENIUM_WORKERS)
+    configure_search_cache(max_entries=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+    if RESULT_STORE_PATH:
+        await start_result_store(RESULT_STORE_PATH, max_age=RESULT_STORE_MAX_AGE)
+    metrics_server = MetricsServer(host=METRICS_HOST, port=METRICS_PORT) if METRICS_PORT else None
+    if metrics_server:
+        await metrics_server.start()
+    metrics_sink = JsonLinesSink(METRICS_JSONL) if METRICS_JSONL else None
+    METRICS.set_sink(metrics_sink)
+    if SEARCH_BACKEND == 'http':
+        await start_search_backend(HttpSearchBackend(SEARCH_API_URL, pool_size=HTTP_POOL_SIZE))
+    else:
+        # Заранее запускаем браузеры, чтобы поиск не ждал холодного старта Chrome
+        await start_browser_pool(size=BROWSER_POOL_SIZE, max_uses=BROWSER_MAX_USES, profile=BROWSER_PROFILE)
+    if FSM_STORAGE_PATH:
+        await storage.start()
+    search_scheduler.start()
+    await watcher.start()
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await watcher.close()
+        await search_scheduler.close()
+        await stop_browser_pool()
+        await stop_search_backend()
+        await stop_result_store()
+        # диспетчер закрывает хранилище при остановке; повторный вызов ничего не делает
+        await storage.close()
+        shutdown_executor()
+        METRICS.set_sink(None)
+        if metrics_sink:
+            metrics_sink.close()
+        if metrics_server:
+            await metrics_server.close()
+        stop_logging()
 
 if __name__ == '__main__':
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,203 @@
+# browser_pool.py - пул заранее запущенных браузеров для поиска
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from selenium_executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+
+class PooledBrowser:
+    """Браузер, принадлежащий пулу, его место в пуле и счетчик использований"""
+
+    def __init__(self, driver, wait, slot):
+        self.driver = driver
+        self.wait = wait
+        self.slot = slot
+        self.uses = 0
+        self.created_at = time.monotonic()
+
+
+class BrowserPool:
+    """
+    Пул заранее запущенных экземпляров браузера.
+
+    Браузеры запускаются при старте бота и выдаются поиску через
+    контекстный менеджер acquire(). После max_uses использований, при падении
+    браузера или при ошибке внутри блока with браузер закрывается, а замена
+    запускается в фоне, чтобы следующий запрос не ждал холодного старта Chrome.
+
+    У каждого браузера есть место в пуле (0..size-1), которое передается в factory -
+    по нему браузер получает свои ресурсы (например, каталог дискового кэша). Замена
+    запускается на том же месте только после закрытия предшественника.
+    """
+
+    def __init__(self, factory, size=2, max_uses=20):
+        """
+        Args:
+            factory (callable): корутина (место в пуле) -> (driver, wait)
+            size (int): количество браузеров в пуле
+            max_uses (int): после скольких поисков браузер перезапускается
+        """
+        self.factory = factory
+        self.size = max(1, int(size))
+        self.max_uses = max(1, int(max_uses))
+        self._idle = deque()
+        self._total = 0  # браузеры в пуле: свободные, выданные и запускаемые
+        self._free_slots = list(range(self.size))  # места, на которых сейчас нет браузера
+        self._cond = asyncio.Condition()
+        self._background = set()
+        self._closed = False
+
+    async def start(self):
+        """Запускает все браузеры пула заранее"""
+        async with self._cond:
+            slots = [self._take_slot() for _ in range(self.size - self._total)]
+        launched = await asyncio.gather(*(self._launch(slot) for slot in slots), return_exceptions=True)
+        async with self._cond:
+            for slot, browser in zip(slots, launched):
+                if isinstance(browser, Exception):
+                    logger.error("Не удалось запустить браузер для пула: %s", browser)
+                    self._release_slot(slot)
+                else:
+                    self._idle.append(browser)
+            self._cond.notify_all()
+
+    async def close(self):
+        """Закрывает все свободные браузеры и запрещает выдачу новых"""
+        self._closed = True
+        # дожидаемся запускаемых замен и закрытий, чтобы не оставить живой Chrome
+        while self._background:
+            await asyncio.gather(*list(self._background), return_exceptions=True)
+        async with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for browser in idle:
+            await self._quit(browser)
+            await self._forget(browser.slot)
+
+    @asynccontextmanager
+    async def acquire(self):
+        """
+        Выдает браузер из пула на время блока with.
+
+        Yields:
+            tuple: (driver, wait) - экземпляр WebDriver и WebDriverWait
+        """
+        browser = await self._checkout()
+        broken = False
+        try:
+            yield browser.driver, browser.wait
+        except BaseException:
+            # состояние браузера после ошибки неизвестно, лучше его заменить
+            broken = True
+            raise
+        finally:
+            await self._checkin(browser, broken)
+
+    def stats(self):
+        """Возвращает текущее состояние пула"""
+        return {"size": self.size, "total": self._total, "idle": len(self._idle)}
+
+    def _take_slot(self):
+        self._total += 1
+        return self._free_slots.pop(0)
+
+    def _release_slot(self, slot):
+        self._total -= 1
+        self._free_slots.append(slot)
+
+    async def _checkout(self):
+        while True:
+            async with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Browser pool is closed")
+                    if self._idle:
+                        browser = self._idle.popleft()
+                        break
+                    if self._total < self.size:
+                        # пул не заполнен (например, замена не запустилась) - запускаем сами
+                        slot = self._take_slot()
+                        browser = None
+                        break
+                    await self._cond.wait()
+
+            if browser is None:
+                try:
+                    browser = await self._launch(slot)
+                except Exception:
+                    await self._forget(slot)
+                    raise
+                return browser
+
+            if await self._is_alive(browser):
+                return browser
+
+            # браузер упал, пока лежал в пуле - заменяем и берем следующий
+            await self._retire(browser)
+
+    async def _checkin(self, browser, broken):
+        browser.uses += 1
+        if broken or self._closed or browser.uses >= self.max_uses:
+            await self._retire(browser)
+            return
+        async with self._cond:
+            self._idle.append(browser)
+            self._cond.notify()
+
+    async def _retire(self, browser):
+        """Закрывает браузер и запускает замену на его месте в фоне"""
+        self._spawn(self._replace(browser))
+
+    async def _replace(self, old_browser):
+        # место (и его кэш) освобождается только после закрытия предшественника
+        await self._quit(old_browser)
+        if self._closed:
+            await self._forget(old_browser.slot)
+            return
+        try:
+            browser = await self._launch(old_browser.slot)
+        except Exception as e:
+            logger.error("Не удалось запустить браузер на замену: %s", e)
+            await self._forget(old_browser.slot)
+            return
+        if self._closed:
+            await self._quit(browser)
+            await self._forget(browser.slot)
+            return
+        async with self._cond:
+            self._idle.append(browser)
+            self._cond.notify()
+
+    async def _forget(self, slot):
+        async with self._cond:
+            self._release_slot(slot)
+            self._cond.notify()
+
+    async def _launch(self, slot):
+        driver, wait = await self.factory(slot)
+        return PooledBrowser(driver, wait, slot)
+
+    async def _is_alive(self, browser):
+        try:
+            await run_blocking(getattr, browser.driver, "current_url")
+            return True
+        except Exception:
+            return False
+
+    async def _quit(self, browser):
+        try:
+            await run_blocking(browser.driver.quit)
+        except Exception as e:
+            logger.warning("Ошибка при закрытии браузера: %s", e)
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
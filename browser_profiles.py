@@ -0,0 +1,155 @@
+# browser_profiles.py - профили запуска Chrome для поиска
+import logging
+import os
+import shutil
+import tempfile
+
+from selenium import webdriver
+
+logger = logging.getLogger(__name__)
+
+# Дисковый кэш браузеров пула: скрипты и стили сайта скачиваются один раз, а не при каждом
+# перезапуске браузера. Chrome не умеет работать с одним кэшем из нескольких процессов,
+# поэтому у каждого места пула свой каталог; браузер на замену получает каталог предшественника.
+# Новый каталог заполняется копией seed - кэша, сохраненного после остановки пула.
+CACHE_ROOT = os.path.join(tempfile.gettempdir(), "aeroflot-bot-chrome-cache")
+CACHE_SEED_DIR = os.path.join(CACHE_ROOT, "seed")
+DISK_CACHE_SIZE = 200 * 1024 * 1024
+
+# Ресурсы, которые поиску не нужны: картинки, шрифты, медиа и счетчики аналитики
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mp3",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*mc.yandex.ru*", "*top-fwz1.mail.ru*", "*vk.com/rtrg*", "*facebook.net*",
+    "*criteo*", "*hotjar*", "*mindbox*",
+]
+
+# Профили запуска:
+#   full     - обычное окно браузера со всеми ресурсами (как раньше)
+#   headless - то же без окна
+#   lean     - без окна, фиксированный размер, без GPU, картинок, шрифтов и аналитики,
+#              с дисковым кэшем места в пуле; driver.get возвращает управление после DOMContentLoaded
+BROWSER_PROFILES = {
+    "full": {
+        "headless": False,
+        "window_size": None,
+        "disable_gpu": False,
+        "block_resources": False,
+        "disk_cache": False,
+        "page_load_strategy": "normal",
+    },
+    "headless": {
+        "headless": True,
+        "window_size": (1920, 1080),
+        "disable_gpu": False,
+        "block_resources": False,
+        "disk_cache": False,
+        "page_load_strategy": "normal",
+    },
+    "lean": {
+        "headless": True,
+        "window_size": (1366, 900),
+        "disable_gpu": True,
+        "block_resources": True,
+        "disk_cache": True,
+        "page_load_strategy": "eager",
+    },
+}
+
+
+def get_profile(name):
+    """
+    Возвращает настройки профиля по названию
+
+    Raises:
+        ValueError: если профиль неизвестен
+    """
+    try:
+        return BROWSER_PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown browser profile: {name}") from None
+
+
+def cache_dir_for(slot):
+    """Каталог дискового кэша места пула (создается из seed, если его еще нет)"""
+    path = os.path.join(CACHE_ROOT, f"slot-{slot}")
+    if not os.path.isdir(path):
+        try:
+            if os.path.isdir(CACHE_SEED_DIR):
+                shutil.copytree(CACHE_SEED_DIR, path)
+            else:
+                os.makedirs(path)
+        except OSError as e:
+            logger.warning("Не удалось подготовить кэш браузера %s: %s", path, e)
+    return path
+
+
+def save_cache_seed(slot=0):
+    """
+    Сохраняет кэш места пула как seed для новых мест (блокирующий вызов).
+    Вызывается, только когда ни один браузер пула не запущен.
+    """
+    source = os.path.join(CACHE_ROOT, f"slot-{slot}")
+    if not os.path.isdir(source):
+        return
+    try:
+        shutil.rmtree(CACHE_SEED_DIR, ignore_errors=True)
+        shutil.copytree(source, CACHE_SEED_DIR)
+    except OSError as e:
+        logger.warning("Не удалось сохранить кэш браузера: %s", e)
+
+
+def build_chrome_options(name, cache_slot=None):
+    """
+    Собирает ChromeOptions для профиля
+
+    Args:
+        name (str): название профиля (full, headless, lean)
+        cache_slot (int, optional): место в пуле браузеров; дисковый кэш профиля включается
+            только для браузеров пула, у каждого места свой каталог
+
+    Returns:
+        ChromeOptions: настройки запуска Chrome
+    """
+    profile = get_profile(name)
+    options = webdriver.ChromeOptions()
+    options.page_load_strategy = profile["page_load_strategy"]
+
+    if profile["headless"]:
+        options.add_argument("--headless=new")
+    if profile["window_size"]:
+        options.add_argument("--window-size={},{}".format(*profile["window_size"]))
+    if profile["disable_gpu"]:
+        options.add_argument("--disable-gpu")
+        options.add_argument("--disable-extensions")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--mute-audio")
+    if profile["block_resources"]:
+        # картинки отключаем и настройкой, чтобы браузер даже не пытался их декодировать
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    if profile["disk_cache"] and cache_slot is not None:
+        options.add_argument(f"--disk-cache-dir={cache_dir_for(cache_slot)}")
+        options.add_argument(f"--disk-cache-size={DISK_CACHE_SIZE}")
+    return options
+
+
+def apply_profile(driver, name):
+    """
+    Применяет настройки профиля, которые задаются уже после запуска браузера (блокирующий вызов)
+
+    Args:
+        driver: экземпляр WebDriver
+        name (str): название профиля
+    """
+    profile = get_profile(name)
+    if not profile["headless"]:
+        driver.maximize_window()
+    if profile["block_resources"]:
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+        except Exception as e:
+            logger.warning("Не удалось заблокировать лишние ресурсы: %s", e)
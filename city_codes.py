@@ -1,4 +1,6 @@
 # city_codes.py - словарь соответствия IATA-кодов и городов
+from city_fuzzy import FuzzyCityMatcher
+from city_index import CityIndex
 
 CITY_TO_IATA = {
     "санкт-петербург": "LED", 
@@ -320,6 +322,28 @@ CITY_TO_IATA = {
     "южно-курильск": "DEE",
 }
 
+# Популярность направлений (от 0 до 1): при равноценных вариантах с опечаткой
+# выше предлагаются популярные города
+CITY_POPULARITY = {
+    "москва": 1.0,
+    "санкт-петербург": 0.9,
+    "сочи": 0.8,
+    "стамбул": 0.7,
+    "дубай": 0.7,
+    "калининград": 0.6,
+    "екатеринбург": 0.6,
+    "новосибирск": 0.6,
+    "казань": 0.5,
+    "минеральные воды": 0.5,
+    "краснодар": 0.5,
+    "владивосток": 0.4,
+    "анталья": 0.4,
+}
+
+# Индексы по словарю строятся один раз при импорте (см. city_index.py и city_fuzzy.py)
+CITY_INDEX = CityIndex(CITY_TO_IATA)
+CITY_MATCHER = FuzzyCityMatcher(CITY_TO_IATA, CITY_POPULARITY)
+
 def find_city(query, max_results=5):
     """
     Поиск города по части названия или коду IATA
@@ -336,29 +360,17 @@ def find_city(query, max_results=5):
     
     # Если это похоже на IATA-код (3 буквы), ищем обратное соответствие
     if len(query) == 3 and query.isalpha():
-        query_upper = query.upper()
-        for city, code in CITY_TO_IATA.items():
-            if code == query_upper:
-                return [(city.capitalize(), code)]  # Если нашли точное совпадение, сразу возвращаем
-            elif code.startswith(query[0].upper()):
-                matches.append((city.capitalize(), code))
-                if len(matches) >= max_results:
-                    break
+        city = CITY_INDEX.city_for_code(query)
+        if city is not None:
+            return [(city.capitalize(), query.upper())]  # Если нашли точное совпадение, сразу возвращаем
+        matches = [(city.capitalize(), code) for city, code in CITY_INDEX.codes_starting_with(query, max_results)]
     
     # Иначе ищем совпадения по названию города
     else:
-        for city, code in CITY_TO_IATA.items():
-            if query in city:
-                matches.append((city.capitalize(), code))
-                if len(matches) >= max_results:
-                    break
+        matches = [(city.capitalize(), CITY_TO_IATA[city]) for city in CITY_INDEX.cities_containing(query, max_results)]
     
     # Если ничего не нашлось по названию, пробуем найти по первым буквам
     if not matches and len(query) >= 2:
-        for city, code in CITY_TO_IATA.items():
-            if city.startswith(query):
-                matches.append((city.capitalize(), code))
-                if len(matches) >= max_results:
-                    break
+        matches = [(city.capitalize(), CITY_TO_IATA[city]) for city in CITY_INDEX.cities_with_prefix(query, max_results)]
     
     return matches
@@ -0,0 +1,209 @@
+# city_fuzzy.py - поиск города с опечатками и транслитерацией
+import re
+from functools import lru_cache
+
+# Транслитерация кириллицы в латиницу; латинский ввод приводится к тому же виду
+TRANSLIT = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh",
+    "з": "z", "и": "i", "й": "i", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "kh", "ц": "ts",
+    "ч": "ch", "ш": "sh", "щ": "sch", "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu",
+    "я": "ya",
+}
+
+# Варианты латинского написания, которые сводятся к одному ключу (moskva / moskwa / moscva)
+_LATIN_VARIANTS = [
+    ("shch", "sh"), ("sch", "sh"), ("kh", "h"), ("ck", "k"), ("ph", "f"),
+    ("x", "ks"), ("w", "v"), ("q", "k"), ("c", "k"), ("j", "i"), ("y", "i"),
+]
+_NON_LETTERS = re.compile(r"[^a-z]")
+_REPEATS = re.compile(r"(.)\1+")
+
+
+def city_key(text):
+    """
+    Ключ для нечеткого сравнения: транслитерация в латиницу, без пробелов, дефисов
+    и двойных букв ("Санкт-Петербург" и "sankt peterburg" дают один ключ)
+    """
+    key = "".join(TRANSLIT.get(char, char) for char in text.lower())
+    key = _NON_LETTERS.sub("", key)
+    # "ch" из транслитерации не должно превратиться в "kh" при замене c -> k
+    key = key.replace("ch", "\x00")
+    for variant, canonical in _LATIN_VARIANTS:
+        key = key.replace(variant, canonical)
+    key = key.replace("\x00", "ch")
+    return _REPEATS.sub(r"\1", key)
+
+
+def edit_distance(a, b, max_distance):
+    """
+    Расстояние Дамерау-Левенштейна (оптимальное выравнивание строк) с отсечением:
+    перестановка двух соседних букв ("мосвка") считается одной правкой, а не двумя.
+    Если расстояние больше max_distance, возвращается max_distance + 1
+
+    Args:
+        a (str): первая строка
+        b (str): вторая строка
+        max_distance (int): граница, дальше которой точное значение не нужно
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if len(a) > len(b):
+        a, b = b, a
+
+    before = None
+    previous = list(range(len(a) + 1))
+    for i, char_b in enumerate(b, 1):
+        current = [i]
+        row_min = i
+        for j, char_a in enumerate(a, 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            if i > 1 and j > 1 and char_a == b[i - 2] and a[j - 2] == char_b and char_a != char_b:
+                value = min(value, before[j - 2] + 1)
+            current.append(value)
+            if value < row_min:
+                row_min = value
+        # значения следующих строк не меньше минимума этой строки
+        if row_min > max_distance:
+            return max_distance + 1
+        before, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+
+def _deletions(key, max_deletions):
+    """Все строки, получаемые из key удалением не больше max_deletions символов (включая сам key)"""
+    variants = {key}
+    frontier = {key}
+    for _ in range(max_deletions):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        variants |= frontier
+    return variants
+
+
+class DeletionIndex:
+    """
+    Индекс для поиска ключей в пределах расстояния правок (метод симметричных удалений).
+
+    Для каждого ключа заранее сохраняются все варианты с удалением до max_distance символов.
+    Если два ключа отличаются не больше чем на d правок, у них есть общий такой вариант
+    (перестановка соседних букв тоже сводится к одному удалению с каждой стороны),
+    поэтому кандидаты находятся несколькими обращениями к словарю, а точное расстояние
+    считается только для них. В отличие от BK-дерева, поиск не обходит значительную
+    часть словаря на коротких строках.
+    """
+
+    def __init__(self, max_distance=2):
+        self.max_distance = max_distance
+        self._variants = {}  # вариант с удалениями -> ключи
+        self._keys = set()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key):
+        """Добавляет ключ (повторное добавление ничего не меняет)"""
+        if key in self._keys:
+            return
+        self._keys.add(key)
+        for variant in _deletions(key, self.max_distance):
+            self._variants.setdefault(variant, []).append(key)
+
+    def search(self, key, max_distance):
+        """
+        Ищет ключи не дальше max_distance (но не дальше границы, с которой построен индекс)
+
+        Returns:
+            list: [(расстояние, ключ), ...] по возрастанию расстояния
+        """
+        max_distance = min(max_distance, self.max_distance)
+        candidates = set()
+        for variant in _deletions(key, max_distance):
+            candidates.update(self._variants.get(variant, ()))
+        found = []
+        for candidate in candidates:
+            distance = edit_distance(key, candidate, max_distance)
+            if distance <= max_distance:
+                found.append((distance, candidate))
+        found.sort()
+        return found
+
+
+def max_typos(key):
+    """Сколько опечаток допускаем в зависимости от длины ввода"""
+    if len(key) <= 3:
+        return 0
+    if len(key) <= 5:
+        return 1
+    return 2
+
+
+class FuzzyCityMatcher:
+    """
+    Нечеткий поиск города: опечатки, ввод латиницей и популярность города.
+
+    Названия из словаря переводятся в ключи (см. city_key) и складываются в индекс
+    симметричных удалений (см. DeletionIndex).
+    Кандидаты ранжируются по расстоянию до ввода; при равном расстоянии выше
+    оказываются популярные города.
+    """
+
+    def __init__(self, city_to_iata, popularity=None):
+        """
+        Args:
+            city_to_iata (dict): название города в нижнем регистре -> IATA-код
+            popularity (dict, optional): название города -> вес популярности от 0 до 1
+        """
+        self.city_to_iata = city_to_iata
+        self.popularity = popularity or {}
+        self._cities_by_key = {}
+        self._index = DeletionIndex(max_distance=2)
+        for city in city_to_iata:
+            key = city_key(city)
+            self._cities_by_key.setdefault(key, []).append(city)
+            self._index.add(key)
+        # результаты для одинакового ввода не меняются, поэтому кэшируются
+        self.suggest = lru_cache(maxsize=1024)(self._suggest)
+
+    def _suggest(self, query, limit=3):
+        """
+        Ранжированные варианты города для ввода пользователя
+
+        Args:
+            query (str): ввод пользователя (кириллица или латиница, с опечатками)
+            limit (int): максимальное количество вариантов
+
+        Returns:
+            tuple: ((город, код, расстояние), ...) от лучшего варианта к худшему
+        """
+        key = city_key(query)
+        if not key:
+            return ()
+        candidates = []
+        for distance, candidate_key in self._index.search(key, max_typos(key)):
+            for city in self._cities_by_key[candidate_key]:
+                # популярность перевешивает разницу меньше чем в одну опечатку
+                score = distance - 0.5 * self.popularity.get(city, 0.0)
+                candidates.append((score, distance, city))
+        candidates.sort()
+        return tuple((city, self.city_to_iata[city], distance) for _, distance, city in candidates[:limit])
+
+    def resolve(self, query):
+        """
+        Однозначно определяет город по вводу с опечаткой или латиницей
+
+        Returns:
+            str: название города из словаря или None, если вариантов нет или они равноценны
+        """
+        suggestions = self.suggest(query, 2)
+        if not suggestions:
+            return None
+        best = suggestions[0]
+        if len(suggestions) > 1 and suggestions[1][2] == best[2]:
+            return None
+        # одна опечатка (или точное совпадение транслитерации) - уверенное исправление
+        return best[0] if best[2] <= 1 else None
+
+    def popular(self, limit=5):
+        """Самые популярные города: [(город, код), ...]"""
+        cities = sorted(self.popularity, key=self.popularity.get, reverse=True)
+        return [(city, self.city_to_iata[city]) for city in cities[:limit] if city in self.city_to_iata]
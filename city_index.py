@@ -0,0 +1,166 @@
+# city_index.py - индексы для быстрого поиска городов по названию и IATA-коду
+# Длина n-грамм для поиска по подстроке; подстроки короче ищутся по n-граммам своей длины
+NGRAM_SIZE = 3
+
+
+class CityIndex:
+    """
+    Индексы словаря город -> IATA-код, построенные один раз.
+
+    - обратный словарь IATA-код -> города;
+    - префиксное дерево по названиям: в каждом узле хранится список городов с этим префиксом;
+    - индекс n-грамм (длиной от 1 до NGRAM_SIZE) для поиска по подстроке.
+
+    Все списки городов хранятся в порядке исходного словаря, поэтому результаты
+    совпадают с тем, что давал последовательный перебор словаря.
+    """
+
+    def __init__(self, city_to_iata, ngram_size=NGRAM_SIZE):
+        """
+        Args:
+            city_to_iata (dict): название города в нижнем регистре -> IATA-код
+            ngram_size (int): длина n-грамм индекса подстрок
+        """
+        self.city_to_iata = city_to_iata
+        self.ngram_size = ngram_size
+        self._cities = list(city_to_iata)
+        self._code_to_cities = {}
+        self._codes_by_initial = {}
+        self._trie = {"cities": [], "children": {}}
+        self._ngrams = {}
+
+        for position, (city, code) in enumerate(city_to_iata.items()):
+            self._code_to_cities.setdefault(code, []).append(city)
+            if len(self._code_to_cities[code]) == 1:
+                self._codes_by_initial.setdefault(code[:1], []).append(code)
+            self._add_to_trie(city, position)
+            self._add_ngrams(city, position)
+
+    def _add_to_trie(self, city, position):
+        node = self._trie
+        node["cities"].append(position)
+        for char in city:
+            node = node["children"].setdefault(char, {"cities": [], "children": {}})
+            node["cities"].append(position)
+        # узел, где название заканчивается, помнит позицию города
+        node["city"] = position
+
+    def _add_ngrams(self, city, position):
+        for size in range(1, self.ngram_size + 1):
+            for start in range(len(city) - size + 1):
+                postings = self._ngrams.setdefault(city[start:start + size], [])
+                if not postings or postings[-1] != position:
+                    postings.append(position)
+
+    def code_of(self, city_or_code):
+        """
+        Возвращает IATA-код по названию города или коду
+
+        Args:
+            city_or_code (str): название города (в любом регистре) или IATA-код
+
+        Returns:
+            str: IATA-код или None, если город неизвестен
+        """
+        value = city_or_code.strip()
+        if len(value) == 3 and value.upper() in self._code_to_cities:
+            return value.upper()
+        return self.city_to_iata.get(value.lower())
+
+    def cities_for_code(self, code):
+        """Города с указанным IATA-кодом (в порядке словаря)"""
+        return list(self._code_to_cities.get(code.upper(), []))
+
+    def city_for_code(self, code):
+        """Основной (первый в словаре) город для IATA-кода или None"""
+        cities = self._code_to_cities.get(code.upper())
+        return cities[0] if cities else None
+
+    def codes_starting_with(self, letter, limit=None):
+        """
+        Пары (город, код) для кодов, начинающихся с буквы
+
+        Args:
+            letter (str): первая буква кода
+            limit (int, optional): максимальное количество результатов
+
+        Returns:
+            list: [(город, код), ...]
+        """
+        codes = self._codes_by_initial.get(letter[:1].upper(), [])
+        return [(self._code_to_cities[code][0], code) for code in codes[:limit]]
+
+    def cities_with_prefix(self, prefix, limit=None):
+        """
+        Города, название которых начинается с префикса (по префиксному дереву)
+
+        Returns:
+            list: названия городов в порядке словаря
+        """
+        node = self._trie
+        for char in prefix.lower():
+            node = node["children"].get(char)
+            if node is None:
+                return []
+        return [self._cities[position] for position in node["cities"][:limit]]
+
+    def cities_containing(self, substring, limit=None):
+        """
+        Города, в названии которых есть подстрока (по индексу n-грамм)
+
+        Returns:
+            list: названия городов в порядке словаря
+        """
+        return [self._cities[position] for position in self._positions_containing(substring.lower())[:limit]]
+
+    def _positions_containing(self, substring):
+        if not substring:
+            return list(range(len(self._cities)))
+        if len(substring) <= self.ngram_size:
+            return self._ngrams.get(substring, [])
+
+        # пересекаем списки n-грамм, начиная с самого короткого, и проверяем кандидатов
+        size = self.ngram_size
+        grams = {substring[start:start + size] for start in range(len(substring) - size + 1)}
+        postings = sorted((self._ngrams.get(gram, []) for gram in grams), key=len)
+        if not postings[0]:
+            return []
+        candidates = set(postings[0])
+        for other in postings[1:]:
+            candidates.intersection_update(other)
+            if not candidates:
+                return []
+        return [position for position in sorted(candidates) if substring in self._cities[position]]
+
+    def cities_within(self, text, limit=None):
+        """
+        Города, название которых целиком входит в текст (например, "москва шереметьево")
+
+        Returns:
+            list: названия городов в порядке словаря
+        """
+        return [self._cities[position] for position in sorted(self._positions_within(text.lower()))[:limit]]
+
+    def cities_overlapping(self, text, limit=None):
+        """
+        Города, в названии которых есть текст, и города, название которых входит в текст
+
+        Returns:
+            list: названия городов в порядке словаря
+        """
+        text = text.lower()
+        positions = self._positions_within(text).union(self._positions_containing(text))
+        return [self._cities[position] for position in sorted(positions)[:limit]]
+
+    def _positions_within(self, text):
+        positions = set()
+        for start in range(len(text)):
+            # спускаемся по дереву от каждой позиции текста и собираем полные названия
+            node = self._trie
+            for end in range(start, len(text)):
+                node = node["children"].get(text[end])
+                if node is None:
+                    break
+                if "city" in node:
+                    positions.add(node["city"])
+        return positions
@@ -0,0 +1 @@
+# conftest.py - корень репозитория попадает в sys.path, и тесты импортируют модули бота напрямую
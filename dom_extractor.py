@@ -0,0 +1,127 @@
+# dom_extractor.py - извлечение данных всех карточек рейсов одним вызовом execute_script
+#
+# Каждый find_element/.text в Selenium - отдельный HTTP-запрос к chromedriver, а на
+# карточку их приходится несколько десятков. Скрипт ниже проходит по всем карточкам
+# прямо в браузере теми же селекторами, что и extract_flight_data, и возвращает
+# простые словари за один запрос.
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Селекторы повторяют XPath из extract_flight_data: contains(@class, ...) -> [class*=...].
+# Текст берется только у видимых элементов, как это делает WebElement.text.
+SNAPSHOT_CARDS_JS = r"""
+var cards = arguments[0];
+
+function isShown(el) {
+    if (!el.getClientRects().length) return false;
+    var style = window.getComputedStyle(el);
+    return style.visibility !== 'hidden' && style.opacity !== '0';
+}
+
+function visibleText(el) {
+    if (!el || !isShown(el)) return '';
+    return (el.innerText || '').replace(/[ \t\u00a0]+/g, ' ').replace(/ *\n */g, '\n').trim();
+}
+
+function textOrDash(root, selector) {
+    var el = root.querySelector(selector);
+    return el ? visibleText(el) : null;
+}
+
+function firstOwnTextContains(el, needle) {
+    // аналог contains(text(), ...) в XPath: проверяется первый текстовый узел элемента
+    for (var i = 0; i < el.childNodes.length; i++) {
+        var node = el.childNodes[i];
+        if (node.nodeType === 3) return node.nodeValue.indexOf(needle) !== -1;
+    }
+    return false;
+}
+
+function snapshotSegment(seg) {
+    var arrTime = null;
+    var arrBlock = seg.querySelector(
+        ':scope div[class*="time-destination__to"] > div[class*="time-destination__time"]');
+    if (arrBlock) {
+        var arrSpan = arrBlock.querySelector('span');
+        if (arrSpan) {
+            arrTime = visibleText(arrSpan);
+            var plusDay = arrBlock.querySelector('span[class*="time-destination__plusday"]');
+            if (plusDay) arrTime = arrTime + ' ' + visibleText(plusDay);
+        }
+    }
+
+    var flightNumber = textOrDash(seg,
+        ':scope div[class*="flight-search__plane-number"]:not([class*="hide--above-desktop"])');
+    if (flightNumber === null) {
+        flightNumber = textOrDash(seg, ':scope div[class*="flight-search__plane-number"]');
+    }
+
+    return {
+        depart_city: textOrDash(seg, ':scope span[class*="helptext--left"]'),
+        arrive_city: textOrDash(seg, ':scope span[class*="helptext--right"]'),
+        dep_time: textOrDash(seg,
+            ':scope div[class*="time-destination__from"] span[class*="time-destination__time"]'),
+        arr_time: arrTime,
+        iata_from: textOrDash(seg,
+            ':scope div[class*="time-destination__from"] > span[class*="time-destination__airport"]'),
+        iata_to: textOrDash(seg,
+            ':scope div[class*="time-destination__to"] > span[class*="time-destination__airport"]'),
+        airline: textOrDash(seg, ':scope div[class*="flight-search__company-name"]'),
+        flight_number: flightNumber,
+        plane_model: textOrDash(seg, ':scope div[class*="flight-search__plane-model"]')
+    };
+}
+
+return cards.map(function (card) {
+    var transferText = null;
+    var spans = card.querySelectorAll('span');
+    for (var i = 0; i < spans.length; i++) {
+        if (firstOwnTextContains(spans[i], 'пересадка')) {
+            transferText = visibleText(spans[i]);
+            break;
+        }
+    }
+
+    var segments = [];
+    var rows = card.querySelectorAll('div[class*="flight-search__flights"][role="row"]');
+    for (var j = 0; j < rows.length; j++) {
+        var row = rows[j];
+        // информационные строки о пересадке или дате пропускаем
+        if (row.querySelector('div[class*="flight-search__transfer"]')) continue;
+        // сегменты без информации о маршруте тоже
+        if (!row.querySelector('div[class*="time-destination__row"]')) continue;
+        segments.push(snapshotSegment(row));
+    }
+
+    var seatsTexts = [];
+    var seats = card.querySelectorAll('div[class*="flight-search__left"]');
+    for (var k = 0; k < seats.length; k++) seatsTexts.push(visibleText(seats[k]));
+
+    return {transfer_text: transferText, seats_texts: seatsTexts, segments: segments};
+});
+"""
+
+
+def snapshot_cards(driver, cards):
+    """
+    Извлекает данные всех карточек рейсов за один вызов execute_script (блокирующий вызов).
+
+    Args:
+        driver: экземпляр WebDriver
+        cards (list): элементы карточек рейсов
+
+    Returns:
+        list: по словарю на карточку (transfer_text, seats_texts, segments) или None,
+            если скрипт не отработал и нужно использовать извлечение по одному полю
+    """
+    if not cards:
+        return []
+    try:
+        snapshots = driver.execute_script(SNAPSHOT_CARDS_JS, cards)
+    except Exception as e:
+        logger.warning("Не удалось извлечь карточки одним скриптом: %s", e)
+        return None
+    if not isinstance(snapshots, list) or len(snapshots) != len(cards):
+        return None
+    return snapshots
@@ -0,0 +1,259 @@
+# fanout_search.py - пакетные поиски (по диапазону дат, по многим направлениям) в ограниченном числе браузеров
+import asyncio
+import re
+from collections import deque
+from datetime import datetime, timedelta
+
+from city_codes import CITY_INDEX
+from flight_searcher import search_flights, is_search_cached, lease_search_session
+
+DATE_FORMAT = "%d.%m.%Y"
+
+# Максимальная длина диапазона дат (дней)
+MAX_RANGE_DAYS = 14
+
+# Диапазон дат: "01.12.2026-07.12.2026" или "01.12.2026+6" (дата и еще 6 дней)
+_RANGE_PATTERN = re.compile(r"^\s*(\d{2}\.\d{2}\.\d{4})\s*(?:(?:-|—|–)\s*(\d{2}\.\d{2}\.\d{4})|\+\s*(\d{1,2}))\s*$")
+
+
+def parse_date_range(text):
+    """
+    Разбирает диапазон дат вылета
+
+    Args:
+        text (str): "дд.мм.гггг-дд.мм.гггг" или "дд.мм.гггг+N"
+
+    Returns:
+        list: даты диапазона в формате дд.мм.гггг или None, если это не диапазон
+
+    Raises:
+        ValueError: если даты некорректны или диапазон длиннее MAX_RANGE_DAYS
+    """
+    match = _RANGE_PATTERN.match(text)
+    if not match:
+        return None
+    start = datetime.strptime(match.group(1), DATE_FORMAT)
+    if match.group(2):
+        end = datetime.strptime(match.group(2), DATE_FORMAT)
+    else:
+        end = start + timedelta(days=int(match.group(3)))
+    days = (end - start).days + 1
+    if days < 1:
+        raise ValueError("Date range end is before its start")
+    if days > MAX_RANGE_DAYS:
+        raise ValueError(f"Date range is longer than {MAX_RANGE_DAYS} days")
+    return [(start + timedelta(days=offset)).strftime(DATE_FORMAT) for offset in range(days)]
+
+
+def _amount(value):
+    """Число из строки стоимости ("25 000" -> 25000) или None"""
+    digits = re.sub(r"\D", "", str(value))
+    return int(digits) if digits else None
+
+
+def summarize_day(depart_date, result):
+    """
+    Краткая сводка по одному дню
+
+    Args:
+        depart_date (str): дата вылета
+        result (dict): результат search_flights
+
+    Returns:
+        dict: date, flights, min_miles, min_rubles, seats (сумма мест за мили), error
+    """
+    summary = {"date": depart_date, "flights": 0, "min_miles": None, "min_rubles": None, "seats": 0, "error": None}
+    if "error" in result:
+        summary["error"] = result.get("message") or result["error"]
+        return summary
+
+    for flight in result.get("there", []):
+        if "error" in flight:
+            continue
+        summary["flights"] += 1
+        miles, rubles = _amount(flight.get("miles_cost", "—")), _amount(flight.get("rubles_cost", "—"))
+        # самый дешевый рейс определяется по милям, рубли (сборы) берутся у него же
+        if miles is not None and (summary["min_miles"] is None or miles < summary["min_miles"]):
+            summary["min_miles"], summary["min_rubles"] = miles, rubles
+        seats = _amount(flight.get("seats_available", "—"))
+        if seats is not None:
+            summary["seats"] += seats
+    return summary
+
+
+async def _fan_out(items, run_item, is_cached, max_sessions):
+    """
+    Выполняет поиски по списку в ограниченном числе браузерных сессий и отдает результаты по мере готовности.
+
+    Поиски, которые уже есть в кэше, выполняются сразу без браузера. Остальные разбирают
+    max_sessions сессий: каждая берет один браузер (если он нужен бэкенду поиска) и выполняет в нем поиск за поиском,
+    так что браузеров запускается не больше max_sessions на весь список. Ошибка одного
+    поиска не прерывает остальные.
+
+    Args:
+        items (list): элементы (даты, направления), для каждого выполняется один поиск
+        run_item (callable): корутина (элемент, driver, wait) -> результат search_flights
+        is_cached (callable): элемент -> True, если его результат есть в кэше
+        max_sessions (int): сколько браузеров можно занять одновременно
+
+    Yields:
+        tuple: (элемент, результат) в порядке завершения
+    """
+    async def run(item, driver=None, wait=None):
+        try:
+            return await run_item(item, driver, wait)
+        except Exception as e:
+            return {"error": str(e)}
+
+    pending = deque()
+    for item in items:
+        if is_cached(item):
+            yield item, await run(item)
+        else:
+            pending.append(item)
+    if not pending:
+        return
+
+    finished = asyncio.Queue()
+
+    async def session():
+        try:
+            async with lease_search_session() as (driver, wait):
+                while pending:
+                    item = pending.popleft()
+                    await finished.put((item, await run(item, driver, wait)))
+        except Exception as e:
+            # браузер не запустился: оставшиеся элементы достанутся другим сессиям,
+            # а если сессий не осталось - получат эту ошибку
+            await finished.put((None, e))
+
+    tasks = [asyncio.create_task(session()) for _ in range(min(max(1, max_sessions), len(pending)))]
+    running = len(tasks)
+    remaining = len(pending)
+    try:
+        while remaining:
+            item, result = await finished.get()
+            if item is not None:
+                remaining -= 1
+                yield item, result
+                continue
+            running -= 1
+            if running == 0:
+                while pending:
+                    remaining -= 1
+                    yield pending.popleft(), {"error": f"Browser initialization failed: {result}"}
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def search_date_range(
+    from_city,
+    to_city,
+    depart_dates,
+    adults_count=1,
+    children_count=0,
+    class_type="economy",
+    flight_filter="all",
+    status_callback=None,
+    max_sessions=2
+):
+    """
+    Ищет рейсы в одну сторону на каждую дату диапазона.
+
+    Дни, которые уже есть в кэше, отдаются сразу и браузер не занимают; остальные
+    выполняются не больше чем в max_sessions браузерах (см. _fan_out).
+
+    Args:
+        depart_dates (list): даты вылета в формате дд.мм.гггг (см. parse_date_range)
+        max_sessions (int): сколько браузеров может использовать поиск одновременно
+        остальные параметры - как у search_flights
+
+    Returns:
+        dict: {"days": [сводка по дню, ...] в порядке дат, "results": {дата: результат search_flights}}
+    """
+    async def search_day(depart_date, driver, wait):
+        result, _ = await search_flights(
+            from_city=from_city, to_city=to_city, depart_date=depart_date,
+            adults_count=adults_count, children_count=children_count,
+            class_type=class_type, flight_filter=flight_filter,
+            driver=driver, wait=wait,
+        )
+        return result
+
+    def is_cached(depart_date):
+        return is_search_cached(from_city, to_city, depart_date, adults_count, children_count, class_type)
+
+    if status_callback:
+        await status_callback(f"🔎 ищу рейсы на {len(depart_dates)} дн., браузеров не больше {max_sessions}...")
+
+    results = {}
+    async for depart_date, result in _fan_out(depart_dates, search_day, is_cached, max_sessions):
+        results[depart_date] = result
+        if status_callback:
+            await status_callback(f"📅 проверено дней: {len(results)}/{len(depart_dates)} (последний - {depart_date})")
+
+    return {
+        "days": [summarize_day(depart_date, results[depart_date]) for depart_date in depart_dates],
+        "results": {depart_date: results[depart_date] for depart_date in depart_dates},
+    }
+
+
+async def search_destinations(
+    from_city,
+    destinations,
+    depart_date,
+    adults_count=1,
+    children_count=0,
+    class_type="economy",
+    flight_filter="all",
+    max_sessions=2
+):
+    """
+    Ищет рейсы из одного города во много направлений на одну дату ("куда угодно из MOW").
+
+    Направления выполняются не больше чем в max_sessions браузерах (см. _fan_out), результаты
+    отдаются по мере готовности. Неудачи отдельных направлений (нет рейсов, таймаут,
+    неизвестный город) возвращаются как результат с ключом "error" и не прерывают поиск.
+
+    Args:
+        from_city (str): город отправления или IATA-код
+        destinations (list): IATA-коды (или названия городов) из CITY_TO_IATA
+        depart_date (str): дата вылета в формате дд.мм.гггг
+        max_sessions (int): сколько браузеров может использовать поиск одновременно
+        остальные параметры - как у search_flights
+
+    Yields:
+        tuple: (IATA-код направления, результат search_flights, сводка summarize_day)
+    """
+    origin = CITY_INDEX.code_of(from_city)
+    codes = []
+    for destination in destinations:
+        code = CITY_INDEX.code_of(destination)
+        if code is None or code == origin:
+            error = {"error": "unknown_destination" if code is None else "same_city", "message": f"Направление {destination} пропущено"}
+            yield destination, error, summarize_day(depart_date, error)
+        elif code not in codes:
+            codes.append(code)
+
+    async def search_destination(code, driver, wait):
+        result, _ = await search_flights(
+            from_city=from_city, to_city=code, depart_date=depart_date,
+            adults_count=adults_count, children_count=children_count,
+            class_type=class_type, flight_filter=flight_filter,
+            driver=driver, wait=wait,
+        )
+        return result
+
+    def is_cached(code):
+        return is_search_cached(from_city, code, depart_date, adults_count, children_count, class_type)
+
+    async for code, result in _fan_out(codes, search_destination, is_cached, max_sessions):
+        yield code, result, summarize_day(depart_date, result)
+
+
+def cheapest_day(days):
+    """Сводка самого дешевого по милям дня или None, если рейсов нет ни в один день"""
+    priced = [day for day in days if day["min_miles"] is not None]
+    return min(priced, key=lambda day: (day["min_miles"], day["min_rubles"] or 0)) if priced else None
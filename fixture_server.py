@@ -0,0 +1,107 @@
+# fixture_server.py - локальный сервер, который отдает записанные ответы API поиска
+#
+# Нужен, чтобы проверять HttpSearchBackend без обращений к сайту:
+#   python -m fixture_server fixtures/api --port 8085
+#   SEARCH_BACKEND=http SEARCH_API_URL=http://127.0.0.1:8085 python bot.py
+# Ответы записываются в каталог через HttpSearchBackend(record_dir=...).
+import argparse
+import asyncio
+import json
+import os
+
+from aiohttp import web
+
+from search_backends import fixture_name
+
+
+class FixtureServer:
+    """
+    Отдает на любой POST-запрос поиска записанный ответ для его маршрута и даты.
+
+    Ответ ищется в каталоге по имени ОТКУДА-КУДА-ГГГГММДД.json, затем ОТКУДА-КУДА.json,
+    затем default.json; если ничего нет - 404.
+    """
+
+    def __init__(self, fixtures_dir, host="127.0.0.1", port=0, delay=0.0):
+        """
+        Args:
+            fixtures_dir (str): каталог с записанными ответами
+            host (str): адрес, на котором слушать
+            port (int): порт (0 - любой свободный, см. url после start())
+            delay (float): задержка перед ответом (секунды), чтобы имитировать сеть
+        """
+        self.fixtures_dir = fixtures_dir
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.requests = 0
+        # адреса клиентов: по ним видно, переиспользует ли клиент соединения (keep-alive)
+        self.peers = set()
+        self._runner = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_route("*", "/{path:.*}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # при port=0 порт выбирает система
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request):
+        self.requests += 1
+        self.peers.add(request.transport.get_extra_info("peername") if request.transport else None)
+        try:
+            body = await request.json()
+            route = body["routes"][0]
+            names = [
+                fixture_name(route["origin"], route["destination"], route["departure_date"].replace("-", "")),
+                fixture_name(route["origin"], route["destination"]),
+            ]
+        except (ValueError, KeyError, IndexError, TypeError):
+            names = []
+
+        for name in names + ["default.json"]:
+            path = os.path.join(self.fixtures_dir, name)
+            if os.path.exists(path):
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                with open(path, encoding="utf-8") as f:
+                    return web.json_response(json.load(f))
+        return web.json_response({"error": "fixture not found", "tried": names}, status=404)
+
+
+async def _serve(args):
+    server = FixtureServer(args.fixtures_dir, args.host, args.port, args.delay)
+    await server.start()
+    print(f"Отдаю ответы из {args.fixtures_dir} на {server.url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сервер записанных ответов API поиска")
+    parser.add_argument("fixtures_dir", help="каталог с записанными ответами")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8085)
+    parser.add_argument("--delay", type=float, default=0.0, help="задержка ответа, секунды")
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
 # flight_searcher.py
 import asyncio
+import logging
 import re
-import time
 import os
+import sys
+from contextlib import AsyncExitStack, asynccontextmanager
 from datetime import datetime
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
@@ -11,7 +13,23 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, TimeoutException, ElementClickInterceptedException
 # Импортируем словарь из отдельного файла
-from city_codes import CITY_TO_IATA
+from city_codes import CITY_INDEX
+from browser_pool import BrowserPool
+from browser_profiles import build_chrome_options, apply_profile, save_cache_seed
+from dom_extractor import snapshot_cards
+from tariff_capture import enable_response_capture, discard_captured_responses, capture_tariffs, flight_key
+from readiness import page_is_settled, elements_count_at_least, timed_wait
+from result_cache import ResultCache, make_search_key
+from result_store import ResultStore
+from selenium_executor import run_blocking
+from single_flight import SingleFlight
+from search_backends import SearchBackend
+from metrics import METRICS, span, route_context, instrument_driver
+from log_setup import CARD_LOGGER
+
+logger = logging.getLogger(__name__)
+# Подробности по каждой карточке пишутся отдельным логгером, чтобы их можно было отключить
+card_logger = logging.getLogger(CARD_LOGGER)
 
 # словарь соответствия классов обслуживания
 CLASS_MAP = {
@@ -20,22 +38,243 @@ CLASS_MAP = {
     "бизнес": "business"
 }
 
-async def create_browser():
+async def create_browser(headless=False, profile=None, cache_slot=None):
     """
     Создает и возвращает экземпляр браузера
     
+    Args:
+        headless (bool, optional): запускать браузер без окна (профиль headless)
+        profile (str, optional): профиль запуска из browser_profiles (full, headless, lean);
+            если не указан, выбирается по headless
+        cache_slot (int, optional): место в пуле браузеров - свой каталог дискового кэша
+    
     Returns:
         tuple: (driver, wait) - экземпляр WebDriver и WebDriverWait
     """
+    if profile is None:
+        profile = "headless" if headless else "full"
+    # Запуск Chrome занимает секунды, поэтому выполняем его вне цикла событий
+    with span("create_browser", profile=profile):
+        return await run_blocking(_launch_browser, profile, cache_slot)
+
+def _launch_browser(profile, cache_slot=None):
+    """Блокирующий запуск Chrome (выполняется в пуле потоков Selenium)"""
     # Используем относительный или абсолютный путь в зависимости от ОС
     chromedriver_path = 'chromedriver.exe' if os.name == 'nt' else './chromedriver'
     service = Service(chromedriver_path)
-    options = webdriver.ChromeOptions()
+    options = build_chrome_options(profile, cache_slot)
+    # ответы страницы (в том числе с тарифами) читаются из performance-лога
+    enable_response_capture(options)
     driver = webdriver.Chrome(service=service, options=options)
-    driver.maximize_window()
+    # считаем команды WebDriver для метрик
+    instrument_driver(driver)
+    apply_profile(driver, profile)
     wait = WebDriverWait(driver, 15)  # Увеличиваем время ожидания до 15 секунд
     return driver, wait
 
+# Адрес сайта, на котором выполняется поиск (бенчмарки подставляют локальный сервер)
+SITE_URL = "https://www.aeroflot.ru"
+
+def configure_site_url(url):
+    """
+    Задает адрес сайта для поиска в браузере
+    
+    Args:
+        url (str): адрес без завершающего слеша, например http://127.0.0.1:8086/fx/cards
+    """
+    global SITE_URL
+    SITE_URL = url.rstrip("/")
+
+# XPath ячеек с ценами тарифов в модальном окне "выбрать рейс"
+TARIFF_PRICE_XPATH = "//div[contains(@class,'tariff__table-cell') and contains(@class,'tariff__table-price')]"
+# Максимальное время ожидания открытия окна с тарифами
+TARIFF_MODAL_TIMEOUT = 15
+
+# Ошибки, которые являются ответом сайта (а не сбоем), и поэтому тоже кэшируются
+CACHEABLE_ERRORS = {"no_flights_available", "no_direct_flights", "no_connection_flights"}
+
+# Кэш результатов поиска по нормализованным параметрам запроса
+search_cache = ResultCache()
+
+def configure_search_cache(max_entries=256, ttl=600):
+    """
+    Пересоздает кэш результатов поиска с новыми ограничениями
+    
+    Args:
+        max_entries (int): максимальное количество закэшированных поисков
+        ttl (float): время жизни результата в секундах (0 - кэш отключен)
+    """
+    global search_cache
+    search_cache = ResultCache(max_entries=max_entries, ttl=ttl)
+
+
+# История результатов на диске (None - не ведется) и возраст записей, которые
+# можно отдавать вместо нового поиска на сайте
+_result_store = None
+_result_store_max_age = 0
+
+# Одинаковые поиски, идущие одновременно, выполняются на сайте один раз
+in_flight_searches = SingleFlight()
+
+async def start_result_store(path="results.db", max_age=600):
+    """
+    Открывает историю результатов поиска (SQLite)
+    
+    Args:
+        path (str): путь к файлу базы
+        max_age (float): результаты моложе стольких секунд отдаются без поиска на сайте (0 - никогда)
+        
+    Returns:
+        ResultStore: открытое хранилище
+    """
+    global _result_store, _result_store_max_age
+    if _result_store is None:
+        _result_store = ResultStore(path)
+        await _result_store.start()
+    _result_store_max_age = max_age
+    return _result_store
+
+async def stop_result_store():
+    """Дописывает очередь записей и закрывает историю результатов"""
+    global _result_store
+    store, _result_store = _result_store, None
+    if store is not None:
+        await store.close()
+
+def get_result_store():
+    """Открытое хранилище истории результатов или None"""
+    return _result_store
+
+def normalize_search_params(from_city, to_city, depart_date, adults_count=1, children_count=0, class_type="economy"):
+    """
+    Приводит параметры поиска к виду, в котором они попадают в URL
+    
+    Args:
+        from_city (str): город отправления или IATA-код
+        to_city (str): город прибытия или IATA-код
+        depart_date (str): дата вылета в формате дд.мм.гггг
+        adults_count (int): количество взрослых пассажиров
+        children_count (int): количество детей
+        class_type (str): класс обслуживания (эконом, комфорт, бизнес)
+        
+    Returns:
+        dict: from_code, to_code, depart_date (YYYYMMDD), adults_count, children_count, service_class
+        
+    Raises:
+        ValueError: если дата не в формате дд.мм.гггг
+    """
+    # если передан код города, используем его, иначе пытаемся определить по названию
+    from_code = CITY_INDEX.code_of(from_city) or (from_city.upper() if len(from_city) == 3 else from_city)
+    to_code = CITY_INDEX.code_of(to_city) or (to_city.upper() if len(to_city) == 3 else to_city)
+    
+    # проверка формата даты и преобразование в формат YYYYMMDD для URL
+    depart_date_obj = datetime.strptime(depart_date, '%d.%m.%Y')
+    
+    return {
+        "from_code": from_code,
+        "to_code": to_code,
+        "depart_date": depart_date_obj.strftime('%Y%m%d'),
+        # определяем класс обслуживания
+        "service_class": CLASS_MAP.get(class_type.lower(), "economy"),
+        # Проверяем и ограничиваем количество пассажиров
+        "adults_count": max(1, min(6, int(adults_count))),  # от 1 до 6
+        "children_count": max(0, min(4, int(children_count))),  # от 0 до 4
+    }
+
+# Пул заранее запущенных браузеров (None - пул не запущен, браузер создается на каждый поиск)
+_browser_pool = None
+
+async def start_browser_pool(size=2, max_uses=20, profile="lean"):
+    """
+    Запускает пул headless-браузеров, из которого поиск берет браузеры
+    
+    Args:
+        size (int): количество браузеров в пуле
+        max_uses (int): после скольких поисков браузер перезапускается
+        profile (str): профиль запуска браузеров (см. browser_profiles)
+        
+    Returns:
+        BrowserPool: запущенный пул
+    """
+    global _browser_pool
+    if _browser_pool is None:
+        _browser_pool = BrowserPool(lambda slot: create_browser(profile=profile, cache_slot=slot), size=size, max_uses=max_uses)
+        await _browser_pool.start()
+    return _browser_pool
+
+async def stop_browser_pool():
+    """Закрывает все браузеры пула"""
+    global _browser_pool
+    pool, _browser_pool = _browser_pool, None
+    if pool is not None:
+        await pool.close()
+        # браузеров не осталось - кэш первого места станет заготовкой для новых мест
+        if pool.stats()["total"] == 0:
+            await run_blocking(save_cache_seed, 0)
+
+class SeleniumBackend(SearchBackend):
+    """Поиск в браузере: открывает страницу поиска и разбирает карточки рейсов"""
+    
+    async def search(self, params, status_callback=None, flight_callback=None, driver=None, wait=None):
+        return await _search_flights_on_site(params, status_callback, driver, wait, flight_callback)
+
+# Бэкенд, которым выполняются поиски на сайте (см. start_search_backend)
+_search_backend = SeleniumBackend()
+
+async def start_search_backend(backend):
+    """
+    Переключает поиск на другой бэкенд (например, search_backends.HttpSearchBackend)
+    
+    Args:
+        backend (SearchBackend): бэкенд поиска
+    """
+    global _search_backend
+    await backend.start()
+    _search_backend = backend
+
+async def stop_search_backend():
+    """Закрывает текущий бэкенд и возвращает поиск в браузере"""
+    global _search_backend
+    backend, _search_backend = _search_backend, SeleniumBackend()
+    await backend.close()
+
+def search_uses_browser():
+    """Нужен ли текущему бэкенду поиска браузер"""
+    return _search_backend.uses_browser
+
+@asynccontextmanager
+async def lease_search_session():
+    """
+    Сессия для нескольких поисков подряд: браузер из пула, если он нужен бэкенду, иначе (None, None)
+    
+    Yields:
+        tuple: (driver, wait) - передаются в search_flights
+    """
+    if not _search_backend.uses_browser:
+        yield None, None
+        return
+    async with lease_browser() as (driver, wait):
+        yield driver, wait
+
+@asynccontextmanager
+async def lease_browser():
+    """
+    Выдает браузер на время поиска: из пула, если он запущен, иначе создает новый
+    
+    Yields:
+        tuple: (driver, wait) - экземпляр WebDriver и WebDriverWait
+    """
+    if _browser_pool is not None:
+        async with _browser_pool.acquire() as (driver, wait):
+            yield driver, wait
+        return
+    
+    driver, wait = await create_browser()
+    try:
+        yield driver, wait
+    finally:
+        await run_blocking(driver.quit)
+
 async def search_flights(
     from_city, 
     to_city, 
@@ -47,7 +286,9 @@ async def search_flights(
     flight_filter="all",
     status_callback=None,
     driver=None,
-    wait=None
+    wait=None,
+    use_cache=True,
+    flight_callback=None
 ):
     """
     асинхронная функция для поиска авиабилетов через Selenium.
@@ -64,35 +305,206 @@ async def search_flights(
         status_callback (callable, optional): функция для отправки статусных сообщений
         driver (WebDriver, optional): экземпляр WebDriver для повторного использования
         wait (WebDriverWait, optional): экземпляр WebDriverWait для повторного использования
+        use_cache (bool, optional): брать результат из кэша, если такой поиск уже выполнялся
+        flight_callback (callable, optional): корутина (направление, данные рейса), вызывается
+            для каждого рейса сразу после разбора карточки (без учета фильтра)
         
     Returns:
         tuple: (результаты поиска, флаг нужно ли закрывать браузер)
     """
-    # Флаг, указывающий, создали ли мы браузер в этой функции
+    try:
+        params = normalize_search_params(from_city, to_city, depart_date, adults_count, children_count, class_type)
+    except ValueError:
+        if status_callback:
+            await status_callback("❌ неверный формат даты! используйте формат дд.мм.гггг")
+        return {"error": "Invalid date format"}, False
+    
+    # Сайт всегда опрашивается без фильтра, а фильтр применяется к готовому списку рейсов,
+    # поэтому в кэше хранится полный результат и переключение фильтра не требует нового поиска
+    cache_key = make_search_key(
+        params["from_code"], params["to_code"], params["depart_date"],
+        params["adults_count"], params["children_count"], params["service_class"], "all"
+    )
+    results = search_cache.get(cache_key) if use_cache else None
     browser_created_here = False
     
-    # если передан код города, используем его, иначе пытаемся определить по названию
-    from_code = from_city.upper() if len(from_city) == 3 else CITY_TO_IATA.get(from_city.lower(), from_city)
-    to_code = to_city.upper() if len(to_city) == 3 else CITY_TO_IATA.get(to_city.lower(), to_city)
+    if results is None and use_cache and _result_store is not None and _result_store_max_age > 0:
+        # кэш в памяти пуст (например, после перезапуска бота) - смотрим историю на диске
+        results = await _result_store.recent_results(
+            params["from_code"], params["to_code"], params["depart_date"], params["service_class"],
+            params["adults_count"], params["children_count"], _result_store_max_age
+        )
+        if results is not None:
+            search_cache.set(cache_key, results)
     
-    # проверка формата даты и преобразование в формат YYYYMMDD для URL
+    route = f"{params['from_code']}-{params['to_code']}"
+    if results is not None:
+        METRICS.inc("searches_total", route=route, source="cache", outcome=results.get("error") or "ok")
+        if status_callback:
+            await status_callback("⚡ такой поиск недавно выполнялся, беру результаты из кэша")
+        # рейсы повторяем только из успешного результата: у ошибки списки - это рекомендации
+        if flight_callback and "error" not in results:
+            for direction in ("there", "back"):
+                for flight_data in results.get(direction, []):
+                    await flight_callback(direction, flight_data)
+    else:
+        async def search_on_site(send_status, send_flight):
+            # все этапы этого поиска (в том числе в потоках Selenium) помечаются маршрутом
+            with route_context(route), span("search", backend=type(_search_backend).__name__) as search_span:
+                site_results = await _search_backend.search(params, send_status, send_flight, driver, wait)
+            METRICS.inc("searches_total", route=route, source="site", outcome=site_results[0].get("error") or "ok")
+            METRICS.observe("search_seconds", search_span.seconds, route=route)
+            if site_results[0].get("error") in CACHEABLE_ERRORS | {None}:
+                if use_cache:
+                    search_cache.set(cache_key, site_results[0])
+                if _result_store is not None:
+                    _result_store.record(params, site_results[0])
+            return site_results
+        
+        # такой же поиск может уже идти для другого пользователя - тогда ждем его, а не запускаем второй браузер
+        (results, browser_created_here), leader = await in_flight_searches.run(
+            cache_key, search_on_site, status_callback, flight_callback,
+            pinned=driver is not None and _search_backend.uses_browser
+        )
+        if not leader:
+            browser_created_here = False
+    
+    if "error" in results or flight_filter == "all":
+        return results, browser_created_here
+    
+    with route_context(route), span("filter", flight_filter=flight_filter):
+        filtered_results = filter_flights(results, flight_filter)
+    if any(filtered_results.values()):
+        if status_callback:
+            await status_callback("✅ фильтр по типу рейса применен")
+        return filtered_results, browser_created_here
+    
+    if flight_filter == "direct":
+        if status_callback:
+            await status_callback("ℹ️ На выбранные даты прямые рейсы за мили не найдены.")
+        return {
+            "error": "no_direct_flights",
+            "message": "На выбранные даты прямые рейсы за мили не найдены",
+            "suggestions": [
+                "Выберите другую дату",
+                "Выберите вариант 'Все рейсы', чтобы увидеть рейсы с пересадками",
+                f"Текущее количество пассажиров: {params['adults_count']} взр., {params['children_count']} дет.",
+                "Попробуйте другой класс обслуживания"
+            ]
+        }, browser_created_here
+    
+    if status_callback:
+        await status_callback("ℹ️ На выбранные даты рейсы с пересадками за мили не найдены.")
+    return {
+        "error": "no_connection_flights",
+        "message": "На выбранные даты рейсы с пересадками за мили не найдены",
+        "suggestions": [
+            "Выберите другую дату",
+            "Выберите вариант 'Все рейсы', чтобы увидеть прямые рейсы",
+            f"Текущее количество пассажиров: {params['adults_count']} взр., {params['children_count']} дет.",
+            "Попробуйте другой класс обслуживания"
+        ]
+    }, browser_created_here
+
+
+def is_search_cached(from_city, to_city, depart_date, adults_count=1, children_count=0, class_type="economy"):
+    """
+    Проверяет, есть ли в кэше готовый результат такого поиска (тогда браузер не понадобится).
+    Поиск, который еще выполняется, не считается: его могут отменить, и тогда подключившийся
+    запустит поиск на сайте сам - поэтому он должен ждать в очереди, как обычный поиск
+    
+    Returns:
+        bool: True если поиск будет обслужен из кэша
+    """
     try:
-        depart_date_obj = datetime.strptime(depart_date, '%d.%m.%Y')
-        formatted_depart_date = depart_date_obj.strftime('%Y%m%d')
+        params = normalize_search_params(from_city, to_city, depart_date, adults_count, children_count, class_type)
     except ValueError:
-        if status_callback:
-            await status_callback("❌ неверный формат даты! используйте формат дд.мм.гггг")
-        return {"error": "Invalid date format"}, browser_created_here
+        return False
+    cache_key = make_search_key(
+        params["from_code"], params["to_code"], params["depart_date"],
+        params["adults_count"], params["children_count"], params["service_class"], "all"
+    )
+    return cache_key in search_cache
+
+
+def get_cached_results(from_city, to_city, depart_date, adults_count=1, children_count=0, class_type="economy"):
+    """
+    Результат такого поиска из кэша (без фильтра по типу рейса), без поиска на сайте
     
-    # определяем класс обслуживания
-    service_class = CLASS_MAP.get(class_type.lower(), "economy")
+    Returns:
+        dict: результаты поиска {"there": [...]} или None, если в кэше их нет
+    """
+    try:
+        params = normalize_search_params(from_city, to_city, depart_date, adults_count, children_count, class_type)
+    except ValueError:
+        return None
+    cache_key = make_search_key(
+        params["from_code"], params["to_code"], params["depart_date"],
+        params["adults_count"], params["children_count"], params["service_class"], "all"
+    )
+    return search_cache.get(cache_key)
+
+
+def filter_flights(results, flight_filter):
+    """
+    Оставляет в результатах поиска только рейсы нужного типа
     
-    # Проверяем и ограничиваем количество пассажиров
-    adults_count = max(1, min(6, int(adults_count)))  # от 1 до 6
-    children_count = max(0, min(4, int(children_count)))  # от 0 до 4
+    Args:
+        results (dict): результаты поиска {"there": [...], "back": [...]}
+        flight_filter (str): фильтр типа рейса ('all', 'direct', 'connections')
+        
+    Returns:
+        dict: результаты с отфильтрованными списками рейсов
+    """
+    if flight_filter == "all":
+        return results
+    
+    filtered_results = {}
+    for direction, flights in results.items():
+        filtered_results[direction] = [flight for flight in flights if matches_filter(flight, flight_filter)]
+    return filtered_results
+
+
+def matches_filter(flight, flight_filter):
+    """Проверяет, подходит ли рейс под фильтр типа рейса ('all', 'direct', 'connections')"""
+    if flight_filter == "all":
+        return True
+    return "error" not in flight and is_direct_flight(flight) == (flight_filter == "direct")
+
+
+def is_direct_flight(flight):
+    """Проверяет, что рейс без пересадок (по флагу пересадки и количеству сегментов)"""
+    return not flight.get("has_transfer") and len(flight.get("segments", [])) <= 1
+
+
+async def _search_flights_on_site(params, status_callback, driver, wait, flight_callback=None):
+    """
+    Выполняет поиск на сайте аэрофлота без фильтра по типу рейса (без кэша).
+    
+    Args:
+        params (dict): нормализованные параметры поиска (см. normalize_search_params)
+        status_callback (callable): функция для отправки статусных сообщений или None
+        driver (WebDriver): экземпляр WebDriver для повторного использования или None
+        wait (WebDriverWait): экземпляр WebDriverWait для повторного использования или None
+        flight_callback (callable, optional): корутина (направление, данные рейса) для каждого разобранного рейса
+        
+    Returns:
+        tuple: (результаты поиска, флаг нужно ли закрывать браузер)
+    """
+    # Флаг, указывающий, создали ли мы браузер в этой функции
+    browser_created_here = False
+    # Браузер, взятый в этой функции, возвращается через этот стек
+    browser_lease = AsyncExitStack()
+    
+    from_code = params["from_code"]
+    to_code = params["to_code"]
+    formatted_depart_date = params["depart_date"]
+    service_class = params["service_class"]
+    adults_count = params["adults_count"]
+    children_count = params["children_count"]
     
     # формируем URL для поиска, явно указывая количество пассажиров
-    url = f'https://www.aeroflot.ru/sb/app/ru-ru#/search?adults={adults_count}&children={children_count}&childrenaward={children_count}&award=Y&cabin={service_class}&infants=0'
+    url = f'{SITE_URL}/sb/app/ru-ru#/search?adults={adults_count}&children={children_count}&childrenaward={children_count}&award=Y&cabin={service_class}&infants=0'
     
     # Всегда используем маршрут в одну сторону
     url += f'&routes={from_code}.{formatted_depart_date}.{to_code}'
@@ -100,11 +512,12 @@ async def search_flights(
     if status_callback:
         await status_callback(f"🔍 начинаю поиск билетов...\n👥 Пассажиры: {adults_count} взр., {children_count} дет.\nURL: {url}")
     
-    # Если браузер не передан, создаем новый экземпляр
+    # Если браузер не передан, берем его из пула (или создаем новый экземпляр)
     if driver is None or wait is None:
         browser_created_here = True
         try:
-            driver, wait = await create_browser()
+            with span("browser_lease"):
+                driver, wait = await browser_lease.enter_async_context(lease_browser())
         except Exception as e:
             if status_callback:
                 await status_callback(f"❌ Не удалось запустить браузер: {str(e)}")
@@ -116,7 +529,10 @@ async def search_flights(
         if status_callback:
             await status_callback("🌐 открываю сайт аэрофлота...")
         
-        driver.get(url)
+        # ответы прошлого поиска в этом браузере нам не нужны
+        await run_blocking(discard_captured_responses, driver)
+        with span("page_load"):
+            await run_blocking(driver.get, url)
         
         # Ожидание загрузки страницы и появления кнопки "найти"
         wait = WebDriverWait(driver, 5)
@@ -124,10 +540,8 @@ async def search_flights(
             if status_callback:
                 await status_callback("🔍 нажимаю кнопку поиска...")
                 
-            find_button = wait.until(
-                EC.element_to_be_clickable((By.XPATH, "//a[contains(@class,'button') and contains(.,'Найти')]"))
-            )
-            find_button.click()
+            with span("find_click"):
+                await run_blocking(_click_find_button, wait)
         except (NoSuchElementException, TimeoutException):
             if status_callback:
                 await status_callback("⚠️ кнопка 'найти' не найдена или не кликабельна")
@@ -139,7 +553,7 @@ async def search_flights(
             wait = WebDriverWait(driver, 15)
             
             # Проверяем, есть ли сообщение о том, что нет рейсов
-            no_flights_message = driver.find_elements(By.XPATH, 
+            no_flights_message = await run_blocking(driver.find_elements, By.XPATH, 
                 "//div[contains(@class,'text') and contains(@role,'alert') and contains(text(),'На выбранные даты рейсы не найдены')]")
             
             if no_flights_message:
@@ -161,14 +575,20 @@ async def search_flights(
                 if status_callback:
                     await status_callback("⏳ ожидаю результаты поиска...")
                 
-                wait.until(
-                    EC.presence_of_element_located((By.XPATH, "//div[contains(@class,'flight-search__inner')]"))
-                )
-                # Добавляем еще немного времени на полную загрузку
-                await asyncio.sleep(3)
+                with span("results_wait"):
+                    await run_blocking(wait.until,
+                        EC.presence_of_element_located((By.XPATH, "//div[contains(@class,'flight-search__inner')]"))
+                    )
+                    # Ждем, пока список рейсов догрузится: DOM перестал меняться и запросы закончились
+                    # (не дольше прежней фиксированной паузы в 3 секунды)
+                    await run_blocking(
+                        timed_wait, driver,
+                        page_is_settled("div.flight-searchs"),
+                        3, "results_settled", raise_on_timeout=False
+                    )
             except TimeoutException:
                 # Проверяем еще раз, не появилось ли сообщение об отсутствии рейсов
-                no_flights_message = driver.find_elements(By.XPATH, 
+                no_flights_message = await run_blocking(driver.find_elements, By.XPATH, 
                     "//div[contains(@class,'text') and contains(@role,'alert') and contains(text(),'На выбранные даты рейсы не найдены')]")
                 
                 if no_flights_message:
@@ -191,110 +611,7 @@ async def search_flights(
                 
         except Exception as e:
             # Если произошла ошибка при проверке наличия сообщений, продолжаем обычный поиск
-            print(f"Error checking no flights message: {e}")
-        
-        # Добавляем логику применения фильтра по типу рейса
-        if flight_filter != "all":
-            if status_callback:
-                await status_callback("🔍 применяю фильтр по типу рейса...")
-            
-            try:
-                # Ждем появления фильтров
-                wait.until(
-                    EC.presence_of_element_located((By.XPATH, "//div[contains(@class,'filter__title')]"))
-                )
-                
-                # Проверяем, нужно ли раскрыть аккордеон с экспресс-фильтрами
-                accordion_item = driver.find_elements(By.XPATH, "//div[@role='tab' and contains(@class,'accordion__item') and .//span[contains(text(),'Экспресс-фильтры')]]")
-                if accordion_item:
-                    if not "accordion__item--open" in accordion_item[0].get_attribute("class"):
-                        # Если аккордеон закрыт, кликаем по нему чтобы открыть
-                        accordion_button = accordion_item[0].find_element(By.XPATH, ".//button[contains(@class,'accordion__heading')]")
-                        driver.execute_script("arguments[0].click();", accordion_button)
-                        await asyncio.sleep(1)
-                
-                # Проверяем наличие фильтра "Прямой рейс"
-                direct_checkbox_labels = driver.find_elements(By.XPATH, "//label[contains(text(),'Прямой рейс')]")
-                if not direct_checkbox_labels and flight_filter == "direct":
-                    # Если фильтр "Прямой рейс" отсутствует, но пользователь запросил только прямые рейсы
-                    if status_callback:
-                        await status_callback("ℹ️ На выбранные даты прямые рейсы за мили не найдены.")
-                    return {
-                        "error": "no_direct_flights",
-                        "message": "На выбранные даты прямые рейсы за мили не найдены",
-                        "suggestions": [
-                            "Выберите другую дату",
-                            "Выберите вариант 'Все рейсы', чтобы увидеть рейсы с пересадками",
-                            f"Текущее количество пассажиров: {adults_count} взр., {children_count} дет.",
-                            "Попробуйте другой класс обслуживания"
-                        ]
-                    }, browser_created_here
-                
-                if flight_filter == "direct":
-                    # Находим чекбокс "Прямой рейс"
-                    direct_checkbox_label = wait.until(
-                        EC.presence_of_element_located((By.XPATH, "//label[contains(text(),'Прямой рейс')]"))
-                    )
-                    direct_checkbox_id = direct_checkbox_label.get_attribute("for")
-                    direct_checkbox = driver.find_element(By.ID, direct_checkbox_id)
-                    
-                    # Включаем только прямые рейсы
-                    if not direct_checkbox.is_selected():
-                        driver.execute_script("arguments[0].click();", direct_checkbox)
-                        
-                    # Находим чекбокс "1" (с одной пересадкой), если он существует
-                    connection_checkbox_labels = driver.find_elements(By.XPATH, "//label[text()='1']")
-                    if connection_checkbox_labels:
-                        connection_checkbox_label = connection_checkbox_labels[0]
-                        connection_checkbox_id = connection_checkbox_label.get_attribute("for")
-                        connection_checkbox = driver.find_element(By.ID, connection_checkbox_id)
-                        
-                        # Убеждаемся, что рейсы с пересадками выключены
-                        if connection_checkbox.is_selected():
-                            driver.execute_script("arguments[0].click();", connection_checkbox)
-                        
-                elif flight_filter == "connections":
-                    # Проверяем наличие фильтра "1" (с одной пересадкой)
-                    connection_checkbox_labels = driver.find_elements(By.XPATH, "//label[text()='1']")
-                    if not connection_checkbox_labels:
-                        if status_callback:
-                            await status_callback("ℹ️ На выбранные даты рейсы с пересадками за мили не найдены.")
-                        return {
-                            "error": "no_connection_flights",
-                            "message": "На выбранные даты рейсы с пересадками за мили не найдены",
-                            "suggestions": [
-                                "Выберите другую дату",
-                                "Выберите вариант 'Все рейсы', чтобы увидеть прямые рейсы",
-                                f"Текущее количество пассажиров: {adults_count} взр., {children_count} дет.",
-                                "Попробуйте другой класс обслуживания"
-                            ]
-                        }, browser_created_here
-                    
-                    # Включаем только рейсы с пересадками
-                    connection_checkbox_label = connection_checkbox_labels[0]
-                    connection_checkbox_id = connection_checkbox_label.get_attribute("for")
-                    connection_checkbox = driver.find_element(By.ID, connection_checkbox_id)
-                    if not connection_checkbox.is_selected():
-                        driver.execute_script("arguments[0].click();", connection_checkbox)
-                    
-                    # Убеждаемся, что прямые рейсы выключены, если такой фильтр существует
-                    direct_checkbox_labels = driver.find_elements(By.XPATH, "//label[contains(text(),'Прямой рейс')]")
-                    if direct_checkbox_labels:
-                        direct_checkbox_label = direct_checkbox_labels[0]
-                        direct_checkbox_id = direct_checkbox_label.get_attribute("for")
-                        direct_checkbox = driver.find_element(By.ID, direct_checkbox_id)
-                        if direct_checkbox.is_selected():
-                            driver.execute_script("arguments[0].click();", direct_checkbox)
-                
-                # Даем время на применение фильтра
-                await asyncio.sleep(2)
-                
-                if status_callback:
-                    await status_callback("✅ фильтр по типу рейса применен")
-                    
-            except (NoSuchElementException, TimeoutException) as e:
-                if status_callback:
-                    await status_callback(f"⚠️ не удалось применить фильтр по типу рейса: {str(e)}")
+            logger.warning("Error checking no flights message: %s", e)
         
         # Обработка результатов поиска
         try:
@@ -302,7 +619,7 @@ async def search_flights(
                 await status_callback("✅ результаты поиска получены, обрабатываю данные...")
             
             # найдем заголовки направлений (туда и обратно)
-            direction_frames = driver.find_elements(By.XPATH, "//div[contains(@class,'frame__heading') and contains(@class,'h-pull--left')]")
+            direction_frames = await run_blocking(driver.find_elements, By.XPATH, "//div[contains(@class,'frame__heading') and contains(@class,'h-pull--left')]")
             
             # Если заголовки не найдены, проверяем страницу еще раз
             if not direction_frames:
@@ -310,15 +627,16 @@ async def search_flights(
                     await status_callback("⚠️ не найдены заголовки направлений, проверяю страницу еще раз...")
                 
                 # Проверяем, есть ли сообщение о том, что нет рейсов
-                no_flights_message = driver.find_elements(By.XPATH, 
+                no_flights_message = await run_blocking(driver.find_elements, By.XPATH, 
                     "//div[contains(@class,'text') and @role='alert' and contains(text(),'На выбранные даты')]")
                 
                 if no_flights_message:
+                    no_flights_text = await run_blocking(_element_text, no_flights_message[0])
                     if status_callback:
-                        await status_callback(f"ℹ️ {no_flights_message[0].text}. Попробуйте изменить дату или уменьшить количество пассажиров.")
+                        await status_callback(f"ℹ️ {no_flights_text}. Попробуйте изменить дату или уменьшить количество пассажиров.")
                     return {
                         "error": "no_flights_available",
-                        "message": no_flights_message[0].text,
+                        "message": no_flights_text,
                         "suggestions": [
                             "Выберите другую дату",
                             "Уменьшите количество пассажиров",
@@ -332,19 +650,24 @@ async def search_flights(
                     await status_callback("⚠️ не найдены направления рейсов, но страница загружена")
                 return {"error": "No directions found"}, browser_created_here
             
+            # Тарифы всех карточек берем из ответов страницы; модальное окно открываем
+            # только для рейсов, которых в ответах не нашлось
+            with span("tariff_capture"):
+                captured_tariffs = await run_blocking(capture_tariffs, driver)
+            if status_callback and captured_tariffs:
+                await status_callback(f"💰 тарифы получены из ответов сайта для {len(captured_tariffs)} рейсов")
+            
             # Обработка найденных направлений
             for idx, frame in enumerate(direction_frames):
                 try:
-                    direction_text = frame.text
                     direction_type = "there" if idx == 0 else "back"
                     
+                    # находим заголовок и все карточки рейсов для текущего направления
+                    direction_text, cards = await run_blocking(_find_direction_cards, frame)
+                    
                     if status_callback:
                         await status_callback(f"📊 обрабатываю рейсы {direction_text}...")
                     
-                    # находим все карточки рейсов для текущего направления
-                    parent_frame = frame.find_element(By.XPATH, "./ancestor::div[contains(@class,'frame') and contains(@class,'flight-searchs')]")
-                    cards = parent_frame.find_elements(By.XPATH, ".//div[contains(@class,'flight-search') and @tabindex='0']")
-                    
                     if not cards:
                         if status_callback:
                             await status_callback(f"ℹ️ не найдено рейсов для направления {direction_text}")
@@ -352,14 +675,24 @@ async def search_flights(
                     else:
                         if status_callback:
                             await status_callback(f"✅ найдено {len(cards)} карточек рейсов для направления {direction_text}")
+                        
+                        # Данные всех карточек читаем одним скриптом; если не вышло - по одному полю
+                        with span("cards_snapshot", cards=len(cards)):
+                            snapshots = await run_blocking(snapshot_cards, driver, cards)
                             
                         for card_idx, card in enumerate(cards, 1):
                             try:
                                 if status_callback:
                                     await status_callback(f"🎫 обрабатываю билет {card_idx}/{len(cards)} для направления {direction_text}...")
                                 
-                                flight_data = extract_flight_data(card, card_idx, driver, wait)
+                                with span("card", card=card_idx):
+                                    if snapshots is not None:
+                                        flight_data = await run_blocking(extract_flight_data_from_snapshot, snapshots[card_idx - 1], card, card_idx, driver, wait, captured_tariffs)
+                                    else:
+                                        flight_data = await run_blocking(extract_flight_data, card, card_idx, driver, wait, captured_tariffs)
                                 results[direction_type].append(flight_data)
+                                if flight_callback:
+                                    await flight_callback(direction_type, flight_data)
                                 
                                 if status_callback:
                                     await status_callback(f"✅ билет {card_idx}/{len(cards)} обработан успешно")
@@ -389,9 +722,30 @@ async def search_flights(
             await status_callback(f"❌ произошла ошибка при поиске: {str(e)}")
         return {"error": str(e)}, browser_created_here
     finally:
-        # Закрываем браузер только если мы его создали в этой функции
-        if browser_created_here and driver:
-            driver.quit()
+        # Возвращаем браузер в пул (или закрываем его), только если мы его взяли в этой функции.
+        # Если поиск отменен посреди работы с браузером, пул получит исключение и заменит браузер
+        await browser_lease.__aexit__(*sys.exc_info())
+
+
+def _click_find_button(wait):
+    """Дожидается кнопки "найти" и нажимает ее (блокирующий вызов)"""
+    find_button = wait.until(
+        EC.element_to_be_clickable((By.XPATH, "//a[contains(@class,'button') and contains(.,'Найти')]"))
+    )
+    find_button.click()
+
+
+def _find_direction_cards(frame):
+    """
+    Находит текст заголовка направления и карточки рейсов в нем (блокирующий вызов).
+    
+    Returns:
+        tuple: (текст заголовка, список карточек рейсов)
+    """
+    direction_text = frame.text
+    parent_frame = frame.find_element(By.XPATH, "./ancestor::div[contains(@class,'frame') and contains(@class,'flight-searchs')]")
+    cards = parent_frame.find_elements(By.XPATH, ".//div[contains(@class,'flight-search') and @tabindex='0']")
+    return direction_text, cards
 
 
 async def search_roundtrip(
@@ -403,78 +757,257 @@ async def search_roundtrip(
     children_count=0,
     class_type="economy", 
     flight_filter="all",
-    status_callback=None
+    status_callback=None,
+    parallel=True,
+    flight_callback=None
 ):
     """
-    Выполняет поиск билетов туда и обратно в одной сессии браузера
+    Выполняет поиск билетов туда и обратно
+    
+    Args:
+        parallel (bool, optional): искать оба направления одновременно в двух браузерах;
+            при False оба поиска выполняются по очереди в одной сессии браузера
+        flight_callback (callable, optional): корутина (направление, данные рейса) для каждого
+            разобранного рейса; направление - "there" или "back"
     
     Returns:
         dict: результаты поиска для обоих направлений
     """
+    with span("roundtrip", parallel=parallel):
+        if parallel:
+            return await _search_roundtrip_parallel(
+                from_city, to_city, depart_date, return_date,
+                adults_count, children_count, class_type, flight_filter, status_callback, flight_callback
+            )
+        return await _search_roundtrip_sequential(
+            from_city, to_city, depart_date, return_date,
+            adults_count, children_count, class_type, flight_filter, status_callback, flight_callback
+        )
+
+
+async def _search_roundtrip_sequential(
+    from_city, to_city, depart_date, return_date,
+    adults_count, children_count, class_type, flight_filter, status_callback, flight_callback=None
+):
+    """
+    Ищет рейсы туда и обратно по очереди в одной сессии браузера.
+    
+    Returns:
+        dict: результаты поиска для обоих направлений или ошибка поиска туда
+    """
     combined_results = {"there": [], "back": []}
-    driver = None
-    wait = None
     
     try:
-        # 1. Создаем браузер
-        driver, wait = await create_browser()
-        
-        # 2. Выполняем поиск туда
+        # 1. Берем браузер из пула (или создаем новый), если он нужен бэкенду поиска
+        async with lease_search_session() as (driver, wait):
+            # 2. Выполняем поиск туда
+            if status_callback:
+                await status_callback("🔎 Выполняю поиск рейсов ТУДА...")
+            
+            there_results, _ = await search_flights(
+                from_city=from_city,
+                to_city=to_city,
+                depart_date=depart_date,
+                adults_count=adults_count,
+                children_count=children_count,
+                class_type=class_type,
+                flight_filter=flight_filter,
+                status_callback=status_callback,
+                driver=driver,
+                wait=wait,
+                flight_callback=leg_flights(flight_callback, "there")
+            )
+            
+            # Проверяем, есть ли ошибка в результатах поиска туда
+            if "error" in there_results:
+                return there_results  # Возвращаем ошибку, если поиск туда не удался
+            
+            combined_results["there"] = there_results.get("there", [])
+            
+            # 3. Выполняем поиск обратно
+            if status_callback:
+                await status_callback("🔎 Выполняю поиск рейсов ОБРАТНО...")
+            
+            back_results, _ = await search_flights(
+                from_city=to_city,  # Меняем города местами
+                to_city=from_city,
+                depart_date=return_date,
+                adults_count=adults_count,
+                children_count=children_count,
+                class_type=class_type,
+                flight_filter=flight_filter,
+                status_callback=status_callback,
+                driver=driver,
+                wait=wait,
+                flight_callback=leg_flights(flight_callback, "back")
+            )
+            
+            if "error" not in back_results:
+                combined_results["back"] = back_results.get("there", [])
+            
+            return combined_results
+    
+    except Exception as e:
         if status_callback:
-            await status_callback("🔎 Выполняю поиск рейсов ТУДА...")
-        
-        there_results, _ = await search_flights(
-            from_city=from_city,
-            to_city=to_city,
-            depart_date=depart_date,
-            adults_count=adults_count,
-            children_count=children_count,
-            class_type=class_type,
-            flight_filter=flight_filter,
-            status_callback=status_callback,
-            driver=driver,
-            wait=wait
-        )
+            await status_callback(f"❌ Произошла ошибка при выполнении поиска: {str(e)}")
+        return {"error": str(e)}
+
+
+async def _search_roundtrip_parallel(
+    from_city, to_city, depart_date, return_date,
+    adults_count, children_count, class_type, flight_filter, status_callback, flight_callback=None
+):
+    """
+    Ищет рейсы туда и обратно одновременно, каждое направление в своем браузере из пула.
+    
+    Returns:
+        dict: результаты поиска для обоих направлений или ошибка поиска туда
+    """
+    def leg_status(prefix):
+        # статусы обоих направлений приходят вперемешку, поэтому помечаем их
+        if status_callback is None:
+            return None
+        async def callback(text):
+            await status_callback(f"{prefix}: {text}")
+        return callback
+    
+    if status_callback:
+        await status_callback("🔎 Выполняю поиск рейсов ТУДА и ОБРАТНО одновременно...")
+    
+    there_task = asyncio.create_task(search_flights(
+        from_city=from_city,
+        to_city=to_city,
+        depart_date=depart_date,
+        adults_count=adults_count,
+        children_count=children_count,
+        class_type=class_type,
+        flight_filter=flight_filter,
+        status_callback=leg_status("➡️ ТУДА"),
+        flight_callback=leg_flights(flight_callback, "there")
+    ))
+    back_task = asyncio.create_task(search_flights(
+        from_city=to_city,  # Меняем города местами
+        to_city=from_city,
+        depart_date=return_date,
+        adults_count=adults_count,
+        children_count=children_count,
+        class_type=class_type,
+        flight_filter=flight_filter,
+        status_callback=leg_status("⬅️ ОБРАТНО"),
+        flight_callback=leg_flights(flight_callback, "back")
+    ))
+    
+    try:
+        there_results, _ = await there_task
         
-        # Проверяем, есть ли ошибка в результатах поиска туда
+        # Если поиск туда не удался (например, рейсов нет), поиск обратно не нужен
         if "error" in there_results:
-            return there_results  # Возвращаем ошибку, если поиск туда не удался
+            back_task.cancel()
+            await asyncio.gather(back_task, return_exceptions=True)
+            return there_results
         
-        combined_results["there"] = there_results.get("there", [])
-        
-        # 3. Выполняем поиск обратно
-        if status_callback:
-            await status_callback("🔎 Выполняю поиск рейсов ОБРАТНО...")
-        
-        back_results, _ = await search_flights(
-            from_city=to_city,  # Меняем города местами
-            to_city=from_city,
-            depart_date=return_date,
-            adults_count=adults_count,
-            children_count=children_count,
-            class_type=class_type,
-            flight_filter=flight_filter,
-            status_callback=status_callback,
-            driver=driver,
-            wait=wait
-        )
-        
-        if "error" not in back_results:
-            combined_results["back"] = back_results.get("there", [])
-        
-        return combined_results
-    
+        back_results, _ = await back_task
+    except asyncio.CancelledError:
+        # поиск отменен целиком - отменяем оба направления
+        for task in (there_task, back_task):
+            task.cancel()
+        await asyncio.gather(there_task, back_task, return_exceptions=True)
+        raise
     except Exception as e:
+        back_task.cancel()
+        await asyncio.gather(back_task, return_exceptions=True)
         if status_callback:
             await status_callback(f"❌ Произошла ошибка при выполнении поиска: {str(e)}")
         return {"error": str(e)}
+    
+    combined_results = {"there": there_results.get("there", []), "back": []}
+    if "error" not in back_results:
+        combined_results["back"] = back_results.get("there", [])
+    
+    return combined_results
+
+
+def leg_flights(flight_callback, direction):
+    """
+    Оборачивает flight_callback для одного направления перелета туда-обратно:
+    каждый поиск в одну сторону сообщает рейсы как "there", а здесь им проставляется нужное направление
+    """
+    if flight_callback is None:
+        return None
+    async def callback(_, flight_data):
+        await flight_callback(direction, flight_data)
+    return callback
+
+
+async def stream_search(
+    from_city,
+    to_city,
+    depart_date,
+    return_date=None,
+    adults_count=1,
+    children_count=0,
+    class_type="economy",
+    flight_filter="all",
+    status_callback=None
+):
+    """
+    Потоковый вариант поиска: асинхронный генератор, который отдает рейсы по мере разбора карточек.
+    
+    Рейсы отдаются парами (направление, данные рейса), где направление - "there" или "back";
+    рейсы, не подходящие под фильтр, пропускаются. Последним элементом генератор отдает
+    ("result", итоговый результат) - тот же словарь, что вернули бы search_flights или
+    search_roundtrip (в том числе с ошибкой). Если генератор закрыть раньше, поиск отменяется.
+    
+    Args:
+        return_date (str, optional): дата обратного рейса; если указана, ищутся оба направления
+        остальные параметры - как у search_flights
+    """
+    queue = asyncio.Queue()
+    
+    async def on_flight(direction, flight_data):
+        if matches_filter(flight_data, flight_filter):
+            queue.put_nowait((direction, flight_data))
+    
+    async def run():
+        try:
+            if return_date:
+                result = await search_roundtrip(
+                    from_city, to_city, depart_date, return_date,
+                    adults_count=adults_count,
+                    children_count=children_count,
+                    class_type=class_type,
+                    flight_filter=flight_filter,
+                    status_callback=status_callback,
+                    flight_callback=on_flight
+                )
+            else:
+                result, _ = await search_flights(
+                    from_city, to_city, depart_date,
+                    adults_count=adults_count,
+                    children_count=children_count,
+                    class_type=class_type,
+                    flight_filter=flight_filter,
+                    status_callback=status_callback,
+                    flight_callback=on_flight
+                )
+        except Exception as e:
+            result = {"error": str(e)}
+        queue.put_nowait(("result", result))
+    
+    task = asyncio.create_task(run())
+    try:
+        while True:
+            item = await queue.get()
+            yield item
+            if item[0] == "result":
+                return
     finally:
-        # Закрываем браузер
-        if driver:
-            driver.quit()
+        if not task.done():
+            task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
 
 
-def extract_flight_data(card, card_idx, driver, wait):
+def extract_flight_data(card, card_idx, driver, wait, known_tariffs=None):
     """
     извлекает данные о рейсе из карточки.
     
@@ -483,12 +1016,13 @@ def extract_flight_data(card, card_idx, driver, wait):
         card_idx: индекс карточки
         driver: экземпляр WebDriver
         wait: экземпляр WebDriverWait
+        known_tariffs (dict, optional): тарифы из ответов страницы (см. tariff_capture.capture_tariffs)
         
     Returns:
         dict: данные о рейсе
     """
     try:
-        print(f"Обрабатываю карточку рейса #{card_idx}")
+        card_logger.debug("Обрабатываю карточку рейса #%s", card_idx)
         
         # определение наличия пересадки
         has_transfer = False
@@ -531,7 +1065,7 @@ def extract_flight_data(card, card_idx, driver, wait):
                         seats_left_val = extract_seats_text(seats_text)
                         break
         except Exception as e:
-            print(f"Ошибка при извлечении количества мест: {e}")
+            card_logger.warning("Ошибка при извлечении количества мест (карточка #%s): %s", card_idx, e)
         
         # получение и обработка только валидных сегментов полета
         valid_segments = []
@@ -597,31 +1131,7 @@ def extract_flight_data(card, card_idx, driver, wait):
             })
 
         # извлечение тарифной информации
-        miles_cost = "—"
-        rubles_cost = "—"
-        
-        try:
-            # нажимаем на кнопку "выбрать рейс" для получения тарифной информации
-            choose_button = card.find_element(By.XPATH, ".//button[contains(@class,'button--outline')]")
-            driver.execute_script("arguments[0].scrollIntoView(true);", choose_button)
-            driver.execute_script("arguments[0].click();", choose_button)
-            
-            # ожидаем открытия модального окна с тарифами
-            time.sleep(2)
-            
-            # Ограничиваем время на получение тарифа
-            try:
-                # получаем информацию о тарифе "стандарт"
-                miles_cost, rubles_cost = get_tariff_info(driver, wait)
-            except Exception as tariff_error:
-                print(f"Ошибка при получении данных о тарифе: {tariff_error}")
-                miles_cost, rubles_cost = "—", "—"
-            
-            # ожидаем закрытия модального окна
-            time.sleep(1)
-            
-        except (NoSuchElementException, ElementClickInterceptedException) as e:
-            print(f"не удалось получить информацию о тарифе: {e}")
+        miles_cost, rubles_cost = get_card_tariff(card, valid_segments, driver, wait, known_tariffs)
         
         # составляем итоговый результат
         flight_data = {
@@ -634,11 +1144,11 @@ def extract_flight_data(card, card_idx, driver, wait):
             "rubles_cost": rubles_cost
         }
         
-        print(f"Карточка рейса #{card_idx} успешно обработана")
+        card_logger.debug("Карточка рейса #%s успешно обработана", card_idx)
         return flight_data
         
     except Exception as e:
-        print(f"ошибка при извлечении данных о рейсе: {e}")
+        card_logger.warning("ошибка при извлечении данных о рейсе (карточка #%s): %s", card_idx, e)
         # возвращаем пустой объект с базовыми данными вместо None
         return {
             "id": card_idx,
@@ -650,6 +1160,130 @@ def extract_flight_data(card, card_idx, driver, wait):
             "rubles_cost": "—"
         }
         
+def extract_flight_data_from_snapshot(snapshot, card, card_idx, driver, wait, known_tariffs=None):
+    """
+    собирает данные о рейсе из снимка карточки (см. dom_extractor.snapshot_cards)
+    и дополняет их тарифом. Результат совпадает с extract_flight_data.
+    
+    Args:
+        snapshot (dict): снимок карточки, полученный одним вызовом execute_script
+        card: элемент карточки рейса (нужен для открытия тарифов)
+        card_idx: индекс карточки
+        driver: экземпляр WebDriver
+        wait: экземпляр WebDriverWait
+        known_tariffs (dict, optional): тарифы из ответов страницы (см. tariff_capture.capture_tariffs)
+        
+    Returns:
+        dict: данные о рейсе
+    """
+    try:
+        # определение наличия пересадки
+        has_transfer = False
+        transfer_time = None
+        if snapshot.get("transfer_text") is not None:
+            has_transfer = True
+            transfer_time = snapshot["transfer_text"].replace("пересадка", "").strip()
+        
+        # в снимок попадают только сегменты с информацией о вылете/прилете
+        valid_segments = []
+        for segment in snapshot.get("segments", []):
+            valid_segments.append({
+                field: value if value is not None else "—"
+                for field, value in segment.items()
+            })
+        
+        # Если больше одного сегмента, значит есть пересадки
+        if len(valid_segments) > 1:
+            has_transfer = True
+            if transfer_time is None:
+                transfer_time = f"{len(valid_segments) - 1} пересадка(и)"
+        
+        # извлечение количества доступных мест
+        seats_left_val = "—"
+        for seats_text in snapshot.get("seats_texts", []):
+            if "доступно мест" in seats_text.lower():
+                seats_left_val = extract_seats_text(seats_text)
+                break
+        
+        # извлечение тарифной информации
+        miles_cost, rubles_cost = get_card_tariff(card, valid_segments, driver, wait, known_tariffs)
+        
+        return {
+            "id": card_idx,
+            "seats_available": seats_left_val,
+            "has_transfer": has_transfer,
+            "transfer_time": transfer_time if has_transfer else None,
+            "segments": valid_segments,
+            "miles_cost": miles_cost,
+            "rubles_cost": rubles_cost
+        }
+    
+    except Exception as e:
+        card_logger.warning("ошибка при сборке данных о рейсе из снимка (карточка #%s): %s", card_idx, e)
+        # если снимок оказался неполным, разбираем карточку старым способом
+        return extract_flight_data(card, card_idx, driver, wait, known_tariffs)
+
+def get_card_tariff(card, segments, driver, wait, known_tariffs=None):
+    """
+    возвращает тариф карточки: из ответов страницы, если он там есть, иначе из модального окна.
+    
+    Args:
+        card: элемент карточки рейса
+        segments (list): сегменты рейса (нужны номера рейсов для сопоставления)
+        driver: экземпляр WebDriver
+        wait: экземпляр WebDriverWait
+        known_tariffs (dict, optional): тарифы из ответов страницы
+        
+    Returns:
+        tuple: (стоимость в милях, стоимость в рублях)
+    """
+    if known_tariffs:
+        key = flight_key(segment.get("flight_number") for segment in segments)
+        if key and key in known_tariffs:
+            return known_tariffs[key]
+    return fetch_card_tariff(card, driver, wait)
+
+def fetch_card_tariff(card, driver, wait):
+    """
+    открывает тарифы карточки кнопкой "выбрать рейс" и читает тариф "стандарт".
+    
+    Args:
+        card: элемент карточки рейса
+        driver: экземпляр WebDriver
+        wait: экземпляр WebDriverWait
+        
+    Returns:
+        tuple: (стоимость в милях, стоимость в рублях)
+    """
+    miles_cost = "—"
+    rubles_cost = "—"
+    
+    try:
+        # нажимаем на кнопку "выбрать рейс" для получения тарифной информации
+        choose_button = card.find_element(By.XPATH, ".//button[contains(@class,'button--outline')]")
+        driver.execute_script("arguments[0].scrollIntoView(true);", choose_button)
+        driver.execute_script("arguments[0].click();", choose_button)
+        
+        # Ограничиваем время на получение тарифа
+        try:
+            # получаем информацию о тарифе "стандарт" (get_tariff_info сам ждет открытия окна)
+            with span("tariff_modal"):
+                miles_cost, rubles_cost = get_tariff_info(driver, wait)
+        except Exception as tariff_error:
+            card_logger.warning("Ошибка при получении данных о тарифе: %s", tariff_error)
+            miles_cost, rubles_cost = "—", "—"
+        
+        # ожидаем закрытия модального окна, чтобы оно не перекрыло следующую карточку
+        timed_wait(
+            driver, EC.invisibility_of_element_located((By.XPATH, TARIFF_PRICE_XPATH)),
+            3, "tariff_modal_closed", raise_on_timeout=False
+        )
+        
+    except (NoSuchElementException, ElementClickInterceptedException) as e:
+        card_logger.warning("не удалось получить информацию о тарифе: %s", e)
+    
+    return miles_cost, rubles_cost
+
 def get_tariff_info(driver, wait):
     """
     извлекает информацию о тарифе "стандарт" из модального окна.
@@ -662,11 +1296,11 @@ def get_tariff_info(driver, wait):
         tuple: (стоимость в милях, стоимость в рублях)
     """
     try:
-        # ожидаем загрузку модального окна с тарифами
-        wait.until(EC.presence_of_element_located((By.XPATH, "//div[contains(@class,'tariff__table-price')]")))
+        # ожидаем загрузку модального окна с тарифами: нужны как минимум два блока цен
+        tariff_prices = timed_wait(driver, elements_count_at_least((By.XPATH, TARIFF_PRICE_XPATH), 2), TARIFF_MODAL_TIMEOUT, "tariff_modal_open")
         
         # находим информацию о тарифе "стандарт" (второй блок цен)
-        standard_tariff = driver.find_elements(By.XPATH, "//div[contains(@class,'tariff__table-cell') and contains(@class,'tariff__table-price')]")[1]
+        standard_tariff = tariff_prices[1]
         
         miles_text = ""
         rubles_text = ""
@@ -700,7 +1334,7 @@ def get_tariff_info(driver, wait):
         
         return miles_text, rubles_text
     except Exception as e:
-        print(f"ошибка при получении данных о тарифе: {e}")
+        card_logger.warning("ошибка при получении данных о тарифе: %s", e)
         return "—", "—"
 
 def extract_seats_text(text):
@@ -723,9 +1357,13 @@ def extract_seats_text(text):
     
     return "—"
 
+def _element_text(element):
+    """возвращает текст элемента (блокирующий вызов)"""
+    return element.text
+
 def safe_find_text(el, xpath):
     """безопасно извлекает текст из элемента"""
     try:
         return el.find_element(By.XPATH, xpath).text
     except Exception:
-        return "—"
\ No newline at end of file
+        return "—"
\ No newline at end of file
@@ -0,0 +1,196 @@
+# fsm_storage.py - состояния диалогов (FSM aiogram) в SQLite вместо памяти процесса
+#
+# С MemoryStorage незаконченные диалоги /search терялись при перезапуске, а несколько
+# процессов бота не видели состояния друг друга. Здесь состояние и данные диалога хранятся
+# в одной строке таблицы fsm; база в режиме WAL, поэтому ее могут открыть несколько процессов.
+# Запись идет в фоне: изменения за flush_interval собираются и пишутся одной транзакцией.
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fsm (
+    key TEXT PRIMARY KEY,               -- бот, чат, тема, пользователь и destiny (см. DefaultKeyBuilder)
+    state TEXT,
+    data TEXT NOT NULL DEFAULT '{}',    -- данные диалога в JSON
+    updated_at REAL NOT NULL            -- unix time последнего изменения
+);
+CREATE INDEX IF NOT EXISTS fsm_updated_at ON fsm (updated_at);
+"""
+
+# Пустой диалог (после state.clear()) в базе не храним
+_DELETE_EMPTY = "DELETE FROM fsm WHERE key = ? AND state IS NULL AND data = '{}'"
+
+
+class SqliteStorage(BaseStorage):
+    """
+    Хранилище FSM aiogram в SQLite.
+
+    set_state()/set_data() только запоминают изменение; фоновая задача раз в flush_interval
+    пишет все накопленные изменения одной транзакцией в отдельном потоке. Пока изменение
+    не записано, этот процесс читает его из памяти, а остальное читается из базы - так
+    другие процессы бота видят диалог не позже чем через flush_interval.
+    Диалоги, которые не менялись дольше ttl секунд, считаются брошенными и удаляются.
+    """
+
+    def __init__(self, path="fsm.db", ttl=86400, flush_interval=0.2, sweep_interval=300):
+        """
+        Args:
+            path (str): путь к файлу базы
+            ttl (float): через сколько секунд без изменений диалог удаляется (0 - не удалять)
+            flush_interval (float): как часто записывать накопленные изменения (секунды)
+            sweep_interval (float): как часто удалять брошенные диалоги (секунды)
+        """
+        self.path = path
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.sweep_interval = sweep_interval
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_business_connection_id=True, with_destiny=True)
+        self._executor = None
+        self._connection = None
+        self._pending = {}  # ключ -> {"state": ..., "data": ...} - еще не записанные изменения
+        self._flushing = {}  # изменения, которые пишутся прямо сейчас
+        self._dirty = None
+        self._writer = None
+        self._closing = False
+        self.written = 0
+        self.expired = 0
+
+    async def start(self):
+        """Открывает базу (создает таблицу) и запускает фоновую запись"""
+        if self._writer is not None:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fsm-storage")
+        await self._call(self._open)
+        self._closing = False
+        self._dirty = asyncio.Event()
+        self._writer = asyncio.create_task(self._write_loop())
+
+    async def close(self):
+        """Записывает накопленные изменения и закрывает базу (можно вызывать повторно)"""
+        if self._writer is not None:
+            self._closing = True
+            self._dirty.set()
+            await self._writer
+            self._writer = None
+        if self._connection is not None:
+            await self._call(self._connection.close)
+            self._connection = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def set_state(self, key, state=None):
+        self._remember(key, "state", state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key):
+        return await self._get(key, "state")
+
+    async def set_data(self, key, data):
+        if not isinstance(data, dict):
+            raise TypeError(f"FSM data should be a dict, not {type(data).__name__}")
+        self._remember(key, "data", dict(data))
+
+    async def get_data(self, key):
+        return dict(await self._get(key, "data"))
+
+    def _remember(self, key, part, value):
+        if self._writer is None:
+            raise RuntimeError("SqliteStorage is not started")
+        self._pending.setdefault(self.key_builder.build(key), {})[part] = value
+        self._dirty.set()
+
+    async def _get(self, key, part):
+        if self._writer is None:
+            raise RuntimeError("SqliteStorage is not started")
+        db_key = self.key_builder.build(key)
+        # свои еще не записанные изменения важнее того, что лежит в базе
+        for changes in (self._pending, self._flushing):
+            if part in changes.get(db_key, {}):
+                return changes[db_key][part]
+        state, data = await self._call(self._read, db_key)
+        return state if part == "state" else data
+
+    async def _call(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def _write_loop(self):
+        next_sweep = 0.0
+        while True:
+            timeout = max(next_sweep - time.monotonic(), 0.0) if self.ttl else None
+            try:
+                await asyncio.wait_for(self._dirty.wait(), timeout)
+                if not self._closing:
+                    # собираем изменения, которые придут за flush_interval
+                    await asyncio.sleep(self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._dirty.clear()
+
+            if self._pending:
+                self._flushing, self._pending = self._pending, {}
+                try:
+                    await self._call(self._write_batch, self._flushing)
+                    self.written += len(self._flushing)
+                except Exception as e:
+                    logger.error("Не удалось сохранить состояния диалогов: %s", e)
+                self._flushing = {}
+
+            if self.ttl and time.monotonic() >= next_sweep:
+                try:
+                    self.expired += await self._call(self._expire, time.time() - self.ttl)
+                except Exception as e:
+                    logger.warning("Не удалось удалить брошенные диалоги: %s", e)
+                next_sweep = time.monotonic() + self.sweep_interval
+
+            if self._closing and not self._pending:
+                return
+
+    # Дальше - блокирующие методы, выполняются только в потоке хранилища
+
+    def _open(self):
+        # timeout - сколько ждать, пока базу пишет другой процесс
+        self._connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+
+    def _read(self, db_key):
+        row = self._connection.execute("SELECT state, data, updated_at FROM fsm WHERE key = ?", (db_key,)).fetchone()
+        if row is None or (self.ttl and row[2] < time.time() - self.ttl):
+            return None, {}
+        return row[0], json.loads(row[1])
+
+    def _write_batch(self, batch):
+        now = time.time()
+        with self._connection:
+            for db_key, changes in batch.items():
+                if self.ttl:
+                    # брошенный диалог начинается заново, а не продолжается со старыми данными
+                    self._connection.execute("DELETE FROM fsm WHERE key = ? AND updated_at < ?", (db_key, now - self.ttl))
+                # меняем только то, что изменилось: состояние и данные задаются отдельными вызовами
+                if "state" in changes:
+                    self._connection.execute(
+                        "INSERT INTO fsm (key, state, updated_at) VALUES (?, ?, ?)"
+                        " ON CONFLICT (key) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                        (db_key, changes["state"], now),
+                    )
+                if "data" in changes:
+                    self._connection.execute(
+                        "INSERT INTO fsm (key, data, updated_at) VALUES (?, ?, ?)"
+                        " ON CONFLICT (key) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                        (db_key, json.dumps(changes["data"], ensure_ascii=False), now),
+                    )
+                self._connection.execute(_DELETE_EMPTY, (db_key,))
+
+    def _expire(self, before):
+        with self._connection:
+            return self._connection.execute("DELETE FROM fsm WHERE updated_at < ?", (before,)).rowcount
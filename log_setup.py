@@ -0,0 +1,114 @@
+# log_setup.py - журнал бота: уровни, идентификатор запроса и запись в отдельном потоке
+#
+# Модули пишут в logging.getLogger(__name__). Записи попадают в очередь (QueueHandler),
+# а в консоль или файл их выводит отдельный поток (QueueListener), поэтому поиск не ждет
+# вывода. Каждая запись помечается идентификатором запроса (обновления Telegram, повторного
+# поиска подписки и т.п.) из contextvars - так строки одного поиска можно собрать вместе,
+# в том числе из потоков Selenium (см. selenium_executor.run_blocking).
+import contextvars
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+
+# Логгер подробностей по каждой карточке рейса: в production его можно отключить
+CARD_LOGGER = "flight_searcher.cards"
+
+TEXT_FORMAT = "%(asctime)s %(levelname)-7s [%(request_id)s] %(name)s: %(message)s"
+
+_request_id = contextvars.ContextVar("request_id", default="-")
+_request_ids = itertools.count(1)
+_listener = None
+
+
+def current_request_id():
+    """Идентификатор текущего запроса или "-" """
+    return _request_id.get()
+
+
+def new_request_id(prefix="r"):
+    """Новый короткий идентификатор запроса, уникальный в пределах процесса"""
+    return f"{prefix}{next(_request_ids)}"
+
+
+class request_context:
+    """Помечает все записи журнала внутри блока идентификатором запроса: with request_context("u123"): ..."""
+
+    def __init__(self, request_id=None):
+        self.request_id = request_id or new_request_id()
+        self._token = None
+
+    def __enter__(self):
+        self._token = _request_id.set(self.request_id)
+        return self
+
+    def __exit__(self, *exc_info):
+        _request_id.reset(self._token)
+        return False
+
+
+class RequestIdFilter(logging.Filter):
+    """Добавляет к записи request_id (выполняется в потоке, который пишет запись)"""
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись журнала одной строкой JSON: время, уровень, логгер, запрос, сообщение и ошибка"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def setup_logging(level="INFO", card_details=False, json_format=False, path=None):
+    """
+    Настраивает журнал: запись через очередь, вывод в отдельном потоке
+
+    Args:
+        level (str): уровень корневого логгера (DEBUG, INFO, WARNING, ...)
+        card_details (bool): писать подробности по каждой карточке рейса (логгер CARD_LOGGER);
+            при False от него остаются только предупреждения и ошибки
+        json_format (bool): выводить записи строками JSON вместо текста
+        path (str, optional): файл журнала; по умолчанию - stderr
+    """
+    global _listener
+    stop_logging()
+
+    output = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler()
+    formatter = JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+    output.setFormatter(formatter)
+
+    records = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(records)
+    # request_id берется в потоке, который пишет запись, а не в потоке вывода
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    logging.getLogger(CARD_LOGGER).setLevel(logging.DEBUG if card_details else logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """Выводит оставшиеся записи и останавливает поток вывода"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
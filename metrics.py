@@ -0,0 +1,281 @@
+# metrics.py - метрики поиска: этапы (spans), счетчики и гистограммы
+#
+# Метрики копятся в памяти процесса и отдаются двумя способами: по HTTP в текстовом формате
+# Prometheus (/metrics) и событиями в файл JSON lines для разбора после прогона.
+# Маршрут текущего поиска хранится в contextvars, поэтому этапы внутри поиска (в том числе
+# в потоках Selenium, см. selenium_executor.run_blocking) помечаются им автоматически.
+import contextvars
+import json
+import queue
+import threading
+import time
+
+# Границы корзин гистограмм (секунды): от быстрых вызовов WebDriver до долгих поисков
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+
+# Маршрут текущего поиска ("MOW-LED")
+_current_route = contextvars.ContextVar("metrics_route", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _label_text(labels):
+    """Метки в формате Prometheus: {phase="page_load",route="MOW-LED"}"""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class MetricsRegistry:
+    """
+    Счетчики и гистограммы с метками.
+
+    Обновляются из цикла событий и из потоков Selenium, поэтому защищены блокировкой.
+    Ключ метрики - имя и отсортированные пары меток.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counters = {}  # (имя, метки) -> значение
+        self._histograms = {}  # (имя, метки) -> [счетчики корзин..., сумма, количество]
+        self._sink = None
+
+    def inc(self, name, value=1, **labels):
+        """Увеличивает счетчик"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Добавляет значение в гистограмму"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * len(self.buckets) + [0.0, 0]
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[idx] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def set_sink(self, sink):
+        """Задает получателя событий (JsonLinesSink) или None"""
+        self._sink = sink
+
+    def emit(self, event):
+        """Отправляет событие получателю, если он задан"""
+        sink = self._sink
+        if sink is not None:
+            sink.write(dict(event, ts=time.time()))
+
+    def render_prometheus(self):
+        """Все метрики в текстовом формате Prometheus"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, list(values)) for key, values in self._histograms.items())
+
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_label_text(labels)} {value}")
+        for (name, labels), values in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            for bound, count in zip(self.buckets, values):
+                lines.append(f"{name}_bucket{_label_text(labels + (('le', bound),))} {count}")
+            lines.append(f"{name}_bucket{_label_text(labels + (('le', '+Inf'),))} {values[-1]}")
+            lines.append(f"{name}_sum{_label_text(labels)} {values[-2]:.6f}")
+            lines.append(f"{name}_count{_label_text(labels)} {values[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """
+        Метрики в виде словаря (для /metrics.json и отладки)
+
+        Returns:
+            dict: {"counters": [...], "histograms": [...]} с метками, суммой, количеством и средним
+        """
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                {
+                    "name": name, "labels": dict(labels), "count": values[-1], "sum": values[-2],
+                    "avg": values[-2] / values[-1] if values[-1] else 0.0,
+                    "buckets": dict(zip(self.buckets, values[:-2])),
+                }
+                for (name, labels), values in sorted(self._histograms.items())
+            ]
+        return {"counters": counters, "histograms": histograms}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+# Общий реестр процесса
+METRICS = MetricsRegistry()
+
+
+class route_context:
+    """Помечает все этапы внутри блока маршрутом поиска: with route_context("MOW-LED"): ..."""
+
+    def __init__(self, route):
+        self.route = route
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current_route.set(self.route)
+        return self
+
+    def __exit__(self, *exc_info):
+        _current_route.reset(self._token)
+        return False
+
+
+def current_route():
+    """Маршрут текущего поиска или None"""
+    return _current_route.get()
+
+
+class span:
+    """
+    Этап поиска: время блока попадает в гистограмму search_phase_seconds{phase, route},
+    ошибка - в счетчик search_phase_errors_total, а сам этап - событием в JSON lines.
+    Работает и как with, и как async with.
+    """
+
+    def __init__(self, phase, registry=None, **fields):
+        """
+        Args:
+            phase (str): название этапа (page_load, find_click, card, ...)
+            registry (MetricsRegistry, optional): реестр; по умолчанию METRICS
+            **fields: дополнительные поля события (в метки не попадают)
+        """
+        self.phase = phase
+        self.registry = registry or METRICS
+        self.fields = fields
+        self.seconds = None
+        self._started = None
+
+    def __enter__(self):
+        self._started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.monotonic() - self._started
+        route = current_route() or "-"
+        self.registry.observe("search_phase_seconds", self.seconds, phase=self.phase, route=route)
+        error = exc_type.__name__ if exc_type is not None else None
+        if error:
+            self.registry.inc("search_phase_errors_total", phase=self.phase, error=error)
+        self.registry.emit(dict(self.fields, type="span", phase=self.phase, route=route, seconds=round(self.seconds, 4), error=error))
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+def instrument_driver(driver, registry=None):
+    """
+    Считает команды WebDriver и их ошибки (webdriver_commands_total, webdriver_errors_total).
+    Все вызовы, в том числе методы элементов, проходят через driver.execute.
+    """
+    registry = registry or METRICS
+    execute = driver.execute
+
+    def counting_execute(command, params=None):
+        registry.inc("webdriver_commands_total", command=command)
+        try:
+            return execute(command, params)
+        except Exception as e:
+            registry.inc("webdriver_errors_total", command=command, error=type(e).__name__)
+            raise
+
+    driver.execute = counting_execute
+    return driver
+
+
+class JsonLinesSink:
+    """
+    Пишет события в файл JSON lines из отдельного потока, чтобы запись на диск
+    не задерживала поиск
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="metrics-jsonl", daemon=True)
+        self._thread.start()
+
+    def write(self, event):
+        self._queue.put(event)
+
+    def close(self):
+        """Дописывает очередь и закрывает файл"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                event = self._queue.get()
+                if event is None:
+                    return
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+                # сбрасываем на диск, когда очередь опустела, а не после каждой строки
+                if self._queue.empty():
+                    f.flush()
+
+
+class MetricsServer:
+    """
+    HTTP-сервер метрик: /metrics (формат Prometheus) и /metrics.json.
+
+    aiohttp импортируется только здесь: реестр и span работают и без него.
+    """
+
+    def __init__(self, registry=None, host="127.0.0.1", port=9108):
+        self.registry = registry or METRICS
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def start(self):
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get("/metrics", self._metrics)
+        app.router.add_get("/metrics.json", self._metrics_json)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _metrics(self, request):
+        from aiohttp import web
+
+        return web.Response(text=self.registry.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+    async def _metrics_json(self, request):
+        from aiohttp import web
+
+        return web.json_response(self.registry.snapshot())
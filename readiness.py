@@ -0,0 +1,132 @@
+# readiness.py - ожидание готовности страницы вместо фиксированных пауз
+import logging
+import threading
+import time
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Частота опроса условий: достаточно часто, чтобы не терять время, и достаточно редко,
+# чтобы не заваливать chromedriver запросами
+POLL_FREQUENCY = 0.1
+
+# Статистика ожиданий по названиям: сколько раз ждали, сколько всего и максимум секунд
+_wait_stats = {}
+_wait_stats_lock = threading.Lock()
+
+
+class page_is_settled:
+    """
+    Условие для WebDriverWait: DOM (или его часть) не меняется и страница не загружает ресурсы.
+
+    На каждом опросе одним execute_script читаются сигнатура DOM (количество элементов
+    и длина разметки) и количество загруженных ресурсов (Resource Timing API). Страница
+    готова, когда оба признака не менялись quiet_period секунд; время тишины каждого
+    отсчитывается независимо, поэтому паузы идут одновременно, а не складываются.
+    """
+
+    def __init__(self, css_selector=None, quiet_period=0.5):
+        """
+        Args:
+            css_selector (str, optional): корневой элемент для проверки DOM; по умолчанию весь документ
+            quiet_period (float): сколько секунд оба признака должны оставаться неизменными
+        """
+        self.css_selector = css_selector
+        self.quiet_period = quiet_period
+        self._last = [None, None]  # [сигнатура DOM, количество ресурсов]
+        self._quiet_since = [None, None]
+
+    def __call__(self, driver):
+        observed = driver.execute_script(
+            "var root = arguments[0] ? document.querySelector(arguments[0]) : document.documentElement;"
+            "var dom = root ? [root.getElementsByTagName('*').length, root.innerHTML.length] : null;"
+            "return [dom, performance.getEntriesByType('resource').length];",
+            self.css_selector,
+        )
+        now = time.monotonic()
+        settled = True
+        for idx, value in enumerate(observed):
+            if value is None or value != self._last[idx]:
+                self._last[idx] = value
+                self._quiet_since[idx] = now
+                settled = False
+            elif now - self._quiet_since[idx] < self.quiet_period:
+                settled = False
+        return settled
+
+
+class elements_count_at_least:
+    """Условие для WebDriverWait: найдено не меньше count элементов; возвращает их список"""
+
+    def __init__(self, locator, count):
+        self.locator = locator
+        self.count = count
+
+    def __call__(self, driver):
+        elements = driver.find_elements(*self.locator)
+        return elements if len(elements) >= self.count else False
+
+
+def timed_wait(driver, condition, timeout, label, raise_on_timeout=True):
+    """
+    Ждет выполнения условия и запоминает, сколько времени на самом деле заняло ожидание.
+
+    Args:
+        driver: экземпляр WebDriver
+        condition (callable): условие для WebDriverWait (expected_conditions или классы выше)
+        timeout (float): максимальное время ожидания в секундах
+        label (str): название ожидания для статистики
+        raise_on_timeout (bool): выбрасывать TimeoutException или вернуть None
+
+    Returns:
+        результат условия (или None, если время вышло и raise_on_timeout=False)
+    """
+    started = time.monotonic()
+    timed_out = False
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=POLL_FREQUENCY).until(condition)
+    except TimeoutException:
+        timed_out = True
+        if raise_on_timeout:
+            raise
+        return None
+    finally:
+        _record_wait(label, time.monotonic() - started, timed_out)
+
+
+def _record_wait(label, elapsed, timed_out):
+    with _wait_stats_lock:
+        stats = _wait_stats.setdefault(label, {"count": 0, "total": 0.0, "max": 0.0, "timeouts": 0})
+        stats["count"] += 1
+        stats["total"] += elapsed
+        stats["max"] = max(stats["max"], elapsed)
+        if timed_out:
+            stats["timeouts"] += 1
+    METRICS.observe("wait_seconds", elapsed, label=label)
+    if timed_out:
+        METRICS.inc("wait_timeouts_total", label=label)
+    logger.debug("Ожидание '%s': %.2f с%s", label, elapsed, " (истекло время)" if timed_out else "")
+
+
+def get_wait_stats():
+    """
+    Возвращает статистику ожиданий
+
+    Returns:
+        dict: название -> {count, total, max, timeouts, avg}
+    """
+    with _wait_stats_lock:
+        return {
+            label: dict(stats, avg=stats["total"] / stats["count"] if stats["count"] else 0.0)
+            for label, stats in _wait_stats.items()
+        }
+
+
+def reset_wait_stats():
+    """Очищает статистику ожиданий"""
+    with _wait_stats_lock:
+        _wait_stats.clear()
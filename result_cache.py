@@ -0,0 +1,122 @@
+# result_cache.py - кэш результатов поиска с ограничением по времени жизни и размеру
+import copy
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    """
+    LRU-кэш результатов поиска со временем жизни записей.
+
+    Хранит не больше max_entries записей: при переполнении вытесняется запись,
+    к которой дольше всего не обращались. Записи старше ttl секунд считаются
+    устаревшими и удаляются при обращении.
+    """
+
+    def __init__(self, max_entries=256, ttl=600):
+        """
+        Args:
+            max_entries (int): максимальное количество записей
+            ttl (float): время жизни записи в секундах
+        """
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self._entries = OrderedDict()  # ключ -> (время записи, результат)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """
+        Возвращает копию результата из кэша
+
+        Args:
+            key (tuple): ключ поиска (см. make_search_key)
+
+        Returns:
+            результат поиска или None, если записи нет или она устарела
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        # отдаем копию, чтобы вызывающий код не испортил закэшированные данные
+        return copy.deepcopy(value)
+
+    def __contains__(self, key):
+        """Проверяет наличие актуальной записи, не меняя счетчики и порядок вытеснения"""
+        entry = self._entries.get(key)
+        return entry is not None and time.monotonic() - entry[0] <= self.ttl
+
+    def set(self, key, value):
+        """Сохраняет копию результата в кэш, вытесняя самые старые записи"""
+        self._entries[key] = (time.monotonic(), copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        """Удаляет запись из кэша"""
+        self._entries.pop(key, None)
+
+    def clear(self):
+        """Очищает кэш (счетчики сохраняются)"""
+        self._entries.clear()
+
+    def stats(self):
+        """
+        Возвращает статистику кэша
+
+        Returns:
+            dict: размер, попадания, промахи, вытеснения и доля попаданий
+        """
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def make_search_key(from_code, to_code, depart_date, adults_count, children_count, service_class, flight_filter):
+    """
+    Формирует ключ кэша из нормализованных параметров поиска (тех же, что попадают в URL)
+
+    Args:
+        from_code (str): IATA-код города отправления
+        to_code (str): IATA-код города прибытия
+        depart_date (str): дата вылета в формате YYYYMMDD
+        adults_count (int): количество взрослых
+        children_count (int): количество детей
+        service_class (str): класс обслуживания (economy, comfort, business)
+        flight_filter (str): фильтр типа рейса ('all', 'direct', 'connections')
+
+    Returns:
+        tuple: ключ кэша
+    """
+    return (
+        from_code.upper(),
+        to_code.upper(),
+        depart_date,
+        int(adults_count),
+        int(children_count),
+        service_class,
+        flight_filter,
+    )
@@ -0,0 +1,153 @@
+# result_pages.py - упаковка результатов поиска в страницы и их хранение для пагинации
+import secrets
+
+from aiogram import types
+
+from result_cache import ResultCache
+
+# Максимальная длина текста одного сообщения Telegram
+MESSAGE_LIMIT = 4096
+
+# Разделитель между карточками рейсов внутри одного сообщения
+BLOCK_SEPARATOR = "\n\n"
+
+# Префикс callback_data кнопок переключения страниц: page:<id набора>:<номер страницы>
+PAGE_CALLBACK_PREFIX = "page:"
+
+
+def pack_blocks(blocks, limit=MESSAGE_LIMIT, separator=BLOCK_SEPARATOR):
+    """
+    Упаковывает текстовые блоки в минимальное количество страниц не длиннее limit.
+
+    Блоки не разрываются (HTML-разметка внутри блока остается целой) и идут в
+    исходном порядке. Блок длиннее limit обрезается по последней целой строке.
+
+    Args:
+        blocks (list): тексты блоков (например, результат format_flight_info)
+        limit (int): максимальная длина страницы
+        separator (str): разделитель блоков внутри страницы
+
+    Returns:
+        list: тексты страниц
+    """
+    pages = []
+    current = ""
+    for block in blocks:
+        if len(block) > limit:
+            block = _truncate(block, limit)
+        if not current:
+            current = block
+        elif len(current) + len(separator) + len(block) <= limit:
+            current += separator + block
+        else:
+            pages.append(current)
+            current = block
+    if current:
+        pages.append(current)
+    return pages
+
+
+def _truncate(block, limit):
+    """Обрезает блок по последнему переводу строки, который помещается в limit"""
+    suffix = "\n…"
+    cut = block.rfind("\n", 0, limit - len(suffix))
+    if cut <= 0:
+        cut = limit - len(suffix)
+    return block[:cut] + suffix
+
+
+class ResultPages:
+    """
+    Хранилище страниц результатов на стороне бота.
+
+    Бот отправляет только первую страницу, остальные отдаются из памяти при
+    нажатии кнопок пагинации: сообщение редактируется на месте, новые сообщения
+    не отправляются. Наборы страниц живут ограниченное время и вытесняются по LRU.
+    Идентификаторы наборов случайные, и набор отдается только чату, для которого
+    он создан: старая кнопка после перезапуска бота не откроет чужие результаты.
+    """
+
+    def __init__(self, max_sets=500, ttl=3600):
+        """
+        Args:
+            max_sets (int): сколько наборов страниц хранить одновременно
+            ttl (float): время жизни набора в секундах
+        """
+        self._sets = ResultCache(max_entries=max_sets, ttl=ttl)
+
+    def add(self, chat_id, pages):
+        """
+        Сохраняет набор страниц
+
+        Args:
+            chat_id (int): чат, которому принадлежат результаты
+            pages (list): тексты страниц (см. pack_blocks)
+
+        Returns:
+            str: идентификатор набора для callback_data
+        """
+        set_id = secrets.token_urlsafe(8)
+        self._sets.set(set_id, (chat_id, pages))
+        return set_id
+
+    def get(self, chat_id, set_id, page):
+        """
+        Возвращает страницу набора
+
+        Args:
+            chat_id (int): чат, из которого нажата кнопка
+            set_id (str): идентификатор набора
+            page (int): номер страницы, начиная с 0
+
+        Returns:
+            tuple: (текст страницы, количество страниц) или None, если набор устарел
+                или принадлежит другому чату
+        """
+        found = self._sets.get(set_id)
+        if found is None:
+            return None
+        owner, pages = found
+        if owner != chat_id or not pages or not 0 <= page < len(pages):
+            return None
+        return pages[page], len(pages)
+
+    def keyboard(self, set_id, page, total, extra_rows=None):
+        """
+        Собирает клавиатуру пагинации
+
+        Args:
+            set_id (str): идентификатор набора
+            page (int): номер текущей страницы, начиная с 0
+            total (int): количество страниц
+            extra_rows (list, optional): дополнительные ряды кнопок под пагинацией
+
+        Returns:
+            InlineKeyboardMarkup: клавиатура или None, если кнопок нет
+        """
+        rows = []
+        if total > 1:
+            row = []
+            if page > 0:
+                row.append(types.InlineKeyboardButton(text="◀️", callback_data=f"{PAGE_CALLBACK_PREFIX}{set_id}:{page - 1}"))
+            row.append(types.InlineKeyboardButton(text=f"{page + 1}/{total}", callback_data=f"{PAGE_CALLBACK_PREFIX}{set_id}:{page}"))
+            if page < total - 1:
+                row.append(types.InlineKeyboardButton(text="▶️", callback_data=f"{PAGE_CALLBACK_PREFIX}{set_id}:{page + 1}"))
+            rows.append(row)
+        rows.extend(extra_rows or [])
+        return types.InlineKeyboardMarkup(inline_keyboard=rows) if rows else None
+
+
+def parse_page_callback(data):
+    """
+    Разбирает callback_data кнопки пагинации
+
+    Returns:
+        tuple: (идентификатор набора, номер страницы) или None, если данные не от пагинации
+    """
+    if not data or not data.startswith(PAGE_CALLBACK_PREFIX):
+        return None
+    try:
+        set_id, page = data[len(PAGE_CALLBACK_PREFIX):].rsplit(":", 1)
+        return set_id, int(page)
+    except ValueError:
+        return None
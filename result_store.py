@@ -0,0 +1,278 @@
+# result_store.py - история результатов поиска на диске (SQLite)
+#
+# Каждый поиск на сайте записывается в таблицу scrapes, его рейсы - в flights, сегменты - в segments.
+# Запись идет в фоне пачками в отдельном потоке, поэтому не задерживает обработку сообщений.
+import asyncio
+import json
+import logging
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scrapes (
+    id INTEGER PRIMARY KEY,
+    from_code TEXT NOT NULL,
+    to_code TEXT NOT NULL,
+    depart_date TEXT NOT NULL,          -- YYYYMMDD
+    service_class TEXT NOT NULL,
+    adults_count INTEGER NOT NULL,
+    children_count INTEGER NOT NULL,
+    scraped_at REAL NOT NULL,           -- unix time
+    error TEXT,                         -- no_flights_available и т.п., NULL если рейсы есть
+    result TEXT NOT NULL                -- полный результат в JSON
+);
+-- прежний индекс без пассажиров: поиски с разным количеством пассажиров не сравниваются
+DROP INDEX IF EXISTS scrapes_route;
+CREATE INDEX IF NOT EXISTS scrapes_search ON scrapes
+    (from_code, to_code, depart_date, service_class, adults_count, children_count, scraped_at);
+CREATE INDEX IF NOT EXISTS scrapes_scraped_at ON scrapes (scraped_at);
+
+CREATE TABLE IF NOT EXISTS flights (
+    id INTEGER PRIMARY KEY,
+    scrape_id INTEGER NOT NULL REFERENCES scrapes (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    flight_numbers TEXT NOT NULL,       -- номера рейсов сегментов через пробел
+    dep_time TEXT,
+    arr_time TEXT,
+    has_transfer INTEGER NOT NULL,
+    transfer_time TEXT,
+    miles_cost INTEGER,
+    rubles_cost INTEGER,
+    seats_available INTEGER
+);
+CREATE INDEX IF NOT EXISTS flights_scrape ON flights (scrape_id);
+CREATE INDEX IF NOT EXISTS flights_numbers ON flights (flight_numbers);
+
+CREATE TABLE IF NOT EXISTS segments (
+    flight_id INTEGER NOT NULL REFERENCES flights (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    flight_number TEXT,
+    airline TEXT,
+    plane_model TEXT,
+    iata_from TEXT,
+    iata_to TEXT,
+    depart_city TEXT,
+    arrive_city TEXT,
+    dep_time TEXT,
+    arr_time TEXT,
+    PRIMARY KEY (flight_id, position)
+);
+"""
+
+
+def _to_int(value):
+    """Число из строки стоимости или количества мест ("25 000" -> 25000) или None"""
+    digits = re.sub(r"\D", "", str(value))
+    return int(digits) if digits else None
+
+
+class ResultStore:
+    """
+    Хранилище результатов поиска в SQLite.
+
+    record() только ставит результат в очередь; фоновая задача собирает очередь в пачки
+    (до batch_size поисков или раз в flush_interval секунд) и пишет каждую пачку одной
+    транзакцией в отдельном потоке. Запросы тоже выполняются в этом потоке.
+    """
+
+    def __init__(self, path="results.db", batch_size=200, flush_interval=1.0):
+        """
+        Args:
+            path (str): путь к файлу базы
+            batch_size (int): максимальное количество поисков в одной транзакции
+            flush_interval (float): как часто сбрасывать накопленные записи (секунды)
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="result-store")
+        self._connection = None
+        self._queue = None
+        self._writer = None
+        self.written = 0
+
+    async def start(self):
+        """Открывает базу (создает таблицы) и запускает фоновую запись"""
+        await self._call(self._open)
+        self._queue = asyncio.Queue()
+        self._writer = asyncio.create_task(self._write_loop())
+
+    async def close(self):
+        """Дописывает очередь и закрывает базу"""
+        if self._writer is not None:
+            await self._queue.put(None)
+            await self._writer
+            self._writer = None
+        if self._connection is not None:
+            await self._call(self._connection.close)
+            self._connection = None
+        self._executor.shutdown(wait=True)
+
+    def record(self, params, results, scraped_at=None):
+        """
+        Ставит результат поиска в очередь на запись (не блокирует)
+
+        Args:
+            params (dict): нормализованные параметры поиска (см. normalize_search_params)
+            results (dict): результат поиска на сайте {"there": [...]} или ошибка
+            scraped_at (float, optional): время поиска (unix time), по умолчанию - сейчас
+        """
+        if self._queue is None:
+            return
+        self._queue.put_nowait((dict(params), results, scraped_at or time.time()))
+
+    async def recent_results(self, from_code, to_code, depart_date, service_class, adults_count, children_count, max_age):
+        """
+        Последний результат такого поиска, если он не старше max_age секунд
+
+        Args:
+            depart_date (str): дата в формате YYYYMMDD
+            max_age (float): максимальный возраст результата в секундах
+
+        Returns:
+            dict: результат поиска (как его вернул сайт) или None
+        """
+        return await self._call(
+            self._recent_results, from_code, to_code, depart_date, service_class,
+            adults_count, children_count, time.time() - max_age
+        )
+
+    async def trend(self, from_code, to_code, depart_date, service_class, adults_count, children_count, since=None, flight_numbers=None):
+        """
+        Изменение цен и мест по маршруту, дате и составу пассажиров между поисками
+
+        Args:
+            depart_date (str): дата в формате YYYYMMDD
+            since (float, optional): учитывать поиски не раньше этого времени (unix time)
+            flight_numbers (str, optional): только рейс с этими номерами сегментов ("SU1706 SU6218")
+
+        Returns:
+            list: [{scraped_at, flights, min_miles, min_rubles, seats}, ...] по времени поиска
+        """
+        return await self._call(
+            self._trend, from_code, to_code, depart_date, service_class,
+            adults_count, children_count, since or 0, flight_numbers
+        )
+
+    async def _call(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def _write_loop(self):
+        stopping = False
+        while not stopping:
+            batch = [await self._queue.get()]
+            # собираем все, что накопилось за flush_interval, но не больше batch_size
+            deadline = asyncio.get_running_loop().time() + self.flush_interval
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [item for item in batch if item is not None]
+            if batch:
+                try:
+                    await self._call(self._write_batch, batch)
+                    self.written += len(batch)
+                except Exception as e:
+                    logger.error("Не удалось сохранить результаты поиска: %s", e)
+
+    # Дальше - блокирующие методы, выполняются только в потоке хранилища
+
+    def _open(self):
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("PRAGMA foreign_keys=ON")
+        self._connection.executescript(SCHEMA)
+
+    def _write_batch(self, batch):
+        with self._connection:
+            for params, results, scraped_at in batch:
+                cursor = self._connection.execute(
+                    "INSERT INTO scrapes (from_code, to_code, depart_date, service_class, adults_count,"
+                    " children_count, scraped_at, error, result) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        params["from_code"], params["to_code"], params["depart_date"], params["service_class"],
+                        params["adults_count"], params["children_count"], scraped_at,
+                        results.get("error"), json.dumps(results, ensure_ascii=False),
+                    ),
+                )
+                scrape_id = cursor.lastrowid
+                for position, flight in enumerate(results.get("there", [])):
+                    if "error" in flight:
+                        continue
+                    segments = flight.get("segments", [])
+                    cursor = self._connection.execute(
+                        "INSERT INTO flights (scrape_id, position, flight_numbers, dep_time, arr_time, has_transfer,"
+                        " transfer_time, miles_cost, rubles_cost, seats_available) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            scrape_id, position,
+                            " ".join(segment.get("flight_number", "—") for segment in segments),
+                            segments[0].get("dep_time") if segments else None,
+                            segments[-1].get("arr_time") if segments else None,
+                            int(bool(flight.get("has_transfer"))), flight.get("transfer_time"),
+                            _to_int(flight.get("miles_cost", "—")), _to_int(flight.get("rubles_cost", "—")),
+                            _to_int(flight.get("seats_available", "—")),
+                        ),
+                    )
+                    flight_id = cursor.lastrowid
+                    self._connection.executemany(
+                        "INSERT INTO segments (flight_id, position, flight_number, airline, plane_model, iata_from,"
+                        " iata_to, depart_city, arrive_city, dep_time, arr_time) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        [
+                            (
+                                flight_id, idx, segment.get("flight_number"), segment.get("airline"),
+                                segment.get("plane_model"), segment.get("iata_from"), segment.get("iata_to"),
+                                segment.get("depart_city"), segment.get("arrive_city"),
+                                segment.get("dep_time"), segment.get("arr_time"),
+                            )
+                            for idx, segment in enumerate(segments)
+                        ],
+                    )
+
+    def _recent_results(self, from_code, to_code, depart_date, service_class, adults_count, children_count, min_scraped_at):
+        row = self._connection.execute(
+            "SELECT result FROM scrapes WHERE from_code = ? AND to_code = ? AND depart_date = ? AND service_class = ?"
+            " AND scraped_at >= ? AND adults_count = ? AND children_count = ? ORDER BY scraped_at DESC LIMIT 1",
+            (from_code, to_code, depart_date, service_class, min_scraped_at, adults_count, children_count),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _trend(self, from_code, to_code, depart_date, service_class, adults_count, children_count, since, flight_numbers):
+        join_filter = " AND f.flight_numbers = ?" if flight_numbers else ""
+        args = ([flight_numbers] if flight_numbers else []) + [
+            from_code, to_code, depart_date, service_class, adults_count, children_count, since
+        ]
+        rows = self._connection.execute(
+            "SELECT s.id, s.scraped_at, f.id, f.miles_cost, f.rubles_cost, f.seats_available"
+            " FROM scrapes s LEFT JOIN flights f ON f.scrape_id = s.id" + join_filter +
+            " WHERE s.from_code = ? AND s.to_code = ? AND s.depart_date = ? AND s.service_class = ?"
+            " AND s.adults_count = ? AND s.children_count = ? AND s.scraped_at >= ?"
+            " ORDER BY s.scraped_at, s.id",
+            args,
+        ).fetchall()
+
+        trend = []
+        points = {}
+        for scrape_id, scraped_at, flight_id, miles, rubles, seats in rows:
+            point = points.get(scrape_id)
+            if point is None:
+                point = points[scrape_id] = {"scraped_at": scraped_at, "flights": 0, "min_miles": None, "min_rubles": None, "seats": 0}
+                trend.append(point)
+            if flight_id is None:
+                continue
+            point["flights"] += 1
+            point["seats"] += seats or 0
+            # рубли (сборы) берем у самого дешевого по милям рейса этого поиска
+            if miles is not None and (point["min_miles"] is None or miles < point["min_miles"]):
+                point["min_miles"], point["min_rubles"] = miles, rubles
+        return trend
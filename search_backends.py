@@ -0,0 +1,303 @@
+# search_backends.py - способы получить рейсы с сайта: браузер (flight_searcher) или прямые запросы к API
+#
+# Страница поиска (SPA /sb/app/ru-ru#/search) сама получает рейсы JSON-запросами к API.
+# HttpSearchBackend делает те же запросы без браузера через общий пул соединений
+# и собирает из ответа такой же результат {"there": [...]}, как разбор страницы в Selenium.
+# Путь запроса и схема ответа предположены, а не записаны с сайта (см. fixtures/api/README.md).
+import json
+import logging
+import os
+import re
+
+from tariff_capture import award_variants, normalize_flight_number, select_tariff, STANDARD_TARIFF
+
+logger = logging.getLogger(__name__)
+
+# Адрес API поиска, к которому обращается страница поиска
+API_BASE_URL = "https://www.aeroflot.ru"
+API_SEARCH_PATH = "/sb/booking/api/app/search/v4"
+
+_TIME = re.compile(r"(\d{1,2}):(\d{2})")
+
+# Варианты названий полей сегмента в ответах API
+_SEGMENT_FIELDS = {
+    "dep_time": ("departure_time", "departureTime", "departure_datetime", "departureDateTime", "departure", "dep_time"),
+    "arr_time": ("arrival_time", "arrivalTime", "arrival_datetime", "arrivalDateTime", "arrival", "arr_time"),
+    "iata_from": ("origin", "origin_airport", "departure_airport", "departureAirport", "from", "iata_from"),
+    "iata_to": ("destination", "destination_airport", "arrival_airport", "arrivalAirport", "to", "iata_to"),
+    "depart_city": ("origin_city", "departure_city", "departureCity", "city_from", "depart_city"),
+    "arrive_city": ("destination_city", "arrival_city", "arrivalCity", "city_to", "arrive_city"),
+    "airline": ("airline_name", "airlineName", "operating_airline_name", "carrier_name", "airline"),
+    "plane_model": ("aircraft_name", "aircraft", "aircraft_type", "aircraftType", "plane", "equipment"),
+}
+# Ключи списка вариантов перелета в ответе (по ним отличаем "рейсов нет" от непонятного ответа)
+_ITINERARY_KEYS = ("itineraries", "variants", "offers", "flights")
+_SEATS_KEYS = ("seats_available", "available_seats", "availableSeats", "seats_left", "seats")
+_TRANSFER_KEYS = ("transfer_time", "connection_time", "connectionTime", "layover", "transfer_duration")
+
+
+def fixture_name(from_code, to_code, depart_date=None):
+    """
+    Имя файла записанного ответа API для поиска
+
+    Args:
+        depart_date (str, optional): дата в формате YYYYMMDD; без нее - ответ на любую дату маршрута
+    """
+    name = f"{from_code.upper()}-{to_code.upper()}"
+    return f"{name}-{depart_date}.json" if depart_date else f"{name}.json"
+
+
+def no_flights_result(adults_count, children_count):
+    """Результат поиска без рейсов (такой же, как у поиска в браузере)"""
+    return {
+        "error": "no_flights_available",
+        "message": "На выбранные даты рейсы не найдены",
+        "suggestions": [
+            "Выберите другую дату",
+            "Уменьшите количество пассажиров",
+            f"Текущее количество пассажиров: {adults_count} взр., {children_count} дет.",
+            "Попробуйте другой класс обслуживания"
+        ]
+    }
+
+
+def _itinerary_lists(payload):
+    """Все списки вариантов перелета в ответе (под ключами _ITINERARY_KEYS на любом уровне объектов)"""
+    lists = []
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, dict):
+            continue
+        for key, value in node.items():
+            if key in _ITINERARY_KEYS and isinstance(value, list):
+                lists.append(value)
+            elif isinstance(value, dict):
+                stack.append(value)
+    return lists
+
+
+def build_search_request(params):
+    """
+    Тело запроса поиска за мили в одну сторону (те же параметры, что страница берет из URL)
+
+    Args:
+        params (dict): нормализованные параметры поиска (см. normalize_search_params)
+    """
+    depart_date = params["depart_date"]
+    return {
+        "routes": [{
+            "origin": params["from_code"],
+            "destination": params["to_code"],
+            "departure_date": f"{depart_date[:4]}-{depart_date[4:6]}-{depart_date[6:]}",
+        }],
+        "cabin": params["service_class"],
+        "award": True,
+        "adults": params["adults_count"],
+        "children": params["children_count"],
+        "childrenaward": params["children_count"],
+        "infants": 0,
+        "lang": "ru",
+    }
+
+
+def _field(data, keys):
+    """Первое непустое значение под одним из ключей; у вложенного объекта берется код или название"""
+    for key in keys:
+        value = data.get(key)
+        if isinstance(value, dict):
+            value = next((value[name] for name in ("code", "iata", "name", "title") if value.get(name)), None)
+        if value not in (None, "", []):
+            return value
+    return None
+
+
+def _time_of(value):
+    """Время ЧЧ:ММ из времени или даты-времени ("2026-12-01T07:05:00" -> "07:05")"""
+    match = _TIME.search(str(value)) if value is not None else None
+    return f"{int(match.group(1)):02d}:{match.group(2)}" if match else "—"
+
+
+def parse_search_response(payload, tariff=STANDARD_TARIFF):
+    """
+    Собирает рейсы из ответа API поиска в том же виде, что и разбор карточек на странице
+
+    Args:
+        payload: разобранный JSON-ответ
+        tariff (re.Pattern): шаблон названия тарифа (по умолчанию "стандарт"); если тариф
+            не найден или неоднозначен, стоимость остается неизвестной ("—")
+
+    Returns:
+        list: данные рейсов (id, seats_available, has_transfer, transfer_time, segments, miles_cost, rubles_cost)
+    """
+    flights = []
+    seen = set()
+    for node, segments, numbers, fares in award_variants([payload]):
+        key = tuple(numbers) + (_time_of(_field(segments[0], _SEGMENT_FIELDS["dep_time"])),)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        flight_segments = []
+        for segment, number in zip(segments, numbers):
+            data = {"flight_number": normalize_flight_number(number)}
+            for field, keys in _SEGMENT_FIELDS.items():
+                value = _field(segment, keys)
+                if field in ("dep_time", "arr_time"):
+                    value = _time_of(value)
+                data[field] = str(value) if value is not None else "—"
+            flight_segments.append(data)
+
+        fare = select_tariff(fares, tariff) or ("—", "—")
+        seats = _field(node, _SEATS_KEYS)
+        has_transfer = len(flight_segments) > 1
+        transfer_time = None
+        if has_transfer:
+            transfer_time = _field(node, _TRANSFER_KEYS) or f"{len(flight_segments) - 1} пересадка(и)"
+        flights.append({
+            "seats_available": str(seats) if seats is not None else "—",
+            "has_transfer": has_transfer,
+            "transfer_time": str(transfer_time) if transfer_time is not None else None,
+            "segments": flight_segments,
+            "miles_cost": fare[0],
+            "rubles_cost": fare[1],
+        })
+    # на странице рейсы идут по времени вылета
+    flights.sort(key=lambda flight: flight["segments"][0]["dep_time"])
+    # номера с 1, как у карточек на странице
+    for idx, flight in enumerate(flights, 1):
+        flight["id"] = idx
+    return flights
+
+
+class SearchBackend:
+    """
+    Способ выполнить поиск на сайте. Результат - кортеж (результаты, флаг) как у
+    _search_flights_on_site: {"there": [...]} или словарь с ключом "error".
+    """
+
+    # нужен ли поиску браузер (тогда вызывающий может передать свой driver/wait)
+    uses_browser = True
+
+    async def start(self):
+        """Подготавливает ресурсы (соединения и т.п.)"""
+
+    async def close(self):
+        """Освобождает ресурсы"""
+
+    async def search(self, params, status_callback=None, flight_callback=None, driver=None, wait=None):
+        """
+        Выполняет поиск в одну сторону без фильтра по типу рейса
+
+        Args:
+            params (dict): нормализованные параметры поиска (см. normalize_search_params)
+            status_callback (callable, optional): корутина для статусных сообщений
+            flight_callback (callable, optional): корутина (направление, данные рейса)
+            driver, wait (optional): браузер вызывающего (если бэкенду нужен браузер)
+
+        Returns:
+            tuple: (результаты поиска, флаг создан ли браузер в этом вызове)
+        """
+        raise NotImplementedError
+
+
+class HttpSearchBackend(SearchBackend):
+    """
+    Поиск прямыми запросами к API без браузера.
+
+    Все поиски идут через одну aiohttp-сессию: соединения с сервером держатся
+    открытыми (keep-alive) и переиспользуются, число одновременных соединений
+    ограничено pool_size. aiohttp импортируется при запуске бэкенда, поэтому
+    разбор ответов (parse_search_response) работает и без него.
+    """
+
+    uses_browser = False
+
+    def __init__(self, base_url=API_BASE_URL, search_path=API_SEARCH_PATH, pool_size=8, timeout=30, record_dir=None):
+        """
+        Args:
+            base_url (str): адрес сайта (или локального сервера с записанными ответами)
+            search_path (str): путь запроса поиска
+            pool_size (int): максимальное количество одновременных соединений
+            timeout (float): таймаут запроса целиком (секунды)
+            record_dir (str, optional): каталог, куда сохранять ответы API (для fixture_server)
+        """
+        self.url = base_url.rstrip("/") + search_path
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.record_dir = record_dir
+        self._session = None
+        self.requests = 0
+
+    async def start(self):
+        if self._session is None:
+            import aiohttp
+
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={
+                    "Accept": "application/json",
+                    "Origin": API_BASE_URL,
+                    "Referer": f"{API_BASE_URL}/sb/app/ru-ru",
+                },
+            )
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def search(self, params, status_callback=None, flight_callback=None, driver=None, wait=None):
+        if self._session is None:
+            await self.start()
+        if status_callback:
+            await status_callback("🌐 запрашиваю рейсы у API аэрофлота...")
+
+        try:
+            self.requests += 1
+            async with self._session.post(self.url, json=build_search_request(params)) as response:
+                if response.status != 200:
+                    if status_callback:
+                        await status_callback(f"❌ API ответил ошибкой HTTP {response.status}")
+                    return {"error": f"HTTP {response.status}"}, False
+                payload = await response.json(content_type=None)
+        except Exception as e:
+            if status_callback:
+                await status_callback(f"❌ произошла ошибка при запросе к API: {str(e)}")
+            return {"error": f"API request failed: {str(e)}"}, False
+
+        if self.record_dir:
+            self._record(params, payload)
+
+        flights = parse_search_response(payload)
+        if not flights:
+            lists = _itinerary_lists(payload)
+            if not lists or any(lists):
+                # схема ответа предположена (см. fixtures/api/README.md): ответ, в котором не нашлось
+                # пустого списка вариантов, - не "рейсов нет", а ошибка, которая не кэшируется
+                logger.warning("Не удалось разобрать ответ API: %.200s", json.dumps(payload, ensure_ascii=False))
+                if status_callback:
+                    await status_callback("❌ не удалось разобрать ответ API")
+                return {"error": "unrecognized API response"}, False
+            if status_callback:
+                await status_callback("ℹ️ На выбранные даты рейсы не найдены. Попробуйте изменить дату, уменьшить количество пассажиров.")
+            return no_flights_result(params["adults_count"], params["children_count"]), False
+
+        if flight_callback:
+            for flight_data in flights:
+                await flight_callback("there", flight_data)
+        if status_callback:
+            await status_callback(f"✅ найдено рейсов: {len(flights)}")
+        return {"there": flights}, False
+
+    def _record(self, params, payload):
+        """Сохраняет ответ API под именем, по которому его найдет fixture_server"""
+        try:
+            os.makedirs(self.record_dir, exist_ok=True)
+            path = os.path.join(self.record_dir, fixture_name(params["from_code"], params["to_code"], params["depart_date"]))
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False, indent=1)
+        except OSError as e:
+            logger.warning("Не удалось сохранить ответ API: %s", e)
@@ -0,0 +1,192 @@
+# search_scheduler.py - очередь поисков с ограничением одновременных браузеров
+import asyncio
+import contextvars
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class SearchJob:
+    """Поиск, поставленный в очередь одним чатом"""
+
+    def __init__(self, chat_id, search_factory, status_callback=None):
+        self.chat_id = chat_id
+        self.search_factory = search_factory
+        self.status_callback = status_callback
+        # контекст постановки в очередь (идентификатор запроса для журнала, см. log_setup)
+        self.context = contextvars.copy_context()
+        self.future = asyncio.get_running_loop().create_future()
+        self.task = None  # задача поиска, пока он выполняется
+        self.position = None  # последнее сообщенное место в очереди
+
+
+class SearchScheduler:
+    """
+    Планировщик поисков.
+
+    Одновременно выполняется не больше max_workers поисков (а значит и браузеров),
+    остальные ждут в общей очереди в порядке поступления. У каждого чата может быть
+    только один поиск: новый поиск того же чата отменяет предыдущий, где бы тот ни был -
+    в очереди или уже в браузере. Фоновые поиски (повторы по подпискам /watch) ждут
+    в отдельной очереди и запускаются, только когда поисков пользователей в очереди нет.
+    """
+
+    def __init__(self, max_workers=2):
+        """
+        Args:
+            max_workers (int): максимальное количество одновременных поисков
+        """
+        self.max_workers = max(1, int(max_workers))
+        self._waiting = deque()
+        self._background = deque()  # фоновые поиски: ниже приоритетом, чем _waiting
+        self._jobs = {}  # chat_id -> SearchJob (в очереди или выполняется)
+        self._running = 0
+        self._cond = asyncio.Condition()
+        self._workers = []
+        self._reports = set()  # фоновые сообщения о месте в очереди
+        self._closed = False
+
+    def start(self):
+        """Запускает обработчики очереди"""
+        if not self._workers:
+            self._closed = False
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_workers)]
+
+    async def close(self):
+        """Отменяет все поиски и останавливает обработчики очереди"""
+        self._closed = True
+        for chat_id in list(self._jobs):
+            self.cancel(chat_id)
+        for worker in self._workers:
+            worker.cancel()
+        for report in list(self._reports):
+            report.cancel()
+        await asyncio.gather(*self._workers, *self._reports, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, chat_id, search_factory, status_callback=None, background=False):
+        """
+        Ставит поиск в очередь и дожидается его результата.
+
+        Args:
+            chat_id (int): идентификатор чата, запустившего поиск
+            search_factory (callable): функция без аргументов, возвращающая корутину поиска
+            status_callback (callable, optional): функция для отправки статусных сообщений
+            background (bool): фоновый поиск - выполняется, когда поисков пользователей в очереди нет
+
+        Returns:
+            результат поиска или None, если поиск был отменен
+        """
+        self.cancel(chat_id)
+
+        job = SearchJob(chat_id, search_factory, status_callback)
+        self._jobs[chat_id] = job
+        async with self._cond:
+            if background:
+                self._background.append(job)
+                position = 0
+            else:
+                self._waiting.append(job)
+                position = len(self._waiting) - (self.max_workers - self._running)
+            self._cond.notify()
+
+        # свободных браузеров нет - сообщаем место в очереди
+        if position > 0:
+            await self._report_position(job, position)
+
+        try:
+            return await asyncio.shield(job.future)
+        except asyncio.CancelledError:
+            if job.future.cancelled():
+                return None
+            # отменили сам обработчик сообщения - отменяем и поиск
+            self._cancel_job(job)
+            raise
+
+    def cancel(self, chat_id):
+        """
+        Отменяет поиск чата, если он есть в очереди или выполняется
+
+        Returns:
+            bool: True если поиск был отменен
+        """
+        job = self._jobs.get(chat_id)
+        if job is None:
+            return False
+        self._cancel_job(job)
+        return True
+
+    def queue_length(self):
+        """Возвращает количество поисков, ожидающих в очереди"""
+        return len(self._waiting)
+
+    def _cancel_job(self, job):
+        if self._jobs.get(job.chat_id) is job:
+            del self._jobs[job.chat_id]
+        for queue in (self._waiting, self._background):
+            if job in queue:
+                queue.remove(job)
+        if job.task is not None:
+            job.task.cancel()
+        if not job.future.done():
+            job.future.cancel()
+
+    async def _worker(self):
+        while True:
+            async with self._cond:
+                while not self._waiting and not self._background:
+                    await self._cond.wait()
+                job = (self._waiting or self._background).popleft()
+                if job.future.done():
+                    # поиск отменили, пока он ждал в очереди
+                    continue
+                self._running += 1
+                waiting = list(self._waiting)
+                idle_workers = self.max_workers - self._running
+                job.task = job.context.run(asyncio.create_task, job.search_factory())
+
+            # тем, кто остался ждать, сообщаем, что очередь продвинулась; отправка в Telegram
+            # идет в фоне и не задерживает ни этот поиск, ни обработчик очереди
+            for index, queued_job in enumerate(waiting, 1):
+                if index > idle_workers:
+                    self._report_position_later(queued_job, index - idle_workers)
+
+            try:
+                result = await job.task
+            except asyncio.CancelledError:
+                if self._closed or not job.task.cancelled():
+                    raise  # останавливается сам обработчик очереди
+                if job.status_callback:
+                    await self._safe_status(job, "🚫 поиск отменен")
+                if not job.future.done():
+                    job.future.cancel()
+                continue
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                self._running -= 1
+                if self._jobs.get(job.chat_id) is job:
+                    del self._jobs[job.chat_id]
+
+    def _report_position_later(self, job, position):
+        task = asyncio.create_task(self._report_position(job, position))
+        self._reports.add(task)
+        task.add_done_callback(self._reports.discard)
+
+    async def _report_position(self, job, position):
+        if job.position == position or job.future.done():
+            return
+        job.position = position
+        if job.status_callback:
+            await self._safe_status(job, f"⏳ все браузеры заняты, вы в очереди: {position}-й")
+
+    async def _safe_status(self, job, text):
+        try:
+            await job.status_callback(text)
+        except Exception as e:
+            logger.warning("Не удалось отправить статус очереди: %s", e)
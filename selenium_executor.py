@@ -0,0 +1,56 @@
+# selenium_executor.py - выделенный пул потоков для блокирующих вызовов Selenium
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+# Количество потоков по умолчанию: каждый поиск занимает не больше одного потока за раз
+DEFAULT_WORKERS = 8
+
+_executor = None
+
+
+def configure_executor(max_workers=DEFAULT_WORKERS):
+    """
+    Создает пул потоков для Selenium заново с заданным количеством потоков
+
+    Args:
+        max_workers (int): максимальное количество одновременных вызовов Selenium
+    """
+    global _executor
+    old_executor = _executor
+    _executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="selenium")
+    if old_executor is not None:
+        old_executor.shutdown(wait=False)
+
+
+def get_executor():
+    """Возвращает пул потоков для Selenium, создавая его при первом обращении"""
+    if _executor is None:
+        configure_executor()
+    return _executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Выполняет блокирующую функцию в пуле потоков Selenium, не останавливая цикл событий.
+    Функция видит contextvars вызывающей корутины (маршрут поиска для метрик и т.п.)
+
+    Args:
+        func (callable): блокирующая функция (вызов WebDriver, разбор карточки и т.п.)
+        *args, **kwargs: аргументы функции
+
+    Returns:
+        результат функции
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+
+def shutdown_executor():
+    """Останавливает пул потоков (при завершении бота)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
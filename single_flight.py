@@ -0,0 +1,143 @@
+# single_flight.py - объединение одинаковых одновременных поисков в один
+import asyncio
+import copy
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Результат поиска, который отменили, пока его ждали другие (они запускают поиск заново)
+_ABANDONED = object()
+
+
+class _Flight:
+    """Один выполняющийся поиск и все, кто ждет его результата"""
+
+    def __init__(self, pinned):
+        self.task = None
+        self.waiters = 0
+        # поиск идет в браузере одного из вызывающих: если тот уйдет, поиск надо остановить
+        self.pinned = pinned
+        self.status_callbacks = []
+        self.flight_callbacks = []
+        self.last_status = None
+        self.flights = []  # (направление, рейс), уже отданные подписчикам
+
+    async def send_status(self, text):
+        self.last_status = text
+        for callback in list(self.status_callbacks):
+            try:
+                await callback(text)
+            except Exception as e:
+                logger.warning("Ошибка при отправке статуса: %s", e)
+
+    async def send_flight(self, direction, flight_data):
+        self.flights.append((direction, flight_data))
+        for callback in list(self.flight_callbacks):
+            try:
+                await callback(direction, flight_data)
+            except Exception as e:
+                logger.warning("Ошибка при передаче рейса: %s", e)
+
+
+class SingleFlight:
+    """
+    Объединяет одинаковые поиски, которые выполняются одновременно.
+
+    Первый вызов с ключом запускает поиск; вызовы с тем же ключом, пришедшие до его
+    завершения, не запускают второй браузер, а подключаются к уже идущему поиску:
+    получают последнее сообщение о статусе, уже разобранные рейсы и дальше - все
+    обновления и итоговый результат. Поиск отменяется, когда его перестают ждать все
+    вызывающие (или тот, чей браузер он использует); остальные тогда запускают его заново.
+    """
+
+    def __init__(self):
+        self._flights = {}  # ключ поиска -> _Flight
+        self.started = 0
+        self.joined = 0
+
+    def __contains__(self, key):
+        return key in self._flights
+
+    async def run(self, key, search, status_callback=None, flight_callback=None, pinned=False):
+        """
+        Выполняет поиск или подключается к такому же выполняющемуся поиску
+
+        Args:
+            key (tuple): ключ поиска (см. make_search_key)
+            search (callable): корутина (status_callback, flight_callback) -> результат
+            status_callback (callable, optional): корутина для статусных сообщений этого вызывающего
+            flight_callback (callable, optional): корутина (направление, рейс) этого вызывающего
+            pinned (bool): поиск пойдет в браузере вызывающего - если он его запустит,
+                поиск остановится вместе с уходом вызывающего
+
+        Returns:
+            tuple: (результат поиска, True если поиск запустил этот вызов); подключившиеся
+                вызовы получают свою копию результата
+        """
+        while True:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._start(key, search, pinned)
+            else:
+                self.joined += 1
+            # то, что поиск успел сделать до подключения; дальнейшее придет через колбэки
+            last_status, flights = flight.last_status, list(flight.flights)
+
+            flight.waiters += 1
+            if status_callback:
+                flight.status_callbacks.append(status_callback)
+            if flight_callback:
+                flight.flight_callbacks.append(flight_callback)
+            try:
+                if not leader:
+                    await self._replay(last_status, flights, status_callback, flight_callback)
+                result = await asyncio.shield(flight.task)
+            except asyncio.CancelledError:
+                # ушел этот вызывающий; без него поиск никому не нужен или лишился браузера
+                if flight.waiters == 1 or (leader and flight.pinned):
+                    flight.task.cancel()
+                raise
+            finally:
+                flight.waiters -= 1
+                if status_callback:
+                    flight.status_callbacks.remove(status_callback)
+                if flight_callback:
+                    flight.flight_callbacks.remove(flight_callback)
+
+            if result is _ABANDONED:
+                continue
+            return (result, True) if leader else (copy.deepcopy(result), False)
+
+    def _start(self, key, search, pinned):
+        flight = _Flight(pinned)
+
+        async def run():
+            try:
+                return await search(flight.send_status, flight.send_flight)
+            except asyncio.CancelledError:
+                return _ABANDONED
+            finally:
+                # после завершения новые вызовы запускают свой поиск (или берут результат из кэша)
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+        flight.task = asyncio.create_task(run())
+        self._flights[key] = flight
+        self.started += 1
+        return flight
+
+    @staticmethod
+    async def _replay(last_status, flights, status_callback, flight_callback):
+        """Догоняет подключившегося: сообщает, что поиск уже идет, и отдает разобранные рейсы"""
+        if status_callback:
+            await status_callback("🤝 такой же поиск уже выполняется, подключаюсь к нему")
+            if last_status:
+                await status_callback(last_status)
+        if flight_callback:
+            for direction, flight_data in flights:
+                await flight_callback(direction, flight_data)
+
+    def stats(self):
+        """Выполняющиеся поиски, запущенные поиски и подключения к уже идущим"""
+        return {"in_flight": len(self._flights), "started": self.started, "joined": self.joined}
@@ -0,0 +1,127 @@
+# status_pipeline.py - фоновая отправка статусов поиска с ограничением частоты
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class StatusPipeline:
+    """
+    Прореживает статусные сообщения поиска перед отправкой в Telegram.
+
+    Поиск сообщает статус, не дожидаясь Telegram: текст просто запоминается, а
+    фоновая задача отправляет самый свежий из них не чаще одного раза в
+    min_interval секунд на чат. Промежуточные статусы, не успевшие уйти, пропускаются,
+    повтор того же текста не отправляется вовсе.
+    """
+
+    def __init__(self, min_interval=1.0):
+        """
+        Args:
+            min_interval (float): минимальный интервал между отправками в один чат (секунды)
+        """
+        self.min_interval = min_interval
+        self._last_sent_at = {}  # chat_id -> время последней отправки
+        self._pruned_at = time.monotonic()
+
+    def channel(self, chat_id, send):
+        """
+        Создает канал статусов для одного поиска
+
+        Args:
+            chat_id (int): чат, в который отправляются статусы
+            send (callable): корутина, которая действительно отправляет текст
+
+        Returns:
+            StatusChannel: вызываемый объект, который передается как status_callback
+        """
+        return StatusChannel(self, chat_id, send)
+
+    def _delay_for(self, chat_id):
+        last_sent_at = self._last_sent_at.get(chat_id)
+        if last_sent_at is None:
+            return 0.0
+        return max(0.0, self.min_interval - (time.monotonic() - last_sent_at))
+
+    def _mark_sent(self, chat_id):
+        now = time.monotonic()
+        self._last_sent_at[chat_id] = now
+        # чаты, в которые давно ничего не отправляли, ограничение уже не касается
+        if now - self._pruned_at >= self.min_interval:
+            self._pruned_at = now
+            threshold = now - self.min_interval
+            for stale_chat_id in [key for key, sent_at in self._last_sent_at.items() if sent_at < threshold]:
+                del self._last_sent_at[stale_chat_id]
+
+
+class StatusChannel:
+    """Канал статусов одного поиска (см. StatusPipeline.channel)"""
+
+    def __init__(self, pipeline, chat_id, send):
+        self._pipeline = pipeline
+        self._chat_id = chat_id
+        self._send = send
+        self._latest = None
+        self._last_sent = None
+        self._pending = asyncio.Event()
+        self._task = None
+        self._sending = None  # отправка, которая выполняется прямо сейчас
+        self._closed = False
+
+    async def __call__(self, text):
+        """Запоминает новый статус; отправка произойдет в фоне"""
+        if self._closed:
+            return
+        self._latest = text
+        self._pending.set()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def flush(self):
+        """Отправляет последний статус (если он еще не ушел) и останавливает фоновую задачу"""
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # начатую отправку не прерываем, а дожидаемся: после нее станет ясно, ушел ли последний статус
+        if self._sending is not None:
+            await asyncio.gather(self._sending, return_exceptions=True)
+            self._sending = None
+        if self._latest is not None and self._latest != self._last_sent:
+            await asyncio.sleep(self._pipeline._delay_for(self._chat_id))
+            await self._deliver()
+
+    def close(self):
+        """Останавливает фоновую задачу без отправки оставшегося статуса"""
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self._pending.wait()
+            delay = self._pipeline._delay_for(self._chat_id)
+            if delay:
+                # пока ждем, статус может смениться - отправим самый свежий
+                await asyncio.sleep(delay)
+            self._pending.clear()
+            # отмена задачи (flush, close) не прерывает саму отправку
+            self._sending = asyncio.create_task(self._deliver())
+            await asyncio.shield(self._sending)
+            self._sending = None
+
+    async def _deliver(self):
+        text = self._latest
+        if text is None or text == self._last_sent:
+            return
+        self._pipeline._mark_sent(self._chat_id)
+        try:
+            await self._send(text)
+        except Exception as e:
+            logger.warning("Не удалось отправить статус: %s", e)
+            return
+        # текст считается отправленным, только когда Telegram его принял
+        self._last_sent = text
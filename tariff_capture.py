@@ -0,0 +1,254 @@
+# tariff_capture.py - тарифы всех рейсов из JSON-ответов страницы вместо модальных окон
+#
+# Страница поиска получает тарифы теми же XHR-запросами, которые потом рисует в окне
+# "выбрать рейс". Chrome пишет эти запросы в performance-лог (goog:loggingPrefs), а тело
+# ответа можно забрать через DevTools (Network.getResponseBody). Так тарифы всех карточек
+# читаются за один проход без кликов; для рейсов, которые в ответах не нашлись,
+# flight_searcher по-прежнему открывает модальное окно.
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Запросы страницы поиска, среди ответов которых ищем тарифы
+API_URL_MARKERS = ("/sb/", "/api/")
+
+# Тариф "стандарт" ищется по названию или коду тарифа, а не по месту в списке
+STANDARD_TARIFF = re.compile(r"стандарт|standard", re.IGNORECASE)
+
+_FLIGHT_NUMBER_KEYS = ("flight_number", "flightNumber", "number", "flight_no")
+_CARRIER_KEYS = ("airline_code", "airlineCode", "carrier", "carrier_code", "marketing_airline", "marketingAirline", "airline")
+_TARIFF_NAME_KEYS = (
+    "name", "title", "tariff", "tariff_name", "tariffName", "tariff_code", "tariffCode",
+    "fare_family", "fareFamily", "brand", "brand_name", "brandName", "code",
+)
+_MILES_KEY = re.compile(r"mile|award|bonus|points", re.IGNORECASE)
+_RUBLES_KEY = re.compile(r"tax|surcharge|fee|rub|amount|money|cash", re.IGNORECASE)
+
+
+def enable_response_capture(options):
+    """Включает performance-лог Chrome, из которого потом читаются ответы страницы"""
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+
+def discard_captured_responses(driver):
+    """Очищает накопленный performance-лог (перед новым поиском в том же браузере)"""
+    try:
+        driver.get_log("performance")
+    except Exception:
+        pass
+
+
+def drain_json_responses(driver, url_markers=API_URL_MARKERS):
+    """
+    Забирает JSON-ответы страницы, пришедшие с момента прошлого вызова (блокирующий вызов).
+
+    Args:
+        driver: экземпляр WebDriver с включенным performance-логом
+        url_markers (tuple): подстроки URL запросов, которые нужно прочитать
+
+    Returns:
+        list: разобранные JSON-ответы
+    """
+    try:
+        entries = driver.get_log("performance")
+    except Exception as e:
+        logger.warning("performance-лог недоступен: %s", e)
+        return []
+
+    payloads = []
+    for entry in entries:
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, TypeError, ValueError):
+            continue
+        if message.get("method") != "Network.responseReceived":
+            continue
+
+        params = message.get("params", {})
+        response = params.get("response", {})
+        if "json" not in response.get("mimeType", ""):
+            continue
+        if not any(marker in response.get("url", "") for marker in url_markers):
+            continue
+
+        try:
+            body = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": params["requestId"]})
+            payloads.append(json.loads(body.get("body", "")))
+        except Exception:
+            # тело ответа могло быть уже выгружено браузером или это не JSON
+            continue
+    return payloads
+
+
+def normalize_flight_number(flight_number):
+    """Приводит номер рейса к виду SU1706 (без пробелов и лидирующих нулей)"""
+    match = re.match(r"\s*([A-ZА-Я0-9]{2})\s*0*(\d+)", str(flight_number).upper())
+    if not match:
+        return str(flight_number).replace(" ", "").upper()
+    return f"{match.group(1)}{match.group(2)}"
+
+
+def flight_key(flight_numbers):
+    """Ключ рейса для сопоставления карточки и ответа: кортеж нормализованных номеров сегментов"""
+    return tuple(normalize_flight_number(number) for number in flight_numbers if number and number != "—")
+
+
+def award_variants(payloads):
+    """
+    Ищет в JSON-ответах варианты перелета.
+
+    Вариант перелета - объект со списком сегментов (у каждого есть номер рейса и
+    перевозчик) и списком тарифов (у каждого есть сумма в милях).
+
+    Args:
+        payloads (list): разобранные JSON-ответы
+
+    Yields:
+        tuple: (объект варианта, сегменты, номера рейсов сегментов, тарифы [(название, мили, рубли), ...])
+    """
+    for payload in payloads:
+        for node in _walk(payload):
+            segments, numbers = _segments(node)
+            if not numbers:
+                continue
+            fares = _fares(node)
+            if not fares:
+                continue
+            yield node, segments, numbers, fares
+
+
+def select_tariff(fares, tariff=STANDARD_TARIFF):
+    """
+    Выбирает тариф варианта по названию
+
+    Args:
+        fares (list): тарифы варианта [(название, мили, рубли), ...] (см. award_variants)
+        tariff (re.Pattern): шаблон названия или кода тарифа
+
+    Returns:
+        tuple: (стоимость в милях, стоимость в рублях) или None, если такого тарифа нет
+            или под шаблон подходят тарифы с разными ценами
+    """
+    prices = {(miles, rubles) for name, miles, rubles in fares if tariff.search(name)}
+    return prices.pop() if len(prices) == 1 else None
+
+
+def extract_award_tariffs(payloads, tariff=STANDARD_TARIFF):
+    """
+    Ищет в JSON-ответах тарифы за мили всех вариантов перелета (см. award_variants).
+
+    Рейсы, для которых тариф не найден по названию или найден неоднозначно, в результат
+    не попадают - для них flight_searcher откроет модальное окно.
+
+    Args:
+        payloads (list): разобранные JSON-ответы
+        tariff (re.Pattern): шаблон названия или кода тарифа (по умолчанию "стандарт")
+
+    Returns:
+        dict: ключ рейса (см. flight_key) -> (стоимость в милях, стоимость в рублях)
+    """
+    tariffs = {}
+    conflicting = set()
+    for _, _, numbers, fares in award_variants(payloads):
+        fare = select_tariff(fares, tariff)
+        key = flight_key(numbers)
+        if fare is None or tariffs.get(key, fare) != fare:
+            conflicting.add(key)
+        else:
+            tariffs[key] = fare
+    for key in conflicting:
+        tariffs.pop(key, None)
+    return tariffs
+
+
+def _walk(node):
+    """Обходит все словари во вложенной JSON-структуре"""
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            yield current
+            stack.extend(current.values())
+        elif isinstance(current, list):
+            stack.extend(current)
+
+
+def _segments(node):
+    """Список сегментов и их номера рейсов, если словарь описывает вариант перелета, иначе (None, None)"""
+    for value in node.values():
+        if not isinstance(value, list) or not value:
+            continue
+        if not all(isinstance(item, dict) for item in value):
+            continue
+        numbers = []
+        for segment in value:
+            number = next((segment[key] for key in _FLIGHT_NUMBER_KEYS if key in segment), None)
+            carrier = next((segment[key] for key in _CARRIER_KEYS if isinstance(segment.get(key), str)), "")
+            if number is None:
+                break
+            number = str(number)
+            # номер может быть без кода перевозчика: "1706" + "SU"
+            numbers.append(number if re.match(r"\s*[A-ZА-Я]", number.upper()) else f"{carrier}{number}")
+        else:
+            return value, numbers
+    return None, None
+
+
+def _fares(node):
+    """Тарифы варианта перелета: список (название, мили, рубли) в порядке ответа"""
+    for value in node.values():
+        if not isinstance(value, list) or not value:
+            continue
+        fares = []
+        for fare in value:
+            if not isinstance(fare, dict):
+                break
+            miles = _find_amount(fare, _MILES_KEY)
+            if miles is None:
+                break
+            rubles = _find_amount(fare, _RUBLES_KEY, exclude=_MILES_KEY)
+            fares.append((_tariff_name(fare), miles, rubles if rubles is not None else "—"))
+        else:
+            return fares
+    return None
+
+
+def _tariff_name(fare):
+    """Название и код тарифа одной строкой ("Эконом Стандарт ES"); пустая строка, если их нет"""
+    names = []
+    for key in _TARIFF_NAME_KEYS:
+        value = fare.get(key)
+        if isinstance(value, dict):
+            value = value.get("name") or value.get("code")
+        if isinstance(value, str) and value.strip():
+            names.append(value.strip())
+    return " ".join(names)
+
+
+def _find_amount(fare, key_pattern, exclude=None, depth=0):
+    """Первое числовое значение под ключом, подходящим под шаблон (в том числе во вложенных объектах)"""
+    for key, value in fare.items():
+        if exclude is not None and exclude.search(key):
+            continue
+        if key_pattern.search(key):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                return str(int(value))
+            if isinstance(value, str) and re.fullmatch(r"\s*\d[\d\s]*(\.\d+)?\s*", value):
+                return value.split(".")[0].replace(" ", "").strip()
+            if isinstance(value, dict) and depth < 2:
+                amount = _find_amount(value, re.compile(r"amount|value|sum", re.IGNORECASE), depth=depth + 1)
+                if amount is not None:
+                    return amount
+    return None
+
+
+def capture_tariffs(driver):
+    """
+    Читает тарифы всех рейсов страницы из перехваченных ответов (блокирующий вызов).
+
+    Returns:
+        dict: ключ рейса (см. flight_key) -> (стоимость в милях, стоимость в рублях)
+    """
+    return extract_award_tariffs(drain_json_responses(driver))
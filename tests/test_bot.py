@@ -0,0 +1,78 @@
+# test_bot.py - обработчики бота без Telegram: кнопки переключения фильтра типа рейса
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("aiogram")
+pytest.importorskip("selenium")
+
+# бот читает настройки при импорте: состояния в памяти, без файлов подписок и истории
+os.environ.setdefault("TELEGRAM_API_TOKEN", "123456:test")
+os.environ["FSM_STORAGE_PATH"] = ""
+os.environ["WATCH_PATH"] = ""
+os.environ["RESULT_STORE_PATH"] = ""
+
+import bot
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from log_setup import stop_logging
+
+SEARCH = {
+    "from_city": "Москва", "to_city": "Санкт-Петербург", "depart_date": "01.12.2026", "return_date": None,
+    "adults_count": 1, "children_count": 0, "class_type": "эконом", "flight_filter": "all",
+}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _stop_logging():
+    yield
+    stop_logging()
+
+
+class FakeCallback:
+    def __init__(self, data):
+        self.data = data
+        self.message = object()
+        self.answers = []
+
+    async def answer(self, text=None, show_alert=False):
+        self.answers.append(text)
+
+
+def _press(monkeypatch, data, last_search):
+    searches = []
+
+    async def fake_search(message, state, user_data):
+        searches.append(user_data)
+
+    monkeypatch.setattr(bot, "process_search_with_data", fake_search)
+    state = FSMContext(storage=MemoryStorage(), key=StorageKey(bot_id=1, chat_id=7, user_id=7))
+    callback = FakeCallback(data)
+    handler = bot.process_show_direct if data == "show_direct" else bot.process_show_connections
+
+    async def run():
+        if last_search:
+            await bot.last_search_context(state).set_data(last_search)
+        # как после process_flight_type: данные диалога уже очищены
+        await state.clear()
+        await handler(callback, state)
+
+    asyncio.run(run())
+    return searches, callback.answers
+
+
+@pytest.mark.parametrize("data, flight_filter", [("show_direct", "direct"), ("show_connections", "connections")])
+def test_filter_buttons_repeat_last_search(monkeypatch, data, flight_filter):
+    searches, answers = _press(monkeypatch, data, SEARCH)
+
+    assert searches == [dict(SEARCH, flight_filter=flight_filter)]
+    assert answers == [None]
+
+
+def test_filter_button_without_last_search(monkeypatch):
+    searches, answers = _press(monkeypatch, "show_direct", None)
+
+    assert searches == []
+    assert answers == ["Результаты устарели, повторите поиск"]
@@ -0,0 +1,33 @@
+# test_city_fuzzy.py - нечеткий поиск города: опечатки, перестановки букв и транслитерация
+import pytest
+
+from city_codes import CITY_MATCHER
+from city_fuzzy import edit_distance
+
+
+@pytest.mark.parametrize("a, b, expected", [
+    ("moskva", "moskva", 0),
+    ("mosvka", "moskva", 1),      # перестановка соседних букв - одна правка
+    ("novosibrisk", "novosibirsk", 1),
+    ("moskva", "moskv", 1),
+    ("moskva", "osaka", 3),       # больше границы - возвращается граница + 1
+])
+def test_edit_distance(a, b, expected):
+    assert edit_distance(a, b, 2) == expected
+    assert edit_distance(b, a, 2) == expected
+
+
+@pytest.mark.parametrize("query, city", [
+    ("Мосвка", "москва"),
+    ("Новосибриск", "новосибирск"),
+    ("Санкт-Петребург", "санкт-петербург"),
+    ("Ектеринбург", "екатеринбург"),
+    ("moskva", "москва"),
+    ("sankt peterburg", "санкт-петербург"),
+])
+def test_resolve_typos(query, city):
+    assert CITY_MATCHER.resolve(query) == city
+
+
+def test_resolve_rejects_unknown_input():
+    assert CITY_MATCHER.resolve("Абвгдейка") is None
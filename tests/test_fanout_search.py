@@ -0,0 +1,104 @@
+# test_fanout_search.py - пакетные поиски: распределение по браузерам и ошибки отдельных поисков
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+pytest.importorskip("selenium")
+
+import fanout_search
+
+
+class FakeSite:
+    """Подменяет поиск на сайте: считает выданные браузеры и одновременные поиски"""
+
+    def __init__(self, results, cached=()):
+        self.results = results
+        self.cached = set(cached)
+        self.leases = 0
+        self.running = 0
+        self.max_running = 0
+        self.searched = []
+
+    @asynccontextmanager
+    async def lease_search_session(self):
+        self.leases += 1
+        yield f"driver{self.leases}", None
+
+    def is_search_cached(self, from_city, to_city, depart_date, *args):
+        return (to_city, depart_date) in self.cached
+
+    async def search_flights(self, from_city, to_city, depart_date, driver=None, **kwargs):
+        self.searched.append((to_city, depart_date, driver))
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        result = self.results[(to_city, depart_date)]
+        if isinstance(result, Exception):
+            raise result
+        return result, False
+
+
+def _flight(miles, seats):
+    return {"segments": [{"flight_number": "SU1"}], "miles_cost": miles, "seats_available": seats, "rubles_cost": "1 140"}
+
+
+@pytest.fixture
+def site(monkeypatch):
+    def install(results, cached=()):
+        fake = FakeSite(results, cached)
+        monkeypatch.setattr(fanout_search, "lease_search_session", fake.lease_search_session)
+        monkeypatch.setattr(fanout_search, "is_search_cached", fake.is_search_cached)
+        monkeypatch.setattr(fanout_search, "search_flights", fake.search_flights)
+        return fake
+    return install
+
+
+def test_search_destinations_fans_out_and_reports_errors(site):
+    date = "01.12.2026"
+    fake = site({
+        ("LED", date): {"there": [_flight("15 000", "4"), _flight("30 000", "2")]},
+        ("AER", date): {"error": "no_flights_available", "message": "На выбранные даты рейсы не найдены"},
+        ("KZN", date): TimeoutError("page load timed out"),
+        ("KGD", date): {"there": [_flight("12 500", "1")]},
+        ("OVB", date): {"there": []},
+    }, cached=[("OVB", date)])
+
+    async def run():
+        return [entry async for entry in fanout_search.search_destinations(
+            "MOW", ["LED", "AER", "KZN", "KGD", "OVB", "LED", "XXX", "MOW"], date, max_sessions=2
+        )]
+
+    found = {code: (result, summary) for code, result, summary in asyncio.run(run())}
+
+    # повторное направление ищется один раз, неизвестное и совпадающее с отправлением пропускаются
+    assert sorted(found) == ["AER", "KGD", "KZN", "LED", "MOW", "OVB", "XXX"]
+    assert found["XXX"][0]["error"] == "unknown_destination"
+    assert found["MOW"][0]["error"] == "same_city"
+    assert sorted(to_city for to_city, _, _ in fake.searched) == ["AER", "KGD", "KZN", "LED", "OVB"]
+
+    # неудачи одного направления не прерывают остальные
+    assert found["KZN"][0] == {"error": "page load timed out"}
+    assert found["AER"][1]["error"] == "На выбранные даты рейсы не найдены"
+    assert found["LED"][1] == {"date": date, "flights": 2, "min_miles": 15000, "min_rubles": 1140, "seats": 6, "error": None}
+    assert found["KGD"][1]["min_miles"] == 12500
+
+    # поиск из кэша идет без браузера, остальные - не больше чем в двух браузерах
+    assert [driver for to_city, _, driver in fake.searched if to_city == "OVB"] == [None]
+    assert fake.leases == 2 and fake.max_running <= 2
+
+
+def test_search_date_range_summarizes_days_in_order(site):
+    dates = ["01.12.2026", "02.12.2026", "03.12.2026"]
+    site({
+        ("LED", dates[0]): {"there": [_flight("20 000", "3")]},
+        ("LED", dates[1]): RuntimeError("browser crashed"),
+        ("LED", dates[2]): {"there": [_flight("15 000", "1")]},
+    })
+
+    result = asyncio.run(fanout_search.search_date_range("MOW", "LED", dates, max_sessions=1))
+
+    assert [day["date"] for day in result["days"]] == dates
+    assert result["days"][1]["error"] == "browser crashed"
+    assert fanout_search.cheapest_day(result["days"])["date"] == dates[2]
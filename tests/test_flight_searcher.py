@@ -0,0 +1,81 @@
+# test_flight_searcher.py - поиск из кэша: повтор рейсов через flight_callback и проверка is_search_cached
+import asyncio
+
+import pytest
+
+pytest.importorskip("selenium")
+
+import flight_searcher
+from result_cache import ResultCache, make_search_key
+
+NO_FLIGHTS = {
+    "error": "no_flights_available",
+    "message": "На выбранные даты рейсы не найдены",
+    "suggestions": ["Выберите другую дату", "Попробуйте другой класс обслуживания"],
+}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = ResultCache()
+    monkeypatch.setattr(flight_searcher, "search_cache", cache)
+    return cache
+
+
+def _search(flight_filter):
+    received = []
+
+    async def on_flight(direction, flight):
+        received.append((direction, flight))
+
+    async def run():
+        return await flight_searcher.search_flights(
+            "MOW", "LED", "01.12.2026", flight_filter=flight_filter, flight_callback=on_flight
+        )
+
+    results, _ = asyncio.run(run())
+    return results, received
+
+
+@pytest.mark.parametrize("flight_filter", ["all", "direct", "connections"])
+def test_cached_error_replays_no_flights(cache, flight_filter):
+    cache.set(make_search_key("MOW", "LED", "20261201", 1, 0, "economy", "all"), NO_FLIGHTS)
+
+    results, received = _search(flight_filter)
+
+    assert received == []
+    assert results == NO_FLIGHTS
+
+
+def test_cached_flights_are_replayed(cache):
+    flight = {"segments": [{"flight_number": "SU6"}], "has_transfer": False}
+    cache.set(make_search_key("MOW", "LED", "20261201", 1, 0, "economy", "all"), {"there": [flight]})
+
+    results, received = _search("direct")
+
+    assert received == [("there", flight)]
+    assert results == {"there": [flight]}
+
+
+def test_running_search_is_not_cached(cache):
+    key = make_search_key("MOW", "LED", "20261201", 1, 0, "economy", "all")
+
+    async def run():
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def search(send_status, send_flight):
+            started.set()
+            await release.wait()
+            cache.set(key, {"there": []})
+            return {"there": []}, False
+
+        task = asyncio.create_task(flight_searcher.in_flight_searches.run(key, search))
+        await started.wait()
+        # идущий поиск могут отменить - подключающийся к нему должен ждать в очереди
+        running = flight_searcher.is_search_cached("MOW", "LED", "01.12.2026")
+        release.set()
+        await task
+        return running, flight_searcher.is_search_cached("MOW", "LED", "01.12.2026")
+
+    assert asyncio.run(run()) == (False, True)
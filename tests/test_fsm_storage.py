@@ -0,0 +1,102 @@
+# test_fsm_storage.py - состояния диалогов в SQLite: сохранение между запусками, очистка и срок жизни
+import asyncio
+import dataclasses
+import sqlite3
+
+import pytest
+
+pytest.importorskip("aiogram")
+
+from aiogram.fsm.storage.base import StorageKey
+from fsm_storage import SqliteStorage
+
+KEY = StorageKey(bot_id=1, chat_id=7, user_id=7)
+DATA = {"from_city": "Москва", "to_city": "LED", "adults_count": 2, "depart_dates": ["01.12.2026", "02.12.2026"]}
+
+
+async def _open(path, **kwargs):
+    storage = SqliteStorage(str(path), flush_interval=0.01, **kwargs)
+    await storage.start()
+    return storage
+
+
+def _rows(path):
+    with sqlite3.connect(str(path)) as connection:
+        return connection.execute("SELECT COUNT(*) FROM fsm").fetchone()[0]
+
+
+def test_state_and_data_survive_restart(tmp_path):
+    path = tmp_path / "fsm.db"
+    last_search = dataclasses.replace(KEY, destiny="last_search")
+
+    async def run():
+        storage = await _open(path)
+        await storage.set_state(KEY, "FlightSearch:waiting_for_adults")
+        await storage.set_data(KEY, DATA)
+        await storage.set_data(last_search, {"from_city": "Сочи"})
+        await storage.close()
+
+        # новый процесс бота продолжает диалог с того же места
+        storage = await _open(path)
+        try:
+            return (
+                await storage.get_state(KEY), await storage.get_data(KEY),
+                await storage.get_state(last_search), await storage.get_data(last_search),
+            )
+        finally:
+            await storage.close()
+
+    assert asyncio.run(run()) == ("FlightSearch:waiting_for_adults", DATA, None, {"from_city": "Сочи"})
+
+
+def test_unwritten_changes_are_read_from_memory(tmp_path):
+    path = tmp_path / "fsm.db"
+
+    async def run():
+        storage = SqliteStorage(str(path), flush_interval=60)
+        await storage.start()
+        await storage.set_data(KEY, DATA)
+        # изменение еще не записано в базу, но этот процесс его уже видит
+        seen = await storage.get_data(KEY), _rows(path)
+        await storage.close()
+        return seen, _rows(path)
+
+    (data, rows_before), rows_after = asyncio.run(run())
+
+    assert data == DATA
+    assert rows_before == 0 and rows_after == 1
+
+
+def test_cleared_dialog_is_deleted(tmp_path):
+    path = tmp_path / "fsm.db"
+
+    async def run():
+        storage = await _open(path)
+        await storage.set_state(KEY, "FlightSearch:waiting_for_from")
+        await storage.set_data(KEY, DATA)
+        await asyncio.sleep(0.05)
+        written = _rows(path)
+        # как state.clear(): пустое состояние и пустые данные
+        await storage.set_state(KEY, None)
+        await storage.set_data(KEY, {})
+        await storage.close()
+        return written
+
+    assert asyncio.run(run()) == 1
+    assert _rows(path) == 0
+
+
+def test_abandoned_dialog_expires(tmp_path):
+    path = tmp_path / "fsm.db"
+
+    async def run():
+        storage = await _open(path, ttl=0.05)
+        await storage.set_state(KEY, "FlightSearch:waiting_for_to")
+        await storage.set_data(KEY, DATA)
+        await asyncio.sleep(0.15)
+        try:
+            return await storage.get_state(KEY), await storage.get_data(KEY)
+        finally:
+            await storage.close()
+
+    assert asyncio.run(run()) == (None, {})
@@ -0,0 +1,102 @@
+# test_search_backends.py - разбор ответа API поиска на записанных ответах
+import asyncio
+import json
+import os
+import shutil
+
+import pytest
+
+from search_backends import parse_search_response
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "api")
+
+
+def test_parse_search_response():
+    with open(os.path.join(FIXTURES_DIR, "MOW-LED.json"), encoding="utf-8") as f:
+        flights = parse_search_response(json.load(f))
+    # номера рейсов с 1, как при разборе карточек в браузере
+    assert [flight["id"] for flight in flights] == [1, 2]
+    assert [flight["segments"][0]["flight_number"] for flight in flights] == ["SU6", "SU1160"]
+    assert [(flight["miles_cost"], flight["rubles_cost"]) for flight in flights] == [("15000", "1140"), ("30000", "2280")]
+    assert flights[1]["has_transfer"] and flights[1]["transfer_time"] == "1 ч 15 мин"
+
+
+# ключи рейса и сегмента, как у разбора карточек в браузере (extract_flight_data)
+FLIGHT_KEYS = {"id", "seats_available", "has_transfer", "transfer_time", "segments", "miles_cost", "rubles_cost"}
+SEGMENT_KEYS = {"depart_city", "arrive_city", "dep_time", "arr_time", "iata_from", "iata_to", "airline", "flight_number", "plane_model"}
+
+
+def test_http_backend_against_fixture_server(tmp_path):
+    # aiohttp нужен только HTTP-бэкенду и серверу ответов, разбор ответа работает без него
+    pytest.importorskip("aiohttp")
+    from fixture_server import FixtureServer
+    from flight_searcher import search_flights, start_search_backend, stop_search_backend
+    from search_backends import HttpSearchBackend
+
+    shutil.copy(os.path.join(FIXTURES_DIR, "MOW-LED.json"), tmp_path / "MOW-LED.json")
+    (tmp_path / "MOW-KZN.json").write_text(json.dumps({"data": {"itineraries": []}}), encoding="utf-8")
+
+    async def run():
+        server = FixtureServer(str(tmp_path))
+        await server.start()
+        backend = HttpSearchBackend(server.url, pool_size=2)
+        await start_search_backend(backend)
+        try:
+            found = [await search_flights("MOW", "LED", "01.12.2026", use_cache=False) for _ in range(3)]
+            empty, _ = await search_flights("MOW", "KZN", "01.12.2026", use_cache=False)
+            # для маршрута без записанного ответа сервер отвечает 404
+            missing, _ = await search_flights("MOW", "AER", "01.12.2026", use_cache=False)
+            return server, backend, found, empty, missing
+        finally:
+            await stop_search_backend()
+            await server.close()
+
+    server, backend, found, empty, missing = asyncio.run(run())
+
+    results, browser_created = found[0]
+    assert not browser_created
+    assert list(results) == ["there"]
+    assert [flight["segments"][0]["flight_number"] for flight in results["there"]] == ["SU6", "SU1160"]
+    for flight in results["there"]:
+        assert set(flight) == FLIGHT_KEYS
+        assert all(set(segment) == SEGMENT_KEYS for segment in flight["segments"])
+    assert all(result == results for result, _ in found)
+
+    assert empty["error"] == "no_flights_available" and "there" not in empty
+    assert missing == {"error": "HTTP 404"}
+
+    # все запросы прошли по одному открытому соединению одной сессии
+    assert backend.requests == server.requests == 5
+    assert len(server.peers) == 1
+
+
+@pytest.mark.parametrize("payload", [
+    {"status": "error", "message": "service unavailable"},
+    {"data": {"itineraries": [{"id": 1, "legs": "unexpected"}]}},
+    [],
+])
+def test_http_backend_unrecognized_response_is_not_cached(tmp_path, monkeypatch, payload):
+    pytest.importorskip("aiohttp")
+    import flight_searcher
+    from fixture_server import FixtureServer
+    from result_cache import ResultCache
+    from search_backends import HttpSearchBackend
+
+    monkeypatch.setattr(flight_searcher, "search_cache", ResultCache())
+    (tmp_path / "MOW-LED.json").write_text(json.dumps(payload), encoding="utf-8")
+
+    async def run():
+        server = FixtureServer(str(tmp_path))
+        await server.start()
+        await flight_searcher.start_search_backend(HttpSearchBackend(server.url))
+        try:
+            return await flight_searcher.search_flights("MOW", "LED", "01.12.2026")
+        finally:
+            await flight_searcher.stop_search_backend()
+            await server.close()
+
+    results, _ = asyncio.run(run())
+
+    # непонятный ответ - не "рейсов нет": он не кэшируется и не попадает в историю
+    assert results == {"error": "unrecognized API response"}
+    assert not flight_searcher.is_search_cached("MOW", "LED", "01.12.2026")
@@ -0,0 +1,123 @@
+# test_search_scheduler.py - очередь поисков: лимит браузеров, отмена по чату, фоновые поиски
+import asyncio
+
+from search_scheduler import SearchScheduler
+
+
+class Searches:
+    """Поиски, которые ждут разрешения завершиться; запоминает порядок запуска"""
+
+    def __init__(self):
+        self.started = []
+        self.running = 0
+        self.max_running = 0
+        self._release = {}
+
+    def factory(self, name):
+        self._release[name] = asyncio.Event()
+
+        async def search():
+            self.started.append(name)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            try:
+                await self._release[name].wait()
+                return f"result {name}"
+            finally:
+                self.running -= 1
+
+        return search
+
+    def release(self, name):
+        self._release[name].set()
+
+
+async def _until(condition):
+    for _ in range(100):
+        if condition():
+            return
+        await asyncio.sleep(0.001)
+    raise AssertionError("condition not reached")
+
+
+def test_new_search_of_chat_cancels_previous():
+    async def run():
+        scheduler = SearchScheduler(max_workers=2)
+        scheduler.start()
+        searches = Searches()
+        statuses = []
+
+        async def status(text):
+            statuses.append(text)
+
+        first = asyncio.create_task(scheduler.submit(1, searches.factory("first"), status))
+        await _until(lambda: searches.started == ["first"])
+        second = asyncio.create_task(scheduler.submit(1, searches.factory("second"), status))
+        await _until(lambda: searches.started == ["first", "second"])
+        searches.release("second")
+        results = await first, await second
+        await scheduler.close()
+        return results, statuses
+
+    (first, second), statuses = asyncio.run(run())
+
+    assert first is None
+    assert second == "result second"
+    assert "🚫 поиск отменен" in statuses
+
+
+def test_searches_beyond_max_workers_wait_in_queue():
+    async def run():
+        scheduler = SearchScheduler(max_workers=1)
+        scheduler.start()
+        searches = Searches()
+        statuses = []
+
+        async def status(text):
+            statuses.append(text)
+
+        first = asyncio.create_task(scheduler.submit(1, searches.factory("a")))
+        await _until(lambda: searches.started == ["a"])
+        second = asyncio.create_task(scheduler.submit(2, searches.factory("b"), status))
+        await _until(lambda: statuses)
+        queued = scheduler.queue_length()
+        searches.release("a")
+        await _until(lambda: searches.started == ["a", "b"])
+        searches.release("b")
+        results = await first, await second
+        await scheduler.close()
+        return results, statuses, queued, searches.max_running
+
+    results, statuses, queued, max_running = asyncio.run(run())
+
+    assert results == ("result a", "result b")
+    assert statuses == ["⏳ все браузеры заняты, вы в очереди: 1-й"]
+    assert queued == 1 and max_running == 1
+
+
+def test_background_search_waits_for_user_searches():
+    async def run():
+        scheduler = SearchScheduler(max_workers=1)
+        scheduler.start()
+        searches = Searches()
+
+        busy = asyncio.create_task(scheduler.submit(1, searches.factory("user 1")))
+        await _until(lambda: searches.started == ["user 1"])
+        # фоновый поиск поставлен раньше, но поиск пользователя идет первым
+        background = asyncio.create_task(scheduler.submit("watch", searches.factory("watch"), background=True))
+        await asyncio.sleep(0.01)
+        user = asyncio.create_task(scheduler.submit(2, searches.factory("user 2")))
+        await asyncio.sleep(0.01)
+        searches.release("user 1")
+        await _until(lambda: len(searches.started) == 2)
+        searches.release("user 2")
+        await _until(lambda: len(searches.started) == 3)
+        searches.release("watch")
+        await asyncio.gather(busy, background, user)
+        await scheduler.close()
+        return searches.started, searches.max_running
+
+    started, max_running = asyncio.run(run())
+
+    assert started == ["user 1", "user 2", "watch"]
+    assert max_running == 1
@@ -0,0 +1,115 @@
+# test_single_flight.py - одинаковые одновременные поиски: один поиск на всех и отмена
+import asyncio
+
+from single_flight import SingleFlight
+
+
+class Search:
+    """Поиск, который ждет разрешения завершиться; считает запуски и отмены"""
+
+    def __init__(self):
+        self.calls = 0
+        self.cancelled = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self, send_status, send_flight):
+        self.calls += 1
+        await send_status("ищу")
+        await send_flight("there", {"id": 1})
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return {"there": [{"id": 1}]}
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_identical_calls_share_one_search():
+    async def run():
+        flights = SingleFlight()
+        search = Search()
+        seen = []
+
+        async def status(text):
+            seen.append(("status", text))
+
+        async def flight(direction, data):
+            seen.append((direction, data))
+
+        leader = asyncio.create_task(flights.run("key", search))
+        await _settle()
+        joiner = asyncio.create_task(flights.run("key", search, status, flight))
+        await _settle()
+        search.release.set()
+        results = await leader, await joiner
+        return flights, search, seen, results
+
+    flights, search, seen, ((leader_result, leader), (joiner_result, joined_leader)) = asyncio.run(run())
+
+    assert search.calls == 1
+    assert leader and not joined_leader
+    # подключившийся получает свою копию результата и догоняет уже отданные статус и рейсы
+    assert joiner_result == leader_result and joiner_result is not leader_result
+    assert seen == [("status", "🤝 такой же поиск уже выполняется, подключаюсь к нему"), ("status", "ищу"), ("there", {"id": 1})]
+    assert flights.stats() == {"in_flight": 0, "started": 1, "joined": 1}
+
+
+def test_search_continues_while_someone_waits():
+    async def run():
+        flights = SingleFlight()
+        search = Search()
+        leader = asyncio.create_task(flights.run("key", search))
+        await _settle()
+        joiner = asyncio.create_task(flights.run("key", search))
+        await _settle()
+        leader.cancel()
+        await _settle()
+        search.release.set()
+        return search, await joiner, leader.cancelled()
+
+    search, (result, leader), leader_cancelled = asyncio.run(run())
+
+    assert leader_cancelled
+    assert result == {"there": [{"id": 1}]} and not leader
+    assert search.calls == 1 and search.cancelled == 0
+
+
+def test_search_is_cancelled_when_nobody_waits():
+    async def run():
+        flights = SingleFlight()
+        search = Search()
+        caller = asyncio.create_task(flights.run("key", search))
+        await _settle()
+        caller.cancel()
+        await _settle()
+        return flights, search
+
+    flights, search = asyncio.run(run())
+
+    assert search.cancelled == 1
+    assert "key" not in flights
+
+
+def test_joiner_restarts_search_when_pinned_leader_leaves():
+    async def run():
+        flights = SingleFlight()
+        search = Search()
+        # поиск идет в браузере первого вызывающего: без него поиск останавливается
+        leader = asyncio.create_task(flights.run("key", search, pinned=True))
+        await _settle()
+        joiner = asyncio.create_task(flights.run("key", search))
+        await _settle()
+        leader.cancel()
+        await _settle()
+        search.release.set()
+        return search, await joiner
+
+    search, (result, leader) = asyncio.run(run())
+
+    assert search.calls == 2 and search.cancelled == 1
+    assert result == {"there": [{"id": 1}]} and leader
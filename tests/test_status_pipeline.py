@@ -0,0 +1,59 @@
+# test_status_pipeline.py - статусы поиска: прореживание отправок и объединение промежуточных
+import asyncio
+import time
+
+from status_pipeline import StatusPipeline
+
+
+def _collect(pipeline, chat_id, statuses, sent, pause=0.0):
+    async def send(text):
+        sent.append((time.monotonic(), text))
+
+    async def run():
+        channel = pipeline.channel(chat_id, send)
+        for text in statuses:
+            await channel(text)
+            await asyncio.sleep(pause)
+        await channel.flush()
+
+    return run()
+
+
+def test_statuses_are_throttled_and_merged():
+    pipeline = StatusPipeline(min_interval=0.05)
+    sent = []
+
+    asyncio.run(_collect(pipeline, 1, [f"билет {idx}/20" for idx in range(1, 21)], sent, pause=0.005))
+
+    texts = [text for _, text in sent]
+    # первый статус уходит сразу, промежуточные заменяются свежими, последний доставляется при flush
+    assert texts[0] == "билет 1/20" and texts[-1] == "билет 20/20"
+    assert len(texts) < 20
+    numbers = [int(text.split()[1].split("/")[0]) for text in texts]
+    assert numbers == sorted(set(numbers))
+    gaps = [later - earlier for (earlier, _), (later, _) in zip(sent, sent[1:])]
+    assert all(gap >= 0.045 for gap in gaps)
+
+
+def test_repeated_status_is_sent_once():
+    pipeline = StatusPipeline(min_interval=0.01)
+    sent = []
+
+    asyncio.run(_collect(pipeline, 1, ["поиск", "поиск", "поиск"], sent, pause=0.02))
+
+    assert [text for _, text in sent] == ["поиск"]
+
+
+def test_chats_are_throttled_independently():
+    pipeline = StatusPipeline(min_interval=10)
+    sent = []
+
+    async def run():
+        await _collect(pipeline, 1, ["чат 1"], sent)
+        await _collect(pipeline, 2, ["чат 2"], sent)
+
+    started = time.monotonic()
+    asyncio.run(run())
+
+    assert [text for _, text in sent] == ["чат 1", "чат 2"]
+    assert time.monotonic() - started < 1
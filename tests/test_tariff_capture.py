@@ -0,0 +1,62 @@
+# test_tariff_capture.py - тарифы из JSON-ответов страницы на записанных ответах API
+import json
+import os
+
+from tariff_capture import extract_award_tariffs, select_tariff
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "api")
+
+
+def _load(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _itinerary(number, fares):
+    return {"segments": [{"flight_number": number, "airline_code": "SU"}], "fares": fares}
+
+
+def test_standard_tariff_by_name():
+    tariffs = extract_award_tariffs([_load("MOW-LED.json")])
+    assert tariffs == {
+        ("SU6",): ("15000", "1140"),
+        ("SU1160", "SU1161"): ("30000", "2280"),
+    }
+
+
+def test_standard_tariff_not_by_position():
+    payload = {"itineraries": [_itinerary("SU10", [
+        {"name": "Стандарт", "miles": 15000, "taxes": 1140},
+        {"name": "Базовый", "miles": 10000, "taxes": 1140},
+    ])]}
+    assert extract_award_tariffs([payload]) == {("SU10",): ("15000", "1140")}
+
+
+def test_missing_or_ambiguous_tariff_is_left_to_modal():
+    payload = {"itineraries": [
+        # нет названий тарифов - позиция ничего не говорит
+        _itinerary("SU20", [{"miles": 10000, "taxes": 1140}, {"miles": 15000, "taxes": 1140}]),
+        # меньше тарифов, чем ожидалось, и стандарта среди них нет
+        _itinerary("SU21", [{"name": "Базовый", "miles": 10000, "taxes": 1140}]),
+        # под "стандарт" подходят два тарифа с разными ценами
+        _itinerary("SU22", [
+            {"name": "Эконом Стандарт", "miles": 15000, "taxes": 1140},
+            {"name": "Комфорт Стандарт", "miles": 30000, "taxes": 1140},
+        ]),
+        _itinerary("SU23", [{"tariff": {"code": "STANDARD"}, "miles": 12000, "taxes": 900}]),
+    ]}
+    assert extract_award_tariffs([payload]) == {("SU23",): ("12000", "900")}
+
+
+def test_conflicting_answers_for_one_flight_are_dropped():
+    payloads = [
+        {"itineraries": [_itinerary("SU30", [{"name": "Стандарт", "miles": 15000, "taxes": 1140}])]},
+        {"itineraries": [_itinerary("SU30", [{"name": "Стандарт", "miles": 17000, "taxes": 1140}])]},
+    ]
+    assert extract_award_tariffs(payloads) == {}
+
+
+def test_select_tariff():
+    fares = [("Базовый", "10000", "1140"), ("Стандарт", "15000", "1140")]
+    assert select_tariff(fares) == ("15000", "1140")
+    assert select_tariff(fares[:1]) is None
@@ -0,0 +1,380 @@
+# watcher.py - подписки на появление мест за мили: периодический повторный поиск и уведомления об изменениях
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import time
+from datetime import date, datetime
+
+from flight_searcher import search_flights, normalize_search_params, matches_filter, get_cached_results
+from log_setup import new_request_id, request_context
+from result_cache import make_search_key
+
+logger = logging.getLogger(__name__)
+
+
+def flight_identity(flight):
+    """Ключ рейса для сравнения между поисками: номера рейсов сегментов и время вылета"""
+    segments = flight.get("segments", [])
+    numbers = tuple(segment.get("flight_number", "—") for segment in segments)
+    return numbers + ((segments[0].get("dep_time", "—"),) if segments else ())
+
+
+def diff_flights(previous, flights):
+    """
+    Сравнивает рейсы с прошлым снимком
+
+    Args:
+        previous (dict): ключ рейса -> (мили, места) из прошлого поиска
+        flights (list): рейсы нового поиска
+
+    Returns:
+        tuple: (новый снимок, список изменений [(вид, рейс, прошлые (мили, места)), ...]),
+            вид - "new" или "changed"
+    """
+    snapshot = {}
+    changes = []
+    for flight in flights:
+        if "error" in flight:
+            continue
+        key = flight_identity(flight)
+        state = (flight.get("miles_cost", "—"), flight.get("seats_available", "—"))
+        snapshot[key] = state
+        if key not in previous:
+            changes.append(("new", flight, None))
+        elif previous[key] != state:
+            changes.append(("changed", flight, previous[key]))
+    return snapshot, changes
+
+
+def format_changes(subscription, changes):
+    """Текст уведомления об изменениях по подписке"""
+    lines = [f"🔔 <b>{subscription.title()}</b>"]
+    for kind, flight, before in changes:
+        segments = flight.get("segments", [])
+        numbers = ", ".join(segment.get("flight_number", "—") for segment in segments)
+        dep_time = segments[0].get("dep_time", "—") if segments else "—"
+        miles, seats = flight.get("miles_cost", "—"), flight.get("seats_available", "—")
+        if kind == "new":
+            lines.append(f"🆕 {numbers} ({dep_time}): {miles} миль, мест: {seats}")
+        else:
+            old_miles, old_seats = before
+            lines.append(f"✏️ {numbers} ({dep_time}): {old_miles} → {miles} миль, мест: {old_seats} → {seats}")
+    return "\n".join(lines)
+
+
+def watch_legs(search_params):
+    """
+    Параметры поиска каждого направления: для поиска туда и обратно - два поиска в одну сторону
+
+    Returns:
+        list: параметры поиска в одну сторону (return_date=None)
+    """
+    outbound = dict(search_params, return_date=None)
+    legs = [outbound]
+    if search_params.get("return_date"):
+        legs.append(dict(
+            outbound, from_city=search_params["to_city"], to_city=search_params["from_city"],
+            depart_date=search_params["return_date"],
+        ))
+    return legs
+
+
+class Subscription:
+    """Подписка одного чата на маршрут, дату, пассажиров и класс"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, chat_id, search_params, subscription_id=None, snapshot=None):
+        """
+        Args:
+            chat_id (int): чат, куда отправляются уведомления
+            search_params (dict): from_city, to_city, depart_date, adults_count, children_count,
+                class_type, flight_filter (как в данных FSM бота)
+        """
+        self.id = subscription_id or next(self._ids)
+        self.chat_id = chat_id
+        self.search_params = search_params
+        # снимок рейсов, о которых подписчик уже знает: ключ рейса -> (мили, места);
+        # None - подписчик еще ничего не видел, первый поиск только запоминает рейсы
+        self.snapshot = snapshot
+
+    def title(self):
+        params = self.search_params
+        return f"{params['from_city']} → {params['to_city']}, {params['depart_date']}"
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "chat_id": self.chat_id,
+            "search_params": self.search_params,
+            "snapshot": None if self.snapshot is None else [[list(key), list(state)] for key, state in self.snapshot.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        snapshot = data.get("snapshot")
+        if snapshot is not None:
+            snapshot = {tuple(key): tuple(state) for key, state in snapshot}
+        return cls(data["chat_id"], data["search_params"], data["id"], snapshot)
+
+    def is_expired(self):
+        """Дата вылета уже прошла"""
+        try:
+            depart_date = datetime.strptime(self.search_params["depart_date"], "%d.%m.%Y").date()
+        except ValueError:
+            return True
+        return depart_date < date.today()
+
+
+class Watcher:
+    """
+    Следит за подписками: повторяет поиски по расписанию и присылает только изменения.
+
+    Подписки с одинаковым ключом поиска (маршрут, дата, пассажиры, класс) обслуживаются
+    одним поиском. Время следующего поиска каждого ключа смещается случайно (jitter),
+    чтобы повторные поиски не шли пачкой. Подписки хранятся в JSON-файле.
+    """
+
+    def __init__(self, notify, path="watches.json", interval=1800, jitter=0.2, max_concurrent=1, max_per_chat=10, scheduler=None):
+        """
+        Args:
+            notify (callable): корутина (chat_id, текст) для отправки уведомлений
+            path (str): файл для хранения подписок (None - не сохранять)
+            interval (float): как часто повторять поиск по каждому ключу (секунды)
+            jitter (float): случайное отклонение интервала (доля от interval)
+            max_concurrent (int): сколько повторных поисков может идти одновременно
+            max_per_chat (int): максимальное количество подписок одного чата
+            scheduler (SearchScheduler, optional): очередь поисков бота; повторные поиски идут
+                через нее фоновыми, чтобы не занимать браузеры в обход очереди
+        """
+        self.notify = notify
+        self.scheduler = scheduler
+        self.path = path
+        self.interval = interval
+        self.jitter = jitter
+        self.max_per_chat = max_per_chat
+        self._limit = asyncio.Semaphore(max_concurrent)
+        self._subscriptions = {}  # id -> Subscription
+        self._next_run = {}  # ключ поиска -> время следующего поиска
+        self._task = None
+        # будит расписание раньше срока: новая подписка или завершенный поиск
+        self._wakeup = asyncio.Event()
+        # сохранения идут по одному: иначе два потока писали бы в один временный файл
+        self._save_lock = asyncio.Lock()
+        self.scrapes = 0
+
+    async def start(self):
+        """Загружает сохраненные подписки и запускает расписание"""
+        if self.path and os.path.exists(self.path):
+            data = await asyncio.get_running_loop().run_in_executor(None, self._load)
+            for item in data:
+                subscription = Subscription.from_dict(item)
+                self._subscriptions[subscription.id] = subscription
+            Subscription._ids = itertools.count(max(self._subscriptions, default=0) + 1)
+            for key in self._groups():
+                # после перезапуска первые поиски распределяем по всему интервалу
+                self._next_run[key] = time.monotonic() + random.uniform(0, self.interval)
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Останавливает расписание"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def subscribe(self, chat_id, search_params):
+        """
+        Добавляет подписку на каждое направление поиска (см. watch_legs); первый поиск
+        по новому ключу выполняется в ближайшее время. Снимок рейсов берется из кэша
+        (поиск, который пользователь только что видел), поэтому первое уведомление
+        содержит только изменения; если в кэше ничего нет, первый поиск лишь запоминает рейсы
+
+        Returns:
+            list: подписки (для поиска туда и обратно - две)
+
+        Raises:
+            ValueError: если параметры поиска некорректны или у чата слишком много подписок
+        """
+        legs = watch_legs(search_params)
+        if len(self.subscriptions_of(chat_id)) + len(legs) > self.max_per_chat:
+            raise ValueError(f"Too many watches for chat {chat_id}")
+        # ключи считаем заранее: некорректные параметры не должны оставить половину подписок
+        keys = [self._search_key(leg) for leg in legs]
+        subscriptions = []
+        for key, leg in zip(keys, legs):
+            subscription = Subscription(chat_id, leg, snapshot=self._cached_snapshot(leg))
+            self._subscriptions[subscription.id] = subscription
+            self._next_run.setdefault(key, time.monotonic())
+            subscriptions.append(subscription)
+        self._wakeup.set()
+        await self._save()
+        return subscriptions
+
+    async def unsubscribe(self, chat_id, subscription_id=None):
+        """
+        Удаляет подписку чата (или все подписки чата, если subscription_id не указан)
+
+        Returns:
+            int: количество удаленных подписок
+        """
+        removed = [
+            subscription for subscription in self.subscriptions_of(chat_id)
+            if subscription_id is None or subscription.id == subscription_id
+        ]
+        for subscription in removed:
+            del self._subscriptions[subscription.id]
+        active_keys = set(self._groups())
+        for key in list(self._next_run):
+            if key not in active_keys:
+                del self._next_run[key]
+        if removed:
+            await self._save()
+        return len(removed)
+
+    def subscriptions_of(self, chat_id):
+        """Подписки чата в порядке создания"""
+        return [subscription for subscription in self._subscriptions.values() if subscription.chat_id == chat_id]
+
+    def stats(self):
+        """Количество подписок, уникальных поисков и выполненных повторных поисков"""
+        return {"subscriptions": len(self._subscriptions), "search_keys": len(self._groups()), "scrapes": self.scrapes}
+
+    @staticmethod
+    def _search_key(search_params):
+        params = normalize_search_params(
+            search_params["from_city"], search_params["to_city"], search_params["depart_date"],
+            search_params.get("adults_count", 1), search_params.get("children_count", 0),
+            search_params.get("class_type", "economy"),
+        )
+        # фильтр типа рейса применяется к каждому подписчику отдельно и в ключ не входит
+        return make_search_key(
+            params["from_code"], params["to_code"], params["depart_date"],
+            params["adults_count"], params["children_count"], params["service_class"], "all"
+        )
+
+    @staticmethod
+    def _cached_snapshot(search_params):
+        """Снимок рейсов из кэша поиска с такими параметрами или None"""
+        results = get_cached_results(
+            search_params["from_city"], search_params["to_city"], search_params["depart_date"],
+            search_params.get("adults_count", 1), search_params.get("children_count", 0),
+            search_params.get("class_type", "economy"),
+        )
+        if results is None or ("error" in results and results["error"] != "no_flights_available"):
+            return None
+        flight_filter = search_params.get("flight_filter", "all")
+        flights = [flight for flight in results.get("there", []) if matches_filter(flight, flight_filter)]
+        snapshot, _ = diff_flights({}, flights)
+        return snapshot
+
+    def _groups(self):
+        groups = {}
+        for subscription in self._subscriptions.values():
+            groups.setdefault(self._search_key(subscription.search_params), []).append(subscription)
+        return groups
+
+    def _schedule(self, key):
+        spread = self.interval * self.jitter
+        self._next_run[key] = time.monotonic() + self.interval + random.uniform(-spread, spread)
+
+    async def _run(self):
+        running = set()
+        while True:
+            self._wakeup.clear()
+            await self._expire()
+            now = time.monotonic()
+            groups = self._groups()
+            for key, subscribers in groups.items():
+                if key in running or self._next_run.get(key, now) > now:
+                    continue
+                running.add(key)
+                # у каждого повторного поиска свой идентификатор запроса в журнале
+                with request_context(new_request_id("w")):
+                    task = asyncio.create_task(self._check(key, subscribers))
+                task.add_done_callback(lambda _, key=key: (running.discard(key), self._wakeup.set()))
+            upcoming = [self._next_run[key] for key in groups if key in self._next_run and key not in running]
+            delay = min(upcoming, default=now + 60) - now
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), min(max(delay, 0.0), 60))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _expire(self):
+        """Удаляет подписки, дата вылета которых прошла"""
+        expired = [subscription for subscription in self._subscriptions.values() if subscription.is_expired()]
+        for subscription in expired:
+            del self._subscriptions[subscription.id]
+        if expired:
+            await self._save()
+
+    async def _check(self, key, subscribers):
+        """Один поиск по ключу и рассылка изменений всем его подписчикам"""
+        params = subscribers[0].search_params
+
+        def search():
+            # кэш не используем: нужен свежий ответ сайта
+            return search_flights(
+                from_city=params["from_city"], to_city=params["to_city"], depart_date=params["depart_date"],
+                adults_count=params.get("adults_count", 1), children_count=params.get("children_count", 0),
+                class_type=params.get("class_type", "economy"), use_cache=False,
+            )
+
+        try:
+            async with self._limit:
+                if self.scheduler is not None:
+                    outcome = await self.scheduler.submit(("watch", key), search, background=True)
+                else:
+                    outcome = await search()
+            if outcome is None:
+                # поиск отменили в очереди (остановка бота) - повторим в следующий раз
+                return
+            results, _ = outcome
+            self.scrapes += 1
+        except Exception as e:
+            logger.error("Ошибка повторного поиска %s: %s", key, e)
+            results = {"error": str(e)}
+        finally:
+            self._schedule(key)
+
+        if "error" in results and results["error"] != "no_flights_available":
+            # сбой поиска - подписчикам не пишем, попробуем в следующий раз
+            return
+        flights = results.get("there", [])
+
+        for subscription in subscribers:
+            if subscription.id not in self._subscriptions:
+                continue
+            own_flights = [flight for flight in flights if matches_filter(flight, subscription.search_params.get("flight_filter", "all"))]
+            primed = subscription.snapshot is not None
+            subscription.snapshot, changes = diff_flights(subscription.snapshot or {}, own_flights)
+            if not primed or not changes:
+                continue
+            try:
+                await self.notify(subscription.chat_id, format_changes(subscription, changes))
+            except Exception as e:
+                logger.warning("Не удалось отправить уведомление в чат %s: %s", subscription.chat_id, e)
+        # снимки подписчиков сохраняем, чтобы после перезапуска не повторять старые уведомления
+        await self._save()
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+    async def _save(self):
+        if not self.path:
+            return
+        async with self._save_lock:
+            # подписки читаем уже под блокировкой, чтобы последним записалось последнее состояние
+            data = [subscription.to_dict() for subscription in self._subscriptions.values()]
+            await asyncio.get_running_loop().run_in_executor(None, self._write, data)
+
+    def _write(self, data):
+        # пишем во временный файл и переименовываем, чтобы не оставить файл наполовину записанным
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)